@@ -1,23 +1,36 @@
+import base64
+import json
 import os
-from flask import Flask, jsonify, request
-from sqlalchemy import create_engine, MetaData, Table, select, func, text
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from flask import Flask, Response, jsonify, request
+from sqlalchemy import BigInteger, SmallInteger, Table, any_, bindparam, select, func, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import OperationalError
 from flask_cors import CORS
-from datetime import datetime, time
+from db import SERVER_TIMING, connect, db_time_ms, engine, pool_stats, route_target, route_timeout_ms
+from cache import cached
+from dashboards import parse_params
+from exports import FORMATS, export_chunks, export_query
+from schema_snapshot import load_metadata
+from rollups import ROLLUPS, ensure_rollups, fetch_dashboard, start_refresher
+from partitions import start_maintainer
+from metrics import instrument, render
+from serializers import Raw, dumps, encoder_for, json_response, table_encoder
 # Configuración de la app
 app = Flask(__name__)
 CORS(app)
+instrument(app, engine)
 
-DATABASE_URL = os.environ.get('DATABASE_URL')
-if not DATABASE_URL:
-    raise RuntimeError("Define la variable de entorno DATABASE_URL con tu conexión a Postgres")
-if DATABASE_URL.startswith('postgres://'):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+@app.after_request
+def server_timing(response):
+    # Tiempo en la base de esta petición (0 si se sirvió desde la caché)
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = f"db;dur={db_time_ms():.3f}"
+    return response
 
-engine = create_engine(DATABASE_URL, echo=True)
-
-# Reflexión de esquema existente
-meta = MetaData()
-meta.reflect(bind=engine)
+# Esquema existente: snapshot local verificado contra el catálogo (ver schema_snapshot.py)
+meta = load_metadata(engine)
 # Tablas
 Usuario      = meta.tables['usuario']  # Cambio aquí: 'usuario' en minúsculas
 Cliente      = meta.tables['cliente']  # Igual para otras tablas
@@ -34,308 +47,573 @@ Hace         = meta.tables['hace']
 Vive         = meta.tables['vive']
 Cubre        = meta.tables['cubre']
 
-# Función para convertir time y datetime a formato de cadena
-def convert_to_str(value):
-    if isinstance(value, (datetime, time)):
-        return value.strftime('%Y-%m-%d %H:%M:%S')  # Ajusta el formato a tu necesidad
+# Cómo se calcula meta.total: 'exact' (count(*)), 'estimated' (pg_class.reltuples)
+# o 'none' (se omite). Cada petición puede cambiarlo con ?total=
+TOTAL_MODES = ('exact', 'estimated', 'none')
+DEFAULT_TOTAL_MODE = os.environ.get('PAGINATION_TOTAL', 'exact')
+
+# Cursor opaco: la clave primaria de la última fila en JSON y base64 url-safe
+# (las fechas de la clave, como la de Pedido particionada, en ISO 8601)
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def decode_cursor(cursor, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        values = [datetime.fromisoformat(value)
+                  if column.type.python_type is datetime and isinstance(value, str) else value
+                  for value, column in zip(values, columns)]
+    except ValueError:
+        return None
+    if not all(isinstance(value, column.type.python_type) for value, column in zip(values, columns)):
+        return None
+    return values
+
+# Filas estimadas de una tabla; la padre de una tabla particionada (Pedido, Hace)
+# siempre tiene reltuples = -1, así que se suman sus particiones. Una partición
+# nueva sin analizar (-1) cuenta como vacía; -1 sólo si no se analizó ninguna
+ESTIMATE_SQL = """
+SELECT CASE WHEN c.relkind <> 'p' THEN c.reltuples::bigint
+            ELSE (SELECT CASE WHEN bool_and(p.reltuples < 0) THEN -1
+                              ELSE sum(greatest(p.reltuples, 0))::bigint END
+                  FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+                  WHERE i.inhparent = c.oid) END
+FROM pg_class c WHERE c.oid = to_regclass(:name)
+"""
+
+def count_rows(conn, table, mode, where=()):
+    if mode == 'none':
+        return None
+    if mode == 'estimated':
+        if where:
+            # Con filtros, las filas que estima el planificador para la consulta filtrada
+            compiled = select(*table.primary_key.columns).where(*where).compile(dialect=conn.dialect)
+            plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+            return plan[0]['Plan']['Plan Rows']
+        estimate = conn.execute(text(ESTIMATE_SQL), {'name': table.name}).scalar()
+        # reltuples es -1 si la tabla nunca se ha analizado
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return conn.execute(select(func.count()).select_from(table).where(*where)).scalar()
+
+# Parámetros de paginate que no son filtros
+LIST_PARAMS = ('limit', 'page', 'after', 'total', 'fields', 'fecha_from', 'fecha_to')
+# Tipos de columna que admiten ?columna=valor (fechas y horas sólo con fecha_from/fecha_to)
+FILTER_TYPES = {int: int, str: str, Decimal: Decimal, date: date.fromisoformat}
+# Rango de los enteros de Postgres: un valor fuera de rango falla en la base
+INTEGER_BITS = {SmallInteger: 16, BigInteger: 64}
+
+def parse_fields(table):
+    """Columnas de ?fields=a,b (siempre con la clave primaria, que necesita el cursor); None si hay alguna desconocida"""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(table.columns)
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    if not names <= set(table.columns.keys()):
+        return None
+    return [column for column in table.columns if column.primary_key or column.name in names]
+
+def filter_value(column, value):
+    """Valor de un filtro con el tipo de la columna; ValueError si no lo es o no cabe"""
+    kind = column.type.python_type
+    try:
+        value = FILTER_TYPES[kind](value)
+    except (ValueError, InvalidOperation):
+        raise ValueError(f"{column.name} debe ser de tipo {kind.__name__}")
+    if kind is int:
+        bits = next((bits for base, bits in INTEGER_BITS.items() if isinstance(column.type, base)), 32)
+        if not -2 ** (bits - 1) <= value < 2 ** (bits - 1):
+            raise ValueError(f"{column.name} fuera de rango")
     return value
 
-# Helper de paginación
+def column_filters(table):
+    """?columna=v1,v2 (o repetido) sobre las columnas reflejadas, con el tipo de cada una.
+
+    Cada filtro va a SQL como parámetro (= o = ANY de un array) para que pueda
+    usar índices. Los parámetros que no son columnas de la tabla se ignoran
+    (cache-busters, expand...); una columna que no admite filtro o un valor que
+    no es de su tipo lanza ValueError.
+    """
+    where = []
+    for name in request.args:
+        column = table.columns.get(name)
+        if name in LIST_PARAMS or column is None:
+            continue
+        if column.type.python_type not in FILTER_TYPES:
+            raise ValueError(f"{name} no admite filtro en {table.name}")
+        values = [filter_value(column, value.strip()) for raw in request.args.getlist(name)
+                  for value in raw.split(',') if value.strip()]
+        values = list(dict.fromkeys(values))
+        if not values:
+            raise ValueError(f"{name} no tiene valores")
+        if len(values) == 1:
+            where.append(column == values[0])
+        else:
+            where.append(column == any_(bindparam(f"filtro_{name}", values, type_=ARRAY(column.type))))
+    return where
+
+# Tamaño máximo de página; ?page= no tiene máximo (para páginas profundas, mejor ?after=)
+MAX_PAGE_SIZE = int(os.environ.get('PAGINATION_MAX_LIMIT', 1000))
+
+def page_arg(name, default, high=None):
+    """Entero de la query string entre 1 y `high`; ValueError (400) si no lo es, nunca se ajusta"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    limits = f"entre 1 y {high}" if high is not None else "mayor o igual a 1"
+    try:
+        value = int(value)
+    except ValueError:
+        value = 0
+    if value < 1 or (high is not None and value > high):
+        raise ValueError(f"{name} debe ser un entero {limits}")
+    return value
+
+# Helper de paginación: ?page=N (LIMIT/OFFSET) o ?after=<cursor> (keyset sobre la clave primaria),
+# con ?fields= para elegir columnas y filtros por columna (ver column_filters)
 def paginate(table):
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-    offset = (page - 1) * limit
-    with engine.connect() as conn:
-        total = conn.execute(select(func.count()).select_from(table)).scalar()
-        rows = conn.execute(select(table).limit(limit).offset(offset)).fetchall()
-    
-    # Convertir cada fila a un diccionario
-    data = []
-    for row in rows:
-        row_dict = dict(zip([column.name for column in table.columns], row))
-        # Convertir los valores a strings si son de tipo time o datetime
-        row_dict = {key: convert_to_str(value) for key, value in row_dict.items()}
-        data.append(row_dict)
+    try:
+        limit = page_arg('limit', 20, MAX_PAGE_SIZE)
+        page = page_arg('page', 1)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    total_mode = request.args.get('total', DEFAULT_TOTAL_MODE)
+    if total_mode not in TOTAL_MODES:
+        return jsonify({'error': f"total debe ser uno de: {', '.join(TOTAL_MODES)}"}), 400
+    columns = parse_fields(table)
+    if columns is None:
+        return jsonify({'error': f"fields admite: {', '.join(table.columns.keys())}"}), 400
+    try:
+        where = column_filters(table)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    try:
+        where += fecha_filters(table)
+    except ValueError:
+        return jsonify({'error': FECHA_ERROR}), 400
+    pk = list(table.primary_key.columns)
+    query = select(*columns).where(*where).order_by(*pk).limit(limit)
+
+    cursor = request.args.get('after')
+    if cursor is not None:
+        after = decode_cursor(cursor, pk)
+        if after is None:
+            return jsonify({'error': 'Cursor inválido'}), 400
+        query = query.where(tuple_(*pk) > tuple_(*after))
+        meta = {'after': cursor, 'limit': limit}
+    else:
+        query = query.offset((page - 1) * limit)
+        meta = {'page': page, 'limit': limit}
+
+    with connect() as conn:
+        total = count_rows(conn, table, total_mode, where)
+        rows = conn.execute(query).fetchall()
     
-    return jsonify({
-        'data': data,
-        'meta': {'page': page, 'limit': limit, 'total': total}
-    })
+    if total is not None:
+        meta['total'] = total
+    # Sólo hay página siguiente si ésta vino llena
+    last = rows[-1]._mapping if len(rows) == limit else None
+    meta['next_cursor'] = encode_cursor(last[column.name] for column in pk) if last else None
+
+    # Las filas se escriben directamente desde sus tuplas (time/datetime como '%Y-%m-%d %H:%M:%S')
+    names = [column.name for column in columns]
+    data = encoder_for(f"{table.name}({','.join(names)})", names, 'text').rows(rows)
+    return json_response('{"data":' + data + ',"meta":' + dumps(meta) + '}')
+
+def row_response(table, row, temporal='http'):
+    return json_response('{"data":' + table_encoder(table, temporal).row(row) + '}')
+
+# Segundos que cada tipo de ruta se sirve desde la caché compartida (ver cache.py)
+CACHE_TTL_LIST = 15
+CACHE_TTL_GET = 30
+CACHE_TTL_DASHBOARD = 60
 
 # CRUD básicos (solo GET)
 @app.route('/api/v1/usuarios', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_usuarios(): return paginate(Usuario)
 
 @app.route('/api/v1/usuarios/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_usuario(id):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(Usuario).where(Usuario.c.id_usuario == id)).first()
     if row:
-        # Convertir a diccionario de forma explícita
-        return jsonify({'data': dict(row._mapping)})
+        return row_response(Usuario, row)
     else:
         return ('', 404)
 
 
 @app.route('/api/v1/clientes', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_clientes(): return paginate(Cliente)
 @app.route('/api/v1/clientes/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_cliente(id):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(Cliente).where(Cliente.c.id_usuario == id)).first()
     if row:
-        return jsonify({'data': dict(row._mapping)})  # Usar _mapping para convertir a diccionario
+        return row_response(Cliente, row)
     else:
         return ('', 404)
     
 @app.route('/api/v1/trabajadores', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_trabajadores(): return paginate(Trabajador)
 @app.route('/api/v1/trabajadores/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_trabajador(id):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(Trabajador).where(Trabajador.c.id_usuario == id)).first()
     if row:
-        return jsonify({'data': dict(row._mapping)})  # Usar _mapping para convertir a diccionario
+        return row_response(Trabajador, row)
     else:
         return ('', 404)
 
 @app.route('/api/v1/administradores', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_administradores(): return paginate(Administrador)
 @app.route('/api/v1/administradores/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_administrador(id):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(Administrador).where(Administrador.c.id_usuario == id)).first()
     if row:
-        return jsonify({'data': dict(row._mapping)})  # Usar _mapping para convertir a diccionario
+        return row_response(Administrador, row)
     else:
         return ('', 404)
     
 @app.route('/api/v1/platos', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_platos(): return paginate(Plato)
 @app.route('/api/v1/platos/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_plato(id):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(Plato).where(Plato.c.id_plato == id)).first()
     if row:
-        return jsonify({'data': dict(row._mapping)})  # Usar _mapping para convertir a diccionario
+        return row_response(Plato, row)
     else:
         return ('', 404)
 
 @app.route('/api/v1/menus', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_menus(): return paginate(Menu)
 @app.route('/api/v1/menus/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_menu(id):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(Menu).where(Menu.c.id_menu == id)).first()
     if row:
-        return jsonify({'data': dict(row._mapping)})  # Usar _mapping para convertir a diccionario
+        return row_response(Menu, row)
     else:
         return ('', 404)
 
 @app.route('/api/v1/pedidos', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_pedidos():
     return paginate(Pedido)
 
 @app.route('/api/v1/pedidos/<int:id>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_pedido(id):
-    with engine.connect() as conn:
+    expand = parse_expand()
+    if expand is None:
+        return jsonify({'error': f"expand admite: {', '.join(PEDIDO_EXPANSIONS)}"}), 400
+    if expand:
+        with connect() as conn:
+            pedidos = expanded_pedidos(conn, [id], expand)
+        if not pedidos:
+            return ('', 404)
+        return json_response('{"data":' + pedidos[id] + '}')
+
+    with connect() as conn:
         row = conn.execute(select(Pedido).where(Pedido.c.id_pedido == id)).first()
     if row:
-        # Convertir los valores a strings si son de tipo time o datetime
-        row_dict = dict(row._mapping)
-        row_dict = {key: convert_to_str(value) for key, value in row_dict.items()}
-        return jsonify({'data': row_dict})
+        # time/datetime como '%Y-%m-%d %H:%M:%S'
+        return row_response(Pedido, row, 'text')
     else:
         return ('', 404)
     
 @app.route('/api/v1/zonas', methods=['GET'])
+@cached(CACHE_TTL_LIST)
 def list_zonas(): return paginate(ZonaEntrega)
 @app.route('/api/v1/zonas/<string:nombre>', methods=['GET'])
+@cached(CACHE_TTL_GET)
 def get_zona(nombre):
-    with engine.connect() as conn:
+    with connect() as conn:
         row = conn.execute(select(ZonaEntrega).where(ZonaEntrega.c.nombre == nombre)).first()
     if row:
-        return jsonify({'data': dict(row._mapping)})  # Usar _mapping para convertir a diccionario
+        return row_response(ZonaEntrega, row)
     else:
         return ('', 404)
 
-# Endpoints de dashboard (consultas estrella)
+# Lotes: /api/v1/<entidad>/batch?ids=1,2,3 o POST {"ids": [1, 2, 3]} con una sola
+# consulta WHERE pk = ANY(:ids). Devuelve las filas en el orden pedido y los IDs
+# que no existen en "missing"
+BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', 1000))
+BATCHES = {
+    'usuarios': (Usuario, 'http'), 'clientes': (Cliente, 'http'), 'trabajadores': (Trabajador, 'http'),
+    'administradores': (Administrador, 'http'), 'platos': (Plato, 'http'), 'menus': (Menu, 'http'),
+    'pedidos': (Pedido, 'text'), 'zonas': (ZonaEntrega, 'http'),
+}
+
+# ?expand= de pedidos: cliente, zona y menus (cada menú con sus platos)
+PEDIDO_EXPANSIONS = ('cliente', 'zona', 'menus')
+
+def request_param(name):
+    """Parámetro de la query string o, en POST, del cuerpo JSON"""
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and name in body:
+            return body[name]
+    return request.args.get(name)
+
+def parse_ids(column):
+    raw = request_param('ids')
+    if isinstance(raw, str):
+        raw = [value for value in raw.split(',') if value.strip()]
+    if not isinstance(raw, list) or not raw or len(raw) > BATCH_MAX_IDS:
+        return None
+    kind = column.type.python_type
+    try:
+        ids = [kind(value.strip() if isinstance(value, str) else value) for value in raw]
+    except (TypeError, ValueError):
+        return None
+    # Sin duplicados, conservando el orden pedido
+    return list(dict.fromkeys(ids))
+
+def parse_expand():
+    raw = request_param('expand') or []
+    if isinstance(raw, str):
+        raw = [value.strip() for value in raw.split(',') if value.strip()]
+    if not isinstance(raw, list) or not set(raw) <= set(PEDIDO_EXPANSIONS):
+        return None
+    return [name for name in PEDIDO_EXPANSIONS if name in raw]
+
+def any_of(column, ids):
+    return column == any_(bindparam('ids', ids, type_=ARRAY(column.type)))
+
+def expanded_pedidos(conn, ids, expand):
+    """Pedidos con sus relaciones en una sola consulta; {id_pedido: JSON}"""
+    groups = [Pedido]
+    query = select(Pedido)
+    if 'cliente' in expand:
+        groups.append(Cliente)
+        query = query.outerjoin(Cliente, Cliente.c.id_usuario == Pedido.c.id_cliente)
+    if 'zona' in expand:
+        groups.append(ZonaEntrega)
+        query = query.outerjoin(ZonaEntrega, ZonaEntrega.c.nombre == Pedido.c.zona_entrega)
+    if 'menus' in expand:
+        groups += [Menu, Plato]
+        query = (query.outerjoin(Tiene, Tiene.c.id_pedido == Pedido.c.id_pedido)
+                 .outerjoin(Menu, Menu.c.id_menu == Tiene.c.id_menu)
+                 .outerjoin(Pertenece, Pertenece.c.id_menu == Menu.c.id_menu)
+                 .outerjoin(Plato, Plato.c.id_plato == Pertenece.c.id_plato))
+    query = (query.with_only_columns(*[column for table in groups for column in table.columns])
+             .where(any_of(Pedido.c.id_pedido, ids))
+             .order_by(Pedido.c.id_pedido, *([Menu.c.id_menu, Plato.c.id_plato] if 'menus' in expand else [])))
+
+    # Cada fila plana se parte en los tramos de columnas de cada tabla
+    bounds = []
+    start = 0
+    for table in groups:
+        bounds.append((table, start, start + len(table.columns)))
+        start += len(table.columns)
+
+    pedidos = {}
+    for row in conn.execute(query):
+        parts = {table: row[lo:hi] for table, lo, hi in bounds}
+        pedido = pedidos.get(row[0])
+        if pedido is None:
+            pedido = pedidos[row[0]] = {'row': parts[Pedido], 'menus': {}}
+            for name, table in (('cliente', Cliente), ('zona', ZonaEntrega)):
+                if name in expand:
+                    value = parts[table]
+                    pedido[name] = 'null' if value[0] is None else table_encoder(table).row(value)
+        if 'menus' in expand and parts[Menu][0] is not None:
+            platos = pedido['menus'].setdefault(parts[Menu], [])
+            if parts[Plato][0] is not None:
+                platos.append(parts[Plato])
+
+    names = [column.name for column in Pedido.columns] + expand
+    encoder = encoder_for('pedido+' + ','.join(expand), names, 'text')
+    menu_encoder = encoder_for('menu+platos', [column.name for column in Menu.columns] + ['platos'])
+    result = {}
+    for id_pedido, pedido in pedidos.items():
+        extra = []
+        for name in expand:
+            if name == 'menus':
+                menus = [menu_encoder.row(menu + (Raw(table_encoder(Plato).rows(platos)),))
+                         for menu, platos in pedido['menus'].items()]
+                extra.append(Raw('[' + ','.join(menus) + ']'))
+            else:
+                extra.append(Raw(pedido[name]))
+        result[id_pedido] = encoder.row(tuple(pedido['row']) + tuple(extra))
+    return result
+
+def batch_lookup(table, temporal):
+    pk = table.primary_key.columns[0]
+    ids = parse_ids(pk)
+    if ids is None:
+        return jsonify({'error': f"ids debe ser una lista de 1 a {BATCH_MAX_IDS} valores de {pk.name}"}), 400
+    expand = parse_expand() if table is Pedido else []
+    if expand is None:
+        return jsonify({'error': f"expand admite: {', '.join(PEDIDO_EXPANSIONS)}"}), 400
+
+    with connect() as conn:
+        if expand:
+            found = expanded_pedidos(conn, ids, expand)
+        else:
+            encoder = table_encoder(table, temporal)
+            position = list(table.columns).index(pk)
+            found = {row[position]: encoder.row(row) for row in conn.execute(select(table).where(any_of(pk, ids)))}
+
+    data = '[' + ','.join(found[id] for id in ids if id in found) + ']'
+    missing = [id for id in ids if id not in found]
+    return json_response('{"data":' + data + ',"missing":' + dumps(missing) + '}')
+
+def batch_view(entity, table, temporal):
+    def view():
+        return batch_lookup(table, temporal)
+    view.__name__ = f'batch_{entity}'
+    return cached(CACHE_TTL_GET)(view)
+
+for entity, (table, temporal) in BATCHES.items():
+    app.add_url_rule(f'/api/v1/{entity}/batch', f'batch_{entity}', batch_view(entity, table, temporal),
+                     methods=['GET', 'POST'])
+
+# Exportación completa en streaming: /api/v1/<entidad>/export?format=ndjson|csv
+EXPORTS = {
+    'usuarios': Usuario, 'clientes': Cliente, 'trabajadores': Trabajador, 'repartidores': Repartidor,
+    'administradores': Administrador, 'menus': Menu, 'platos': Plato, 'pertenece': Pertenece,
+    'zonas': ZonaEntrega, 'pedidos': Pedido, 'tiene': Tiene, 'hace': Hace, 'vive': Vive, 'cubre': Cubre,
+}
+
+FECHA_ERROR = 'fecha_from/fecha_to deben ser fechas ISO (YYYY-MM-DD[THH:MM:SS])'
+
+def parse_fecha(value, end=False):
+    """Fecha u hora ISO; una fecha sola como límite final incluye todo ese día"""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        return parsed + timedelta(days=1), True
+    return parsed, False
+
+def fecha_filters(table):
+    # Filtros ?fecha_from=&fecha_to= sobre Pedido.fecha
+    where = []
+    if table is not Pedido:
+        return where
+    if request.args.get('fecha_from'):
+        start, _ = parse_fecha(request.args['fecha_from'])
+        where.append(Pedido.c.fecha >= start)
+    if request.args.get('fecha_to'):
+        end, exclusive = parse_fecha(request.args['fecha_to'], end=True)
+        where.append(Pedido.c.fecha < end if exclusive else Pedido.c.fecha <= end)
+    return where
+
+def export_table(table):
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format debe ser uno de: {', '.join(FORMATS)}"}), 400
+    try:
+        where = fecha_filters(table)
+    except ValueError:
+        return jsonify({'error': FECHA_ERROR}), 400
+    chunks = export_chunks(table, export_query(table, where), fmt, route_timeout_ms(), route_target())
+    response = Response(chunks, mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{table.name}.{fmt}"'
+    return response
+
+for entity, table in EXPORTS.items():
+    app.add_url_rule(f'/api/v1/{entity}/export', f'export_{entity}', lambda table=table: export_table(table),
+                     methods=['GET'])
+
+# Endpoints de dashboard (consultas estrella), servidos desde vistas materializadas
+# que refresca un hilo en segundo plano (ver rollups.py); con ?days=&zona=&estado=
+# distintos de los de por defecto se consulta en vivo (ver dashboards.py)
+try:
+    ensure_rollups(engine)
+    rollups_pending = False
+except OperationalError:
+    # Sin base al arrancar (con el snapshot del esquema): el hilo de refresco crea las vistas después
+    print("⚠️  Base de datos no disponible: las vistas del dashboard se crearán en el primer refresco")
+    rollups_pending = True
+start_refresher(engine, pending=rollups_pending)
+# Particiones futuras de Pedido/Hace y archivo de las antiguas (ver partitions.py)
+start_maintainer(engine)
+
+def rollup_response(name, rows, refreshed_at, temporal='http'):
+    # La hora del último refresco viaja en una cabecera para no cambiar el cuerpo
+    response = json_response(encoder_for(name, ROLLUPS[name]['columns'], temporal).rows(rows))
+    if refreshed_at is not None:
+        response.headers['X-Rollup-Refreshed-At'] = refreshed_at.isoformat()
+    return response
+
 @app.route('/api/v1/dashboard/platos-populares', methods=['GET'])
+@cached(CACHE_TTL_DASHBOARD)
 def platos_populares():
-    sql = text("""
-    SELECT 
-        p.nombre AS nombre_plato,
-        p.categoria,
-        p.precio,
-        u.nombre || ' ' || u.apellido AS administrador_creador,
-        pd.zona_entrega,
-        COUNT(DISTINCT pd.id_pedido) AS total_pedidos,
-        ROUND(AVG(h.calificacion::numeric), 2) AS calificacion_promedio,
-        COUNT(h.calificacion) AS total_calificaciones,
-        SUM(p.precio) AS ingresos_generados
-    FROM Plato p
-    JOIN Pertenece pe ON p.id_plato = pe.id_plato
-    JOIN Menu m ON pe.id_menu = m.id_menu
-    JOIN Administrador a ON m.id_administrador = a.id_usuario
-    JOIN Usuario u ON a.id_usuario = u.id_usuario
-    JOIN Tiene t ON m.id_menu = t.id_menu
-    JOIN Pedido pd ON t.id_pedido = pd.id_pedido
-    LEFT JOIN Hace h ON pd.id_pedido = h.id_pedido
-    WHERE pd.fecha >= CURRENT_DATE - INTERVAL '30 days'
-      AND pd.estado = 'Entregado'
-    GROUP BY p.id_plato, p.nombre, p.categoria, p.precio, 
-             u.nombre, u.apellido, pd.zona_entrega
-    HAVING COUNT(DISTINCT pd.id_pedido) >= 1
-    ORDER BY total_pedidos DESC, calificacion_promedio DESC
-    LIMIT 15;
-    """)
-
-    # Ejecutar la consulta
-    with engine.connect() as conn:
-        rows = conn.execute(sql).fetchall()
-
-    # Convertir las filas a diccionarios usando _mapping
-    return jsonify([dict(row._mapping) for row in rows])
+    try:
+        params = parse_params('platos_populares', request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    with connect() as conn:
+        rows, refreshed_at = fetch_dashboard(conn, 'platos_populares', params)
+    return rollup_response('platos_populares', rows, refreshed_at)
 
 
 @app.route('/api/v1/dashboard/rendimiento-zonas', methods=['GET'])
+@cached(CACHE_TTL_DASHBOARD)
 def rendimiento_zonas():
-    # SQL para obtener el rendimiento de las zonas con filtro de los últimos 30 días
-    sql = text("""
-    SELECT 
-        pd.zona_entrega,
-        ze.costo AS costo_zona,
-        COUNT(pd.id_pedido) AS total_entregas,
-        COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END) AS entregas_exitosas,
-        ROUND(
-            COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END)::numeric / 
-            COUNT(pd.id_pedido)::numeric * 100, 2
-        ) AS porcentaje_exito,
-        ROUND(AVG(
-            EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_salida)) / 60
-        ), 2) AS tiempo_promedio_minutos,
-        ROUND(AVG(
-            EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_entrega_estimada)) / 60
-        ), 2) AS diferencia_estimado_real,
-        COUNT(DISTINCT c.id_usuario) AS repartidores_activos,
-        STRING_AGG(DISTINCT u.nombre || ' ' || u.apellido, ', ') AS nombres_repartidores
-    FROM Pedido pd
-    JOIN ZonaEntrega ze ON pd.zona_entrega = ze.nombre
-    JOIN Cubre c ON pd.zona_entrega = c.zona_entrega
-    JOIN Usuario u ON c.id_usuario = u.id_usuario
-    WHERE pd.fecha >= CURRENT_DATE - INTERVAL '30 days'
-      AND pd.hora_salida IS NOT NULL
-      AND pd.hora_entrega IS NOT NULL
-      AND pd.hora_entrega_estimada IS NOT NULL
-    GROUP BY pd.zona_entrega, ze.costo
-    HAVING COUNT(pd.id_pedido) >= 5
-    ORDER BY porcentaje_exito DESC, tiempo_promedio_minutos ASC;
-    """)
-
-    # Ejecutar la consulta
-    with engine.connect() as conn:
-        rows = conn.execute(sql).fetchall()
-
-    # Convertir las filas a diccionarios y manejar valores de tipo time/datetime
-    data = []
-    for row in rows:
-        row_dict = dict(row._mapping)
-        row_dict = {key: convert_to_str(value) for key, value in row_dict.items()}
-        data.append(row_dict)
-
-    return jsonify(data)
+    try:
+        params = parse_params('rendimiento_zonas', request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    with connect() as conn:
+        rows, refreshed_at = fetch_dashboard(conn, 'rendimiento_zonas', params)
+    # time/datetime como '%Y-%m-%d %H:%M:%S'
+    return rollup_response('rendimiento_zonas', rows, refreshed_at, 'text')
 
 
 
 @app.route('/api/v1/dashboard/top-repartidores', methods=['GET'])
+@cached(CACHE_TTL_DASHBOARD)
 def top_repartidores():
-    sql = text("""
-    SELECT 
-        u.nombre || ' ' || u.apellido AS nombre_repartidor,
-        t.telefono_emergencia,
-        c.zona_entrega,
-        COUNT(pd.id_pedido) AS entregas_realizadas,
-        COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END) AS entregas_exitosas,
-        ROUND(
-            COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END)::numeric / 
-            COUNT(pd.id_pedido)::numeric * 100, 2
-        ) AS tasa_exito,
-        ROUND(AVG(h.calificacion::numeric), 2) AS calificacion_promedio,
-        ROUND(AVG(
-            EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_salida)) / 60
-        ), 2) AS tiempo_promedio_entrega,
-        COUNT(DISTINCT DATE(pd.fecha)) AS dias_trabajados,
-        ROW_NUMBER() OVER (
-            PARTITION BY c.zona_entrega 
-            ORDER BY COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END) DESC,
-                     AVG(h.calificacion::numeric) DESC
-        ) AS ranking_zona
-    FROM Usuario u
-    JOIN Trabajador t ON u.id_usuario = t.id_usuario
-    JOIN Repartidor r ON t.id_usuario = r.id_usuario
-    JOIN Cubre c ON r.id_usuario = c.id_usuario
-    JOIN Pedido pd ON pd.zona_entrega = c.zona_entrega
-    LEFT JOIN Hace h ON pd.id_pedido = h.id_pedido
-    WHERE pd.estado IN ('Entregado', 'En reparto')
-      AND pd.fecha >= CURRENT_DATE - INTERVAL '30 days'
-      AND pd.hora_salida IS NOT NULL
-      AND pd.hora_entrega IS NOT NULL
-    GROUP BY u.id_usuario, u.nombre, u.apellido, t.telefono_emergencia, c.zona_entrega
-    HAVING COUNT(pd.id_pedido) >= 3
-    ORDER BY c.zona_entrega, ranking_zona;
-    """)
-    with engine.connect() as conn:
-        rows = conn.execute(sql).fetchall()
-
-    # Convertir las filas a diccionarios usando _mapping
-    return jsonify([dict(row._mapping) for row in rows])
+    try:
+        params = parse_params('top_repartidores', request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    with connect() as conn:
+        rows, refreshed_at = fetch_dashboard(conn, 'top_repartidores', params)
+    return rollup_response('top_repartidores', rows, refreshed_at)
 
 
 
 @app.route('/api/v1/dashboard/clientes-activos', methods=['GET'])
+@cached(CACHE_TTL_DASHBOARD)
 def clientes_activos():
-    sql = text("""
-    SELECT 
-        u.nombre || ' ' || u.apellido AS nombre_cliente,
-        cl.empresa,
-        v.zona_entrega,
-        COUNT(pd.id_pedido) AS total_pedidos,
-        ROUND(AVG(p.precio), 2) AS ticket_promedio,
-        SUM(p.precio) AS valor_total_consumido,
-        COUNT(DISTINCT pe.id_plato) AS variedad_platos_consumidos,
-        COUNT(DISTINCT DATE(pd.fecha)) AS dias_activos,
-        ROUND(AVG(h.calificacion::numeric), 2) AS calificacion_promedio,
-        MAX(pd.fecha) AS ultimo_pedido,
-        STRING_AGG(DISTINCT p.categoria, ', ') AS categorias_preferidas,
-        CASE 
-            WHEN COUNT(pd.id_pedido) >= 20 THEN 'Cliente VIP'
-            WHEN COUNT(pd.id_pedido) >= 10 THEN 'Cliente Frecuente'
-            WHEN COUNT(pd.id_pedido) >= 5 THEN 'Cliente Regular'
-            ELSE 'Cliente Ocasional'
-        END AS categoria_fidelidad,
-        EXTRACT(DAYS FROM (CURRENT_DATE - MAX(pd.fecha))) AS dias_sin_pedido
-    FROM Usuario u
-    JOIN Cliente cl ON u.id_usuario = cl.id_usuario
-    JOIN Vive v ON u.id_usuario = v.id_usuario
-    JOIN Hace ha ON u.id_usuario = ha.id_usuario
-    JOIN Pedido pd ON ha.id_pedido = pd.id_pedido
-    JOIN Tiene t ON pd.id_pedido = t.id_pedido
-    JOIN Menu m ON t.id_menu = m.id_menu
-    JOIN Pertenece pe ON m.id_menu = pe.id_menu
-    JOIN Plato p ON pe.id_plato = p.id_plato
-    LEFT JOIN Hace h ON pd.id_pedido = h.id_pedido
-    WHERE pd.fecha >= CURRENT_DATE - INTERVAL '60 days'
-      AND pd.estado = 'Entregado'
-    GROUP BY u.id_usuario, u.nombre, u.apellido, cl.empresa, v.zona_entrega
-    HAVING COUNT(pd.id_pedido) >= 3
-    ORDER BY total_pedidos DESC, valor_total_consumido DESC
-    LIMIT 20;
-    """)
-    with engine.connect() as conn:
-        rows = conn.execute(sql).fetchall()
-
-    # Convertir las filas a diccionarios usando _mapping
-    return jsonify([dict(row._mapping) for row in rows])
+    try:
+        params = parse_params('clientes_activos', request.args)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    with connect() as conn:
+        rows, refreshed_at = fetch_dashboard(conn, 'clientes_activos', params)
+    return rollup_response('clientes_activos', rows, refreshed_at)
+
+# Estado del pool de conexiones de este worker
+@app.route('/api/v1/db/pool', methods=['GET'])
+def db_pool():
+    return jsonify(pool_stats())
+
+# Métricas por ruta de todos los workers en formato Prometheus (ver metrics.py)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,160 @@
+"""
+Modo de servicio ASGI (asyncio).
+
+Las rutas de dashboard se atienden de forma asíncrona con asyncpg, con los
+mismos parámetros (dashboards.parse_params) y el mismo SQL que app.py: la vista
+materializada con los filtros por defecto y si no la consulta en vivo. Se
+añade /api/v1/dashboard/summary, que lanza las cuatro consultas a la vez, cada
+una en su propia conexión del pool: la latencia es la de la más lenta y no la
+suma. Como en app.py, cada consulta lee de una réplica sana según
+db.route_target (o del primario si no hay ninguna o falla al conectar). El
+resto de rutas se delega a la app Flask. Las respuestas comparten la caché y
+los ETag de cache.py con el modo WSGI.
+
+Uso: uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 3
+"""
+import asyncio
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import text
+
+import app as wsgi
+import cache
+from db import (DATABASE_URL, REPLICA_CONNECT_TIMEOUT, ROUTE_TIMEOUTS_MS, STATEMENT_TIMEOUT_MS,
+                create_async_db_engine, replicas, route_target)
+from dashboards import is_default, parse_params, ranked_query
+from rollups import REFRESHED_AT_SQL, ROLLUPS, rollup_sql
+from serializers import dumps, encoder_for
+
+engine = create_async_db_engine(DATABASE_URL)
+# Engine asyncio de cada réplica; su salud la comprueba el hilo de db.replicas
+replica_engines = {replica: create_async_db_engine(replica.url, REPLICA_CONNECT_TIMEOUT)
+                   for replica in replicas.replicas}
+flask_app = WsgiToAsgi(wsgi.app)
+
+# Ruta -> consulta y formato de fechas, igual que las vistas de app.py
+DASHBOARD_ROUTES = {
+    '/api/v1/dashboard/platos-populares': ('platos_populares', 'http'),
+    '/api/v1/dashboard/rendimiento-zonas': ('rendimiento_zonas', 'text'),
+    '/api/v1/dashboard/top-repartidores': ('top_repartidores', 'http'),
+    '/api/v1/dashboard/clientes-activos': ('clientes_activos', 'http'),
+}
+SUMMARY_PATH = '/api/v1/dashboard/summary'
+
+
+async def checkout(name):
+    """Conexión para la consulta `name`, como db.checkout: de una réplica sana si la ruta
+    lee de réplicas y hay alguna; si no, del primario"""
+    if route_target(name) == 'replica' and replicas.replicas:
+        replica = replicas.pick()
+        if replica is not None:
+            try:
+                return await replica_engines[replica].connect()
+            except Exception as error:
+                # Hasta la próxima comprobación se lee del primario
+                replica.healthy, replica.error = False, str(error).splitlines()[0]
+    return await engine.connect()
+
+
+async def fetch_rollup(name, params):
+    """Lee un dashboard en su propia conexión, como rollups.fetch_dashboard: de la vista
+    con los filtros por defecto y si no en vivo; devuelve (JSON de sus filas, hora de refresco)"""
+    temporal = dict(DASHBOARD_ROUTES.values())[name]
+    rollup = ROLLUPS[name]
+    conn = await checkout(name)
+    try:
+        await conn.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                           {'ms': str(ROUTE_TIMEOUTS_MS.get(name, STATEMENT_TIMEOUT_MS))})
+        if is_default(name, params):
+            rows = (await conn.execute(text(rollup_sql(name, params['limit'])))).fetchall()
+            refreshed_at = (await conn.execute(text(REFRESHED_AT_SQL), {'view': rollup['view']})).scalar()
+        else:
+            rows = (await conn.execute(ranked_query(name, params, rollup['columns'], rollup['order']))).fetchall()
+            refreshed_at = None
+    finally:
+        await conn.close()
+    return encoder_for(name, rollup['columns'], temporal).rows(rows), refreshed_at
+
+
+async def build_body(path, args):
+    """Cuerpo JSON y hora de refresco (la más antigua en el resumen); ValueError si los
+    parámetros no son válidos. El resumen aplica los mismos parámetros a los cuatro"""
+    if path == SUMMARY_PATH:
+        names = sorted(name for name, _ in DASHBOARD_ROUTES.values())
+        params = [parse_params(name, args) for name in names]
+        results = await asyncio.gather(*[fetch_rollup(name, p) for name, p in zip(names, params)])
+        body = '{' + ','.join(f'"{name}":{data}' for name, (data, _) in zip(names, results)) + '}'
+        stamps = [refreshed_at for _, refreshed_at in results if refreshed_at is not None]
+        return body, min(stamps) if stamps else None
+    name = DASHBOARD_ROUTES[path][0]
+    return await fetch_rollup(name, parse_params(name, args))
+
+
+async def respond(send, status, body=b'', headers=None):
+    headers = dict(headers or {})
+    headers.setdefault('Content-Type', 'application/json')
+    # Igual que flask_cors en la app WSGI
+    headers['Access-Control-Allow-Origin'] = '*'
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def dashboard(scope, send):
+    if scope['method'] not in ('GET', 'HEAD'):
+        return await respond(send, 405, headers={'Allow': 'GET'})
+    path = scope['path']
+    endpoint = 'dashboard_summary' if path == SUMMARY_PATH else DASHBOARD_ROUTES[path][0]
+    query = parse_qsl(scope['query_string'].decode(), keep_blank_values=True)
+    args = sorted(query)
+    key = path + '?' + '&'.join(f"{name}={value}" for name, value in args)
+    if_none_match = dict(scope['headers']).get(b'if-none-match', b'').decode()
+    ttl = cache.TTL_OVERRIDES.get(endpoint, wsgi.CACHE_TTL_DASHBOARD) if cache.ENABLED else 0
+
+    hit = cache.get(key) if ttl > 0 else None
+    if hit is not None:
+        etag, body, headers = hit
+        status = 'HIT'
+    else:
+        # Como request.args en Flask: con parámetros repetidos cuenta el primero
+        try:
+            data, refreshed_at = await build_body(path, dict(reversed(query)))
+        except ValueError as error:
+            return await respond(send, 400, (dumps({'error': str(error)}) + '\n').encode())
+        body = (data + '\n').encode()
+        etag = cache.make_etag(body)
+        headers = {'Content-Type': 'application/json'}
+        if refreshed_at is not None:
+            headers['X-Rollup-Refreshed-At'] = refreshed_at.isoformat()
+        if ttl > 0:
+            cache.put(key, etag, body, headers, ttl)
+        status = 'MISS'
+
+    headers = dict(headers, ETag=etag)
+    if cache.etag_matches(etag, if_none_match):
+        headers.pop('Content-Type')
+        return await respond(send, 304, headers=headers)
+    headers['X-Cache'] = status
+    await respond(send, 200, b'' if scope['method'] == 'HEAD' else body, headers)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            for replica_engine in replica_engines.values():
+                await replica_engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http' and (scope['path'] in DASHBOARD_ROUTES or scope['path'] == SUMMARY_PATH):
+        return await dashboard(scope, send)
+    await flask_app(scope, receive, send)
@@ -0,0 +1,327 @@
+"""
+Benchmark HTTP de las rutas de app.py contra un Postgres local sembrado.
+
+Para cada escala de --scales siembra la base con seeder_massive.py --bulk
+(siempre con la misma semilla), aplica los índices de migrations.py, refresca
+las vistas del dashboard y arranca gunicorn con la app. Después recorre las
+rutas una a una, cada una con --requests peticiones sobre --concurrency
+conexiones keep-alive en paralelo:
+- listados de cada entidad: primera página, página profunda con offset y la
+  misma profundidad con cursor (?after=)
+- búsquedas por ID sobre una muestra de IDs reales, lotes y ?expand= de pedidos
+- las cuatro consultas de dashboard
+
+La caché de respuestas se desactiva (RESPONSE_CACHE=0) para medir la base; con
+--cache se deja activa. Por ruta se informa peticiones/seg, latencia p50/p95/p99
+y tiempo dentro de la base (cabecera Server-Timing que la app emite con
+SERVER_TIMING=1). El resultado se guarda en JSON y, con --baseline, se compara
+con una ejecución anterior: una ruta empeora si su p95 sube, o su throughput
+baja, más de --tolerance.
+
+Uso: python bench_api.py --scales 10000,100000,1000000 --concurrency 8 --output bench.json
+     python bench_api.py --scales 100000 --baseline bench.json
+     python bench_api.py --url http://127.0.0.1:5000   (servidor ya arrancado, sin sembrar)
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+from sqlalchemy import text
+
+from stats import percentile
+
+# (ruta, tabla, columna de ID) de los listados y búsquedas de app.py
+ENTITIES = [
+    ('usuarios', 'usuario', 'id_usuario'),
+    ('clientes', 'cliente', 'id_usuario'),
+    ('trabajadores', 'trabajador', 'id_usuario'),
+    ('administradores', 'administrador', 'id_usuario'),
+    ('platos', 'plato', 'id_plato'),
+    ('menus', 'menu', 'id_menu'),
+    ('pedidos', 'pedido', 'id_pedido'),
+    ('zonas', 'zonaentrega', 'nombre'),
+]
+DASHBOARDS = ['platos-populares', 'rendimiento-zonas', 'top-repartidores', 'clientes-activos']
+# IDs distintos por ruta de búsqueda y por petición de lote
+SAMPLE_IDS = 200
+BATCH_IDS = 100
+# Profundidad de las páginas profundas (fracción de la tabla)
+DEEP_FRACTION = 0.9
+BOOT_TIMEOUT = 900
+
+
+def server_timing_ms(header):
+    """'db;dur=1.234' -> 1.234"""
+    for metric in (header or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        if name == 'db' and params.startswith('dur='):
+            return float(params[4:])
+    return None
+
+
+def fetch(base, path):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def run_route(base, paths, requests, concurrency):
+    """Lanza `requests` peticiones repartidas entre `concurrency` conexiones; devuelve sus estadísticas"""
+    parts = urlsplit(base)
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, db_times, sizes = [], [], []
+    errors = [0]
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+        try:
+            while True:
+                number = next(counter)
+                if number >= requests:
+                    return
+                start_time = time.perf_counter()
+                try:
+                    conn.request('GET', paths[number % len(paths)])
+                    response = conn.getresponse()
+                    body = response.read()
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    with lock:
+                        errors[0] += 1
+                    continue
+                elapsed = (time.perf_counter() - start_time) * 1000
+                db_ms = server_timing_ms(response.getheader('Server-Timing'))
+                with lock:
+                    if response.status >= 400:
+                        errors[0] += 1
+                    latencies.append(elapsed)
+                    sizes.append(len(body))
+                    if db_ms is not None:
+                        db_times.append(db_ms)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start_time
+
+    latencies.sort()
+    db_times.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) or 0, 2),
+        'p95_ms': round(percentile(latencies, 0.95) or 0, 2),
+        'p99_ms': round(percentile(latencies, 0.99) or 0, 2),
+        'db_ms_avg': round(sum(db_times) / len(db_times), 2) if db_times else None,
+        'db_ms_p95': round(percentile(db_times, 0.95), 2) if db_times else None,
+        'bytes_avg': round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+
+def build_routes(base, engine, limit):
+    """Ruta -> lista de URLs que se recorren en ciclo, con IDs y cursores reales de la base"""
+    routes = {}
+    with engine.connect() as conn:
+        for entity, table, id_column in ENTITIES:
+            rows = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            ids = conn.execute(text(f"SELECT {id_column} FROM {table} ORDER BY random() LIMIT :n"),
+                               {'n': SAMPLE_IDS}).scalars().all()
+            if entity != 'zonas':
+                deep_page = max(1, int(rows * DEEP_FRACTION) // limit)
+                routes[f'list_{entity}'] = [f'/api/v1/{entity}?limit={limit}']
+                routes[f'deep_page_{entity}'] = [f'/api/v1/{entity}?limit={limit}&page={deep_page}']
+                # El cursor de la página anterior lleva a la misma profundidad con keyset
+                status, body = fetch(base, f'/api/v1/{entity}?limit={limit}&page={max(1, deep_page - 1)}&total=none')
+                cursor = json.loads(body)['meta']['next_cursor'] if status == 200 else None
+                if cursor:
+                    routes[f'deep_after_{entity}'] = [f'/api/v1/{entity}?limit={limit}&after={cursor}']
+            else:
+                routes[f'list_{entity}'] = [f'/api/v1/{entity}']
+            if ids:
+                routes[f'get_{entity}'] = [f'/api/v1/{entity}/{quote(str(value))}' for value in ids]
+            if entity == 'pedidos' and ids:
+                routes['get_pedidos_expand'] = [f'/api/v1/pedidos/{value}?expand=cliente,zona,menus'
+                                                for value in ids]
+                batch = ','.join(str(value) for value in ids[:BATCH_IDS])
+                routes['batch_pedidos'] = [f'/api/v1/pedidos/batch?ids={batch}']
+    for name in DASHBOARDS:
+        routes[f"dashboard_{name.replace('-', '_')}"] = [f'/api/v1/dashboard/{name}']
+    return routes
+
+
+def run_step(description, command):
+    print(f"[BENCH] {description}...")
+    sys.stdout.flush()
+    start_time = time.time()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    print(f"[BENCH] ✅ {description} en {time.time() - start_time:.1f}s")
+
+
+def seed(n, seed_value, seed_workers):
+    run_step(f"Sembrando {n:,} registros base",
+             [sys.executable, 'seeder_massive.py', str(n), '--bulk', '--seed', str(seed_value),
+              '--workers', str(seed_workers)])
+    run_step("Índices (migrations.py apply)", [sys.executable, 'migrations.py', 'apply'])
+    run_step("Vistas del dashboard (rollups.py)", [sys.executable, 'rollups.py'])
+
+
+@contextmanager
+def gunicorn(workers, port, cache):
+    """Arranca la app con gunicorn y espera a que responda"""
+    env = dict(os.environ, SERVER_TIMING='1', WEB_CONCURRENCY=str(workers),
+               ROLLUP_REFRESH_SECONDS='0', PARTITION_MAINTENANCE_SECONDS='0')
+    if not cache:
+        env['RESPONSE_CACHE'] = '0'
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+                                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'], env=env)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.time() + BOOT_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn terminó al arrancar (código {process.returncode})")
+            try:
+                if fetch(base, '/api/v1/db/pool')[0] == 200:
+                    break
+            except OSError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError("gunicorn no respondió a tiempo")
+            time.sleep(0.5)
+        yield base
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def bench(base, engine, args):
+    routes = build_routes(base, engine, args.limit)
+    results = {}
+    print(f"   {'Ruta':<32}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'DB avg':>9}{'Errores':>9}")
+    for name, paths in routes.items():
+        # Calentamiento: una vuelta por las URLs de la ruta
+        run_route(base, paths, min(len(paths), args.concurrency), args.concurrency)
+        stats = run_route(base, paths, args.requests, args.concurrency)
+        results[name] = stats
+        db_avg = f"{stats['db_ms_avg']:.1f}" if stats['db_ms_avg'] is not None else '-'
+        print(f"   {name:<32}{stats['throughput_rps']:>9,.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{db_avg:>9}{stats['errors']:>9}")
+        sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Compara con una ejecución anterior; devuelve las rutas que empeoraron [(escala, ruta, motivo)]"""
+    regressions = []
+    for scale, routes in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale)
+        if not previous:
+            print(f"ℹ️  La línea base no tiene la escala {scale}")
+            continue
+        print(f"📊 Comparación con la línea base (escala {scale}):")
+        print(f"   {'Ruta':<32}{'p95 antes':>11}{'p95 ahora':>11}{'Δ p95':>9}{'Δ req/s':>9}")
+        for name, stats in routes.items():
+            old = previous.get(name)
+            if not old or not old['p95_ms'] or not old['throughput_rps']:
+                continue
+            p95_change = stats['p95_ms'] / old['p95_ms'] - 1
+            rps_change = stats['throughput_rps'] / old['throughput_rps'] - 1
+            worse = p95_change > tolerance or rps_change < -tolerance
+            print(f"   {name:<32}{old['p95_ms']:>11.1f}{stats['p95_ms']:>11.1f}{p95_change:>+9.0%}"
+                  f"{rps_change:>+9.0%}{'  ❌' if worse else ''}")
+            if worse:
+                regressions.append((scale, name, f"p95 {p95_change:+.0%}, req/s {rps_change:+.0%}"))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP de la API de Fredys Food")
+    parser.add_argument('--scales', default='10000',
+                        help="Registros base a sembrar, separados por comas (p. ej. 10000,100000,1000000)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Conexiones simultáneas por ruta")
+    parser.add_argument('--requests', type=int, default=200, help="Peticiones por ruta")
+    parser.add_argument('--workers', type=int, default=3, help="Workers de gunicorn")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--limit', type=int, default=50, help="Tamaño de página de los listados")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla del seeder")
+    parser.add_argument('--seed-workers', type=int, default=1, help="Procesos del seeder")
+    parser.add_argument('--cache', action='store_true', help="Deja activa la caché de respuestas")
+    parser.add_argument('--url', help="Mide un servidor ya arrancado sobre la base actual (sin sembrar)")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help="Resultados anteriores con los que comparar")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Empeoramiento admitido en p95 y req/s antes de marcar regresión (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    from db import engine
+
+    results = {
+        'meta': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'workers': args.workers,
+            'limit': args.limit,
+            'seed': args.seed,
+            'cache': args.cache,
+        },
+        'scales': {},
+    }
+    if args.url:
+        print(f"🏁 Benchmark de {args.url} sobre la base actual")
+        results['scales']['actual'] = bench(args.url.rstrip('/'), engine, args)
+    else:
+        for scale in [int(value) for value in args.scales.split(',') if value.strip()]:
+            print("=" * 80)
+            print(f"🏁 Escala {scale:,}")
+            seed(scale, args.seed, args.seed_workers)
+            with gunicorn(args.workers, args.port, args.cache) as base:
+                results['scales'][str(scale)] = bench(base, engine, args)
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f"💾 Resultados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} rutas empeoraron:")
+            for scale, name, reason in regressions:
+                print(f"   • {name} ({scale}): {reason}")
+            sys.exit(1)
+        print("✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Caché de respuestas compartida entre los workers de gunicorn.
+
+Las respuestas 200 de las rutas decoradas con @cached se guardan en un archivo
+SQLite local (modo WAL, sin servicios externos), así que todos los procesos ven
+las mismas entradas. Cada ruta tiene su TTL, el número de entradas está acotado
+y se expulsan las menos usadas (LRU). Cada respuesta lleva un ETag fuerte (hash
+del cuerpo) y las peticiones con If-None-Match coincidente reciben un 304
+(comparación débil: un W/"..." reenviado por un proxy también vale). La hora
+de uso de una entrada sólo se actualiza si tiene más de TOUCH_SECONDS, para que
+una lectura desde la caché casi nunca sea una escritura en el archivo compartido.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import make_response, request
+
+from state import private_file, state_path
+
+# RESPONSE_CACHE=0 desactiva la caché en todas las rutas (p. ej. para medir la base con bench_api.py)
+ENABLED = os.environ.get('RESPONSE_CACHE', '1') != '0'
+CACHE_PATH = state_path('response_cache.sqlite3', 'RESPONSE_CACHE_PATH')
+MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000))
+# Precisión de la hora de uso del LRU: un acierto sólo escribe si la entrada no se usó en este tiempo
+TOUCH_SECONDS = float(os.environ.get('RESPONSE_CACHE_TOUCH_SECONDS', 10))
+# TTL por ruta, p. ej. RESPONSE_CACHE_TTLS="list_pedidos=5,platos_populares=120" (0 desactiva la caché)
+TTL_OVERRIDES = {name.strip(): int(seconds) for name, seconds in
+                 (item.split('=') for item in os.environ.get('RESPONSE_CACHE_TTLS', '').split(',') if item.strip())}
+# Cabeceras de la respuesta original que se guardan junto al cuerpo
+KEPT_HEADERS = ('Content-Type', 'X-Rollup-Refreshed-At')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS respuestas (
+    clave TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    cuerpo BLOB NOT NULL,
+    cabeceras TEXT NOT NULL,
+    expira REAL NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS respuestas_usado ON respuestas (usado);
+"""
+
+_local = threading.local()
+
+
+def _db():
+    """Conexión SQLite por hilo y proceso (las conexiones no sobreviven a un fork)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(private_file(CACHE_PATH), timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def cache_key():
+    """Ruta más parámetros ordenados: ?a=1&b=2 y ?b=2&a=1 comparten entrada"""
+    args = sorted(request.args.items(multi=True))
+    return request.path + '?' + '&'.join(f"{name}={value}" for name, value in args)
+
+
+def make_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(etag, header=None):
+    """Comparación débil contra If-None-Match, como pide la RFC 9110 (admite listas, W/ y *)"""
+    if header is None:
+        header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [value.strip().removeprefix('W/') for value in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def get(key):
+    row = _db().execute("SELECT etag, cuerpo, cabeceras, expira, usado FROM respuestas WHERE clave = ?",
+                        (key,)).fetchone()
+    if row is None:
+        return None
+    etag, body, headers, expires, used = row
+    now = time.time()
+    if expires < now:
+        return None
+    if now - used > TOUCH_SECONDS:
+        _db().execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (now, key))
+    return etag, body, json.loads(headers)
+
+
+def put(key, etag, body, headers, ttl):
+    now = time.time()
+    db = _db()
+    db.execute("INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?)",
+               (key, etag, body, json.dumps(headers), now + ttl, now))
+    # Expulsión LRU: se conservan las MAX_ENTRIES usadas más recientemente
+    db.execute("""
+    DELETE FROM respuestas WHERE clave IN (
+        SELECT clave FROM respuestas ORDER BY usado DESC LIMIT -1 OFFSET ?
+    )""", (MAX_ENTRIES,))
+
+
+def clear():
+    _db().execute("DELETE FROM respuestas")
+
+
+def not_modified(etag, headers):
+    response = make_response('', 304)
+    response.headers['ETag'] = etag
+    if 'X-Rollup-Refreshed-At' in headers:
+        response.headers['X-Rollup-Refreshed-At'] = headers['X-Rollup-Refreshed-At']
+    return response
+
+
+def cached(ttl):
+    """Decorador de rutas GET: sirve desde la caché compartida durante `ttl` segundos"""
+    def decorator(view):
+        route_ttl = TTL_OVERRIDES.get(view.__name__, ttl) if ENABLED else 0
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Sólo GET: otros métodos (p. ej. POST de lotes) llevan los datos en el cuerpo
+            if route_ttl <= 0 or request.method != 'GET':
+                return view(*args, **kwargs)
+            key = cache_key()
+            hit = get(key)
+            if hit is not None:
+                etag, body, headers = hit
+                if etag_matches(etag):
+                    return not_modified(etag, headers)
+                response = make_response(body)
+                response.headers.update(headers)
+                response.headers['ETag'] = etag
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            etag = make_etag(body)
+            headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+            put(key, etag, body, headers, route_ttl)
+            if etag_matches(etag):
+                return not_modified(etag, headers)
+            response.headers['ETag'] = etag
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,559 @@
+"""
+Consultas parametrizadas del dashboard.
+
+Cada consulta agrega primero cada tabla de hechos por separado, en su propio
+CTE (Pedido filtrado, Tiene/Pertenece como unidades de plato por pedido, Hace
+como total y suma de calificaciones por pedido), y sólo al final une esos
+agregados con las dimensiones. Así COUNT/SUM/AVG no corren sobre filas
+multiplicadas por menús×platos×calificaciones de cada pedido:
+- platos_populares: ingresos = unidades vendidas × precio; la calificación
+  promedio es la de las calificaciones de los pedidos, sin repetir una por cada
+  menú del pedido que contiene el plato
+- rendimiento_zonas: los pedidos se cuentan una vez, no una por repartidor que
+  cubre la zona
+- top_repartidores: cada pedido cuenta una vez aunque tenga varias calificaciones
+- clientes_activos: total_pedidos son pedidos (no filas pedido×plato), el
+  ticket promedio es valor consumido / pedidos
+
+Parámetros (todos opcionales, con los valores de las vistas materializadas por
+defecto): days (ventana hacia atrás), zona, estado (uno o varios separados por
+comas) y limit. rollups.py crea las vistas con los valores por defecto.
+
+compare ejecuta también las consultas anteriores (que unían las tablas de hechos
+antes de agregar) y exige: las mismas filas, salvo las que dejan de alcanzar un
+umbral (HAVING) sobre un conteo corregido; valores idénticos en las columnas
+que la corrección no toca; y en los conteos y sumas corregidos, valores
+menores o iguales que antes. Los promedios y los derivados de conteos
+corregidos sólo se informan.
+
+Uso: python dashboards.py compare   (sale con 1 si algo no se cumple)
+"""
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import postgresql
+
+MAX_DAYS = 3650
+MAX_LIMIT = 1000
+
+# Valores por defecto de cada dashboard (los de su vista materializada)
+DEFAULTS = {
+    'platos_populares': {'days': 30, 'zona': None, 'estados': ('Entregado',), 'limit': 15},
+    'rendimiento_zonas': {'days': 30, 'zona': None, 'estados': None, 'limit': None},
+    'top_repartidores': {'days': 30, 'zona': None, 'estados': ('En reparto', 'Entregado'), 'limit': None},
+    'clientes_activos': {'days': 60, 'zona': None, 'estados': ('Entregado',), 'limit': 20},
+}
+
+
+def pedido_filters(params, zona=True, extra=()):
+    """Condiciones sobre Pedido (alias pd) según los parámetros"""
+    where = ["pd.fecha >= CURRENT_DATE - make_interval(days => :days)"]
+    if params['estados']:
+        where.append("pd.estado IN :estados")
+    if zona and params['zona'] is not None:
+        where.append("pd.zona_entrega = :zona")
+    return '\n          AND '.join(where + list(extra))
+
+
+def platos_populares(params):
+    return f"""
+    WITH pedidos AS (
+        SELECT pd.id_pedido, pd.zona_entrega
+        FROM Pedido pd
+        WHERE {pedido_filters(params)}
+    ),
+    ventas AS (
+        -- Unidades de cada plato por pedido (una por menú que lo contiene)
+        SELECT t.id_pedido, pe.id_plato, m.id_administrador, COUNT(*) AS unidades
+        FROM Tiene t
+        JOIN pedidos USING (id_pedido)
+        JOIN Menu m ON m.id_menu = t.id_menu
+        JOIN Pertenece pe ON pe.id_menu = t.id_menu
+        GROUP BY t.id_pedido, pe.id_plato, m.id_administrador
+    ),
+    calificaciones AS (
+        SELECT h.id_pedido, COUNT(h.calificacion) AS total, SUM(h.calificacion) AS suma
+        FROM Hace h
+        JOIN pedidos USING (id_pedido)
+        GROUP BY h.id_pedido
+    ),
+    platos AS (
+        SELECT v.id_plato, v.id_administrador, pd.zona_entrega,
+               COUNT(*) AS total_pedidos,
+               SUM(v.unidades) AS unidades,
+               SUM(c.total) AS total_calificaciones,
+               SUM(c.suma) AS suma_calificaciones
+        FROM ventas v
+        JOIN pedidos pd USING (id_pedido)
+        LEFT JOIN calificaciones c USING (id_pedido)
+        GROUP BY v.id_plato, v.id_administrador, pd.zona_entrega
+    )
+    SELECT
+        p.id_plato,
+        pl.id_administrador,
+        u.nombre AS administrador_nombre,
+        u.apellido AS administrador_apellido,
+        p.nombre AS nombre_plato,
+        p.categoria,
+        p.precio,
+        u.nombre || ' ' || u.apellido AS administrador_creador,
+        pl.zona_entrega,
+        pl.total_pedidos,
+        ROUND(pl.suma_calificaciones::numeric / NULLIF(pl.total_calificaciones, 0), 2) AS calificacion_promedio,
+        COALESCE(pl.total_calificaciones, 0) AS total_calificaciones,
+        pl.unidades * p.precio AS ingresos_generados
+    FROM platos pl
+    JOIN Plato p ON p.id_plato = pl.id_plato
+    JOIN Administrador a ON a.id_usuario = pl.id_administrador
+    JOIN Usuario u ON u.id_usuario = a.id_usuario
+    """
+
+
+def rendimiento_zonas(params):
+    filters = pedido_filters(params, extra=("pd.hora_salida IS NOT NULL", "pd.hora_entrega IS NOT NULL",
+                                            "pd.hora_entrega_estimada IS NOT NULL"))
+    return f"""
+    WITH pedidos AS (
+        SELECT
+            pd.zona_entrega,
+            COUNT(*) AS total_entregas,
+            COUNT(*) FILTER (WHERE pd.estado = 'Entregado') AS entregas_exitosas,
+            AVG(EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_salida)) / 60) AS tiempo_promedio,
+            AVG(EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_entrega_estimada)) / 60) AS diferencia_promedio
+        FROM Pedido pd
+        WHERE {filters}
+        GROUP BY pd.zona_entrega
+    ),
+    repartidores AS (
+        SELECT
+            c.zona_entrega,
+            COUNT(DISTINCT c.id_usuario) AS repartidores_activos,
+            STRING_AGG(DISTINCT u.nombre || ' ' || u.apellido, ', ') AS nombres_repartidores
+        FROM Cubre c
+        JOIN Usuario u ON u.id_usuario = c.id_usuario
+        GROUP BY c.zona_entrega
+    )
+    SELECT
+        pd.zona_entrega,
+        ze.costo AS costo_zona,
+        pd.total_entregas,
+        pd.entregas_exitosas,
+        ROUND(pd.entregas_exitosas::numeric / pd.total_entregas * 100, 2) AS porcentaje_exito,
+        ROUND(pd.tiempo_promedio, 2) AS tiempo_promedio_minutos,
+        ROUND(pd.diferencia_promedio, 2) AS diferencia_estimado_real,
+        r.repartidores_activos,
+        r.nombres_repartidores
+    FROM pedidos pd
+    JOIN ZonaEntrega ze ON ze.nombre = pd.zona_entrega
+    JOIN repartidores r ON r.zona_entrega = pd.zona_entrega
+    WHERE pd.total_entregas >= 5
+    """
+
+
+def top_repartidores(params):
+    filters = pedido_filters(params, extra=("pd.hora_salida IS NOT NULL", "pd.hora_entrega IS NOT NULL"))
+    return f"""
+    WITH pedidos AS (
+        SELECT pd.id_pedido, pd.zona_entrega, pd.estado, pd.fecha, pd.hora_salida, pd.hora_entrega
+        FROM Pedido pd
+        WHERE {filters}
+    ),
+    calificaciones AS (
+        SELECT h.id_pedido, COUNT(h.calificacion) AS total, SUM(h.calificacion) AS suma
+        FROM Hace h
+        JOIN pedidos USING (id_pedido)
+        GROUP BY h.id_pedido
+    ),
+    zonas AS (
+        SELECT
+            pd.zona_entrega,
+            COUNT(*) AS entregas_realizadas,
+            COUNT(*) FILTER (WHERE pd.estado = 'Entregado') AS entregas_exitosas,
+            ROUND(SUM(c.suma)::numeric / NULLIF(SUM(c.total), 0), 2) AS calificacion_promedio,
+            ROUND(AVG(EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_salida)) / 60), 2) AS tiempo_promedio_entrega,
+            COUNT(DISTINCT DATE(pd.fecha)) AS dias_trabajados
+        FROM pedidos pd
+        LEFT JOIN calificaciones c USING (id_pedido)
+        GROUP BY pd.zona_entrega
+    )
+    SELECT
+        u.id_usuario,
+        u.nombre || ' ' || u.apellido AS nombre_repartidor,
+        t.telefono_emergencia,
+        c.zona_entrega,
+        z.entregas_realizadas,
+        z.entregas_exitosas,
+        ROUND(z.entregas_exitosas::numeric / z.entregas_realizadas * 100, 2) AS tasa_exito,
+        z.calificacion_promedio,
+        z.tiempo_promedio_entrega,
+        z.dias_trabajados,
+        ROW_NUMBER() OVER (
+            PARTITION BY c.zona_entrega
+            ORDER BY z.entregas_exitosas DESC, z.calificacion_promedio DESC, u.id_usuario
+        ) AS ranking_zona
+    FROM Usuario u
+    JOIN Trabajador t ON u.id_usuario = t.id_usuario
+    JOIN Repartidor r ON t.id_usuario = r.id_usuario
+    JOIN Cubre c ON r.id_usuario = c.id_usuario
+    JOIN zonas z ON z.zona_entrega = c.zona_entrega
+    WHERE z.entregas_realizadas >= 3
+    """
+
+
+def clientes_activos(params):
+    # La zona es la del cliente (Vive), no la de entrega de sus pedidos
+    zona = "AND v.zona_entrega = :zona" if params['zona'] is not None else ''
+    return f"""
+    WITH pedidos AS (
+        SELECT pd.id_pedido, pd.fecha
+        FROM Pedido pd
+        WHERE {pedido_filters(params, zona=False)}
+    ),
+    cliente_pedidos AS (
+        -- Pedidos calificados por cada usuario
+        SELECT ha.id_usuario, ha.id_pedido, pd.fecha
+        FROM Hace ha
+        JOIN pedidos pd USING (id_pedido)
+    ),
+    lineas AS (
+        SELECT t.id_pedido, pe.id_plato, p.precio, p.categoria
+        FROM Tiene t
+        JOIN pedidos USING (id_pedido)
+        JOIN Pertenece pe ON pe.id_menu = t.id_menu
+        JOIN Plato p ON p.id_plato = pe.id_plato
+    ),
+    ventas AS (
+        SELECT id_pedido, SUM(precio) AS valor
+        FROM lineas
+        GROUP BY id_pedido
+    ),
+    calificaciones AS (
+        SELECT h.id_pedido, COUNT(h.calificacion) AS total, SUM(h.calificacion) AS suma
+        FROM Hace h
+        JOIN pedidos USING (id_pedido)
+        GROUP BY h.id_pedido
+    ),
+    consumo AS (
+        SELECT
+            cp.id_usuario,
+            COUNT(*) AS total_pedidos,
+            COALESCE(SUM(v.valor), 0) AS valor_total_consumido,
+            COUNT(DISTINCT DATE(cp.fecha)) AS dias_activos,
+            SUM(c.suma) AS suma_calificaciones,
+            SUM(c.total) AS total_calificaciones,
+            MAX(cp.fecha) AS ultimo_pedido
+        FROM cliente_pedidos cp
+        LEFT JOIN ventas v USING (id_pedido)
+        LEFT JOIN calificaciones c USING (id_pedido)
+        GROUP BY cp.id_usuario
+    ),
+    platos AS (
+        SELECT
+            cp.id_usuario,
+            COUNT(DISTINCT l.id_plato) AS variedad_platos_consumidos,
+            STRING_AGG(DISTINCT l.categoria, ', ') AS categorias_preferidas
+        FROM cliente_pedidos cp
+        JOIN lineas l USING (id_pedido)
+        GROUP BY cp.id_usuario
+    )
+    SELECT
+        u.id_usuario,
+        u.nombre || ' ' || u.apellido AS nombre_cliente,
+        cl.empresa,
+        v.zona_entrega,
+        co.total_pedidos,
+        ROUND(co.valor_total_consumido / co.total_pedidos, 2) AS ticket_promedio,
+        co.valor_total_consumido,
+        COALESCE(pl.variedad_platos_consumidos, 0) AS variedad_platos_consumidos,
+        co.dias_activos,
+        ROUND(co.suma_calificaciones::numeric / NULLIF(co.total_calificaciones, 0), 2) AS calificacion_promedio,
+        co.ultimo_pedido,
+        pl.categorias_preferidas,
+        CASE
+            WHEN co.total_pedidos >= 20 THEN 'Cliente VIP'
+            WHEN co.total_pedidos >= 10 THEN 'Cliente Frecuente'
+            WHEN co.total_pedidos >= 5 THEN 'Cliente Regular'
+            ELSE 'Cliente Ocasional'
+        END AS categoria_fidelidad,
+        EXTRACT(DAYS FROM (CURRENT_DATE - co.ultimo_pedido)) AS dias_sin_pedido
+    FROM consumo co
+    JOIN Usuario u ON u.id_usuario = co.id_usuario
+    JOIN Cliente cl ON cl.id_usuario = u.id_usuario
+    JOIN Vive v ON v.id_usuario = u.id_usuario
+    LEFT JOIN platos pl ON pl.id_usuario = u.id_usuario
+    WHERE co.total_pedidos >= 3 {zona}
+    """
+
+
+# Consultas anteriores (uniendo las tablas de hechos antes de agregar), sólo para compare
+LEGACY_SQL = {
+    'platos_populares': """
+    SELECT
+        p.id_plato,
+        u.nombre AS administrador_nombre,
+        u.apellido AS administrador_apellido,
+        p.nombre AS nombre_plato,
+        p.categoria,
+        p.precio,
+        u.nombre || ' ' || u.apellido AS administrador_creador,
+        pd.zona_entrega,
+        COUNT(DISTINCT pd.id_pedido) AS total_pedidos,
+        ROUND(AVG(h.calificacion::numeric), 2) AS calificacion_promedio,
+        COUNT(h.calificacion) AS total_calificaciones,
+        SUM(p.precio) AS ingresos_generados
+    FROM Plato p
+    JOIN Pertenece pe ON p.id_plato = pe.id_plato
+    JOIN Menu m ON pe.id_menu = m.id_menu
+    JOIN Administrador a ON m.id_administrador = a.id_usuario
+    JOIN Usuario u ON a.id_usuario = u.id_usuario
+    JOIN Tiene t ON m.id_menu = t.id_menu
+    JOIN Pedido pd ON t.id_pedido = pd.id_pedido
+    LEFT JOIN Hace h ON pd.id_pedido = h.id_pedido
+    WHERE pd.fecha >= CURRENT_DATE - INTERVAL '30 days'
+      AND pd.estado = 'Entregado'
+    GROUP BY p.id_plato, p.nombre, p.categoria, p.precio,
+             u.nombre, u.apellido, pd.zona_entrega
+    HAVING COUNT(DISTINCT pd.id_pedido) >= 1
+    """,
+    'rendimiento_zonas': """
+    SELECT
+        pd.zona_entrega,
+        ze.costo AS costo_zona,
+        COUNT(pd.id_pedido) AS total_entregas,
+        COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END) AS entregas_exitosas,
+        ROUND(
+            COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END)::numeric /
+            COUNT(pd.id_pedido)::numeric * 100, 2
+        ) AS porcentaje_exito,
+        ROUND(AVG(
+            EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_salida)) / 60
+        ), 2) AS tiempo_promedio_minutos,
+        ROUND(AVG(
+            EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_entrega_estimada)) / 60
+        ), 2) AS diferencia_estimado_real,
+        COUNT(DISTINCT c.id_usuario) AS repartidores_activos,
+        STRING_AGG(DISTINCT u.nombre || ' ' || u.apellido, ', ') AS nombres_repartidores
+    FROM Pedido pd
+    JOIN ZonaEntrega ze ON pd.zona_entrega = ze.nombre
+    JOIN Cubre c ON pd.zona_entrega = c.zona_entrega
+    JOIN Usuario u ON c.id_usuario = u.id_usuario
+    WHERE pd.fecha >= CURRENT_DATE - INTERVAL '30 days'
+      AND pd.hora_salida IS NOT NULL
+      AND pd.hora_entrega IS NOT NULL
+      AND pd.hora_entrega_estimada IS NOT NULL
+    GROUP BY pd.zona_entrega, ze.costo
+    HAVING COUNT(pd.id_pedido) >= 5
+    """,
+    'top_repartidores': """
+    SELECT
+        u.id_usuario,
+        u.nombre || ' ' || u.apellido AS nombre_repartidor,
+        t.telefono_emergencia,
+        c.zona_entrega,
+        COUNT(pd.id_pedido) AS entregas_realizadas,
+        COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END) AS entregas_exitosas,
+        ROUND(
+            COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END)::numeric /
+            COUNT(pd.id_pedido)::numeric * 100, 2
+        ) AS tasa_exito,
+        ROUND(AVG(h.calificacion::numeric), 2) AS calificacion_promedio,
+        ROUND(AVG(
+            EXTRACT(EPOCH FROM (pd.hora_entrega - pd.hora_salida)) / 60
+        ), 2) AS tiempo_promedio_entrega,
+        COUNT(DISTINCT DATE(pd.fecha)) AS dias_trabajados,
+        ROW_NUMBER() OVER (
+            PARTITION BY c.zona_entrega
+            ORDER BY COUNT(CASE WHEN pd.estado = 'Entregado' THEN 1 END) DESC,
+                     AVG(h.calificacion::numeric) DESC
+        ) AS ranking_zona
+    FROM Usuario u
+    JOIN Trabajador t ON u.id_usuario = t.id_usuario
+    JOIN Repartidor r ON t.id_usuario = r.id_usuario
+    JOIN Cubre c ON r.id_usuario = c.id_usuario
+    JOIN Pedido pd ON pd.zona_entrega = c.zona_entrega
+    LEFT JOIN Hace h ON pd.id_pedido = h.id_pedido
+    WHERE pd.estado IN ('Entregado', 'En reparto')
+      AND pd.fecha >= CURRENT_DATE - INTERVAL '30 days'
+      AND pd.hora_salida IS NOT NULL
+      AND pd.hora_entrega IS NOT NULL
+    GROUP BY u.id_usuario, u.nombre, u.apellido, t.telefono_emergencia, c.zona_entrega
+    HAVING COUNT(pd.id_pedido) >= 3
+    """,
+    'clientes_activos': """
+    SELECT
+        u.id_usuario,
+        u.nombre || ' ' || u.apellido AS nombre_cliente,
+        cl.empresa,
+        v.zona_entrega,
+        COUNT(pd.id_pedido) AS total_pedidos,
+        ROUND(AVG(p.precio), 2) AS ticket_promedio,
+        SUM(p.precio) AS valor_total_consumido,
+        COUNT(DISTINCT pe.id_plato) AS variedad_platos_consumidos,
+        COUNT(DISTINCT DATE(pd.fecha)) AS dias_activos,
+        ROUND(AVG(h.calificacion::numeric), 2) AS calificacion_promedio,
+        MAX(pd.fecha) AS ultimo_pedido,
+        STRING_AGG(DISTINCT p.categoria, ', ') AS categorias_preferidas,
+        CASE
+            WHEN COUNT(pd.id_pedido) >= 20 THEN 'Cliente VIP'
+            WHEN COUNT(pd.id_pedido) >= 10 THEN 'Cliente Frecuente'
+            WHEN COUNT(pd.id_pedido) >= 5 THEN 'Cliente Regular'
+            ELSE 'Cliente Ocasional'
+        END AS categoria_fidelidad,
+        EXTRACT(DAYS FROM (CURRENT_DATE - MAX(pd.fecha))) AS dias_sin_pedido
+    FROM Usuario u
+    JOIN Cliente cl ON u.id_usuario = cl.id_usuario
+    JOIN Vive v ON u.id_usuario = v.id_usuario
+    JOIN Hace ha ON u.id_usuario = ha.id_usuario
+    JOIN Pedido pd ON ha.id_pedido = pd.id_pedido
+    JOIN Tiene t ON pd.id_pedido = t.id_pedido
+    JOIN Menu m ON t.id_menu = m.id_menu
+    JOIN Pertenece pe ON m.id_menu = pe.id_menu
+    JOIN Plato p ON pe.id_plato = p.id_plato
+    LEFT JOIN Hace h ON pd.id_pedido = h.id_pedido
+    WHERE pd.fecha >= CURRENT_DATE - INTERVAL '60 days'
+      AND pd.estado = 'Entregado'
+    GROUP BY u.id_usuario, u.nombre, u.apellido, cl.empresa, v.zona_entrega
+    HAVING COUNT(pd.id_pedido) >= 3
+    """,
+}
+
+
+# Columnas que cambian al no multiplicar filas: conteos y sumas que sólo pueden
+# bajar, y promedios o valores derivados de ellos, que pueden moverse en ambos sentidos
+DEINFLATED = {
+    'platos_populares': {'lower': ('total_calificaciones', 'ingresos_generados'),
+                         'free': ('calificacion_promedio',)},
+    'rendimiento_zonas': {'lower': ('total_entregas', 'entregas_exitosas'), 'free': ()},
+    'top_repartidores': {'lower': ('entregas_realizadas', 'entregas_exitosas'),
+                         'free': ('tasa_exito', 'calificacion_promedio', 'tiempo_promedio_entrega', 'ranking_zona')},
+    'clientes_activos': {'lower': ('total_pedidos', 'valor_total_consumido'),
+                         'free': ('ticket_promedio', 'calificacion_promedio', 'categoria_fidelidad')},
+}
+# Dashboards con un umbral mínimo sobre un conteo corregido: pueden perder filas, no ganarlas
+THRESHOLDS = {'rendimiento_zonas': 'total_entregas', 'top_repartidores': 'entregas_realizadas',
+              'clientes_activos': 'total_pedidos'}
+
+
+BUILDERS = {
+    'platos_populares': platos_populares,
+    'rendimiento_zonas': rendimiento_zonas,
+    'top_repartidores': top_repartidores,
+    'clientes_activos': clientes_activos,
+}
+
+
+def bounded_int(args, name, high):
+    try:
+        value = int(args[name])
+    except ValueError:
+        value = 0
+    if not 1 <= value <= high:
+        raise ValueError(f"{name} debe ser un entero entre 1 y {high}")
+    return value
+
+
+def parse_params(name, args):
+    """Parámetros de la petición sobre los valores por defecto; ValueError si no son válidos"""
+    params = dict(DEFAULTS[name])
+    if args.get('days'):
+        params['days'] = bounded_int(args, 'days', MAX_DAYS)
+    if args.get('zona'):
+        params['zona'] = args['zona']
+    if args.get('estado'):
+        params['estados'] = tuple(sorted({estado.strip() for estado in args['estado'].split(',') if estado.strip()}))
+    if args.get('limit'):
+        params['limit'] = bounded_int(args, 'limit', MAX_LIMIT)
+    return params
+
+
+def is_default(name, params):
+    """True si la vista materializada ya tiene la respuesta (filtros por defecto)"""
+    defaults = DEFAULTS[name]
+    return all(params[key] == defaults[key] for key in ('days', 'zona', 'estados'))
+
+
+def bind(sql, params):
+    """Consulta con los parámetros ligados (sólo los que aparecen en el SQL)"""
+    query = text(sql)
+    if params['estados']:
+        query = query.bindparams(bindparam('estados', value=list(params['estados']), expanding=True))
+    binds = {'days': params['days']}
+    if params['zona'] is not None:
+        binds['zona'] = params['zona']
+    if ':limit' in sql:
+        binds['limit'] = params['limit']
+    return query.bindparams(**binds)
+
+
+def aggregate_query(name, params=None):
+    """Consulta agregada (sin orden ni límite)"""
+    params = params or DEFAULTS[name]
+    return bind(BUILDERS[name](params), params)
+
+
+def ranked_query(name, params, columns, order):
+    """Consulta en vivo con las columnas, el orden y el límite del endpoint"""
+    sql = f"SELECT {', '.join(columns)} FROM ({BUILDERS[name](params)}) dashboard ORDER BY {order}"
+    if params['limit']:
+        sql += " LIMIT :limit"
+    return bind(sql, params)
+
+
+def aggregate_sql(name, params=None):
+    """SQL con los valores en línea (para CREATE MATERIALIZED VIEW)"""
+    compiled = aggregate_query(name, params).compile(dialect=postgresql.dialect(),
+                                                     compile_kwargs={'literal_binds': True})
+    return str(compiled)
+
+
+if __name__ == '__main__':
+    import sys
+
+    from db import engine
+    from rollups import ROLLUPS
+
+    if sys.argv[1:] != ['compare']:
+        print("Uso: python dashboards.py compare")
+        sys.exit(2)
+    # Columnas que identifican una fila en ambas versiones
+    keys = {'platos_populares': ['id_plato', 'administrador_nombre', 'administrador_apellido', 'zona_entrega'],
+            'rendimiento_zonas': ['zona_entrega'],
+            'top_repartidores': ['id_usuario', 'zona_entrega'],
+            'clientes_activos': ['id_usuario', 'zona_entrega']}
+
+    failures = 0
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        for name, rollup in ROLLUPS.items():
+            key = keys[name]
+            old = {tuple(row[k] for k in key): row for row in
+                   conn.execute(text(LEGACY_SQL[name])).mappings().fetchall()}
+            new = {tuple(row[k] for k in key): row for row in
+                   conn.execute(aggregate_query(name)).mappings().fetchall()}
+            shared = old.keys() & new.keys()
+            added, dropped = new.keys() - old.keys(), old.keys() - new.keys()
+            print(f"📊 {name}: {len(old):,} filas antes, {len(new):,} ahora, {len(shared):,} en ambas")
+            if added or (dropped and name not in THRESHOLDS):
+                print(f"   ❌ filas: {len(added):,} nuevas, {len(dropped):,} desaparecidas")
+                failures += len(added) + len(dropped)
+            elif dropped:
+                print(f"   ✅ filas: {len(dropped):,} ya no alcanzan el mínimo de {THRESHOLDS[name]}")
+            lower, free = DEINFLATED[name]['lower'], DEINFLATED[name]['free']
+            for column in rollup['columns']:
+                if column in key:
+                    continue
+                changed = [k for k in shared if old[k][column] != new[k][column]]
+                if column in free:
+                    print(f"   ℹ️  {column}: {len(changed):,} distintas (promedio o derivado de un conteo corregido)")
+                    continue
+                if column in lower:
+                    wrong = [k for k in changed if new[k][column] is None or old[k][column] is None
+                             or new[k][column] > old[k][column]]
+                    detail = f"{len(changed) - len(wrong):,} menores que antes, {len(wrong):,} mayores"
+                else:
+                    wrong = changed
+                    detail = f"{len(wrong):,} distintas"
+                print(f"   {'❌' if wrong else '✅'} {column}: {detail}")
+                failures += len(wrong)
+    if failures:
+        print(f"❌ {failures:,} diferencias inesperadas entre las consultas anteriores y las nuevas")
+        sys.exit(1)
+    print("✅ Las consultas nuevas sólo difieren donde las anteriores multiplicaban filas")
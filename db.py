@@ -0,0 +1,367 @@
+"""
+Capa de acceso a la base de datos.
+
+Un único engine por proceso (worker de gunicorn) con el pool dimensionado desde
+variables de entorno, sin echo de SQL, con pre-ping y reciclado de conexiones.
+Todo el estado de sesión es por transacción (statement_timeout con SET LOCAL),
+así que funciona detrás de pgbouncer en modo transaction pooling; con
+DB_PGBOUNCER=1 el pool lo hace pgbouncer y aquí no se retienen conexiones.
+
+connect() entrega una conexión con el statement_timeout de la ruta actual y
+mide cuánto se esperó por ella; pool_stats() resume esas esperas y cuántas
+conexiones hay en uso.
+
+Con DATABASE_REPLICA_URLS (réplicas de lectura separadas por comas) las rutas
+del dashboard, los listados y las exportaciones leen de una réplica, en round
+robin entre las sanas; las búsquedas puntuales (get_*, batch_*) van al
+primario salvo DB_REPLICA_LOOKUPS=1, y DB_ROUTE_TARGETS ajusta cualquier ruta
+(p. ej. "get_pedido=replica,list_pedidos=primary"). Un hilo de cada worker
+comprueba las réplicas cada DB_REPLICA_CHECK_SECONDS (la primera vez al
+arrancar, sin frenar las peticiones, que mientras tanto leen del primario):
+una réplica que no responde o con más de DB_REPLICA_MAX_LAG_SECONDS de retraso
+de replicación deja de usarse, y si no queda ninguna se lee del primario. Las
+conexiones a las réplicas esperan como mucho DB_REPLICA_CONNECT_TIMEOUT
+segundos, para que una caída no retenga las peticiones.
+
+Con SERVER_TIMING o METRICS activos, además se suma en
+`g` por petición el tiempo de ejecución, el de fetch, las filas leídas y la
+espera por el pool (los consumen la cabecera Server-Timing y metrics.py).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+import psycopg2.extensions
+from flask import g, has_request_context, request
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_flag(name, default='0'):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def parse_mapping(value, cast=int):
+    """'a=1,b=2' -> {'a': 1, 'b': 2}"""
+    return {name.strip(): cast(number.strip()) for name, number in
+            (item.split('=') for item in value.split(',') if item.strip())}
+
+
+def database_url(url=None):
+    url = url or os.environ.get('DATABASE_URL')
+    if not url:
+        raise RuntimeError("Define la variable de entorno DATABASE_URL con tu conexión a Postgres")
+    if url.startswith('postgres://'):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+# Conexiones por worker: DB_POOL_SIZE/DB_MAX_OVERFLOW, o bien un presupuesto
+# total DB_MAX_CONNECTIONS repartido entre los WEB_CONCURRENCY workers
+WORKERS = env_int('WEB_CONCURRENCY', 3)
+MAX_CONNECTIONS = env_int('DB_MAX_CONNECTIONS', 0)
+POOL_SIZE = env_int('DB_POOL_SIZE', max(1, MAX_CONNECTIONS // WORKERS) if MAX_CONNECTIONS else 5)
+MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 0 if MAX_CONNECTIONS else 5)
+POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 10)
+POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+PGBOUNCER = env_flag('DB_PGBOUNCER')
+ECHO = env_flag('DB_ECHO')
+
+# Con SERVER_TIMING=1 se mide el tiempo de cada petición dentro de la base y la
+# app lo devuelve en la cabecera Server-Timing (lo usa bench_api.py)
+SERVER_TIMING = env_flag('SERVER_TIMING')
+# Métricas por ruta en /metrics (ver metrics.py); METRICS=0 las desactiva
+METRICS = env_flag('METRICS', '1')
+REQUEST_TIMING = SERVER_TIMING or METRICS
+
+# statement_timeout en milisegundos: uno por defecto y ajustes por endpoint,
+# p. ej. DB_STATEMENT_TIMEOUTS="list_pedidos=2000,platos_populares=10000"
+STATEMENT_TIMEOUT_MS = env_int('DB_STATEMENT_TIMEOUT_MS', 5000)
+ROUTE_TIMEOUTS_MS = parse_mapping(os.environ.get('DB_STATEMENT_TIMEOUTS', ''))
+
+# Réplicas de lectura y a qué rutas sirven
+REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_CHECK_SECONDS = env_int('DB_REPLICA_CHECK_SECONDS', 5)
+REPLICA_CONNECT_TIMEOUT = env_int('DB_REPLICA_CONNECT_TIMEOUT', 2)
+REPLICA_LOOKUPS = env_flag('DB_REPLICA_LOOKUPS')
+ROUTE_TARGETS = parse_mapping(os.environ.get('DB_ROUTE_TARGETS', ''), str)
+DASHBOARD_ENDPOINTS = ('platos_populares', 'rendimiento_zonas', 'top_repartidores', 'clientes_activos')
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor que suma a la petición actual el tiempo de fetch y las filas leídas"""
+
+    def _fetched(self, start_time, rows):
+        if has_request_context():
+            g.db_fetch_seconds = g.get('db_fetch_seconds', 0.0) + time.perf_counter() - start_time
+            g.db_rows = g.get('db_rows', 0) + rows
+
+    def fetchone(self):
+        start_time = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start_time, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start_time = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start_time, len(rows))
+        return rows
+
+    def fetchall(self):
+        start_time = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start_time, len(rows))
+        return rows
+
+
+def create_db_engine(url, connect_timeout=None):
+    connect_args = {'cursor_factory': TimedCursor} if REQUEST_TIMING else {}
+    if connect_timeout:
+        connect_args['connect_timeout'] = connect_timeout
+    if PGBOUNCER:
+        return create_engine(url, echo=ECHO, poolclass=NullPool, connect_args=connect_args)
+    return create_engine(url, echo=ECHO, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                         pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE,
+                         pool_pre_ping=True, pool_use_lifo=True, connect_args=connect_args)
+
+
+def create_async_db_engine(url, connect_timeout=None):
+    """Engine asyncio (asyncpg) con el mismo dimensionado, para el modo ASGI"""
+    url = make_url(url).set(drivername='postgresql+asyncpg')
+    connect_args = {'timeout': connect_timeout} if connect_timeout else {}
+    # asyncpg no entiende sslmode (típico de Heroku): se traduce a su parámetro ssl
+    if 'sslmode' in url.query:
+        connect_args['ssl'] = url.query['sslmode']
+        url = url.difference_update_query(['sslmode'])
+    if PGBOUNCER:
+        # pgbouncer en transaction pooling no admite sentencias preparadas con nombre:
+        # sin la caché de asyncpg, sin la de SQLAlchemy, y con nombres únicos para
+        # las que asyncpg prepara igualmente (no chocan entre conexiones del servidor)
+        connect_args['statement_cache_size'] = 0
+        connect_args['prepared_statement_cache_size'] = 0
+        connect_args['prepared_statement_name_func'] = lambda: f"__asyncpg_{uuid4()}__"
+        return create_async_engine(url, echo=ECHO, poolclass=NullPool, connect_args=connect_args)
+    return create_async_engine(url, echo=ECHO, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                               pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE,
+                               pool_pre_ping=True, pool_use_lifo=True, connect_args=connect_args)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    context._started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.db_seconds = g.get('db_seconds', 0.0) + time.perf_counter() - context._started
+
+
+def db_time_ms():
+    """Milisegundos de ejecución de sentencias y fetch de filas en la petición actual"""
+    return (g.get('db_seconds', 0.0) + g.get('db_fetch_seconds', 0.0)) * 1000
+
+
+def create_app_engine(url, connect_timeout=None):
+    """Engine de la app, con la medición por petición si está activa"""
+    app_engine = create_db_engine(url, connect_timeout)
+    if REQUEST_TIMING:
+        event.listen(app_engine, 'before_cursor_execute', _before_execute)
+        event.listen(app_engine, 'after_cursor_execute', _after_execute)
+    return app_engine
+
+
+DATABASE_URL = database_url()
+engine = create_app_engine(DATABASE_URL)
+
+# Segundos de retraso de una réplica: 0 si ya reprodujo todo lo recibido (o si es
+# un servidor independiente); si no, desde la última transacción reproducida
+REPLICATION_LAG_SQL = """
+SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+
+class Replica:
+    def __init__(self, url):
+        self.url = database_url(url)
+        self.engine = create_app_engine(self.url, REPLICA_CONNECT_TIMEOUT)
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.checkouts = 0
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SET LOCAL statement_timeout = 2000"))
+                self.lag = float(conn.execute(text(REPLICATION_LAG_SQL)).scalar())
+            self.error = None
+            self.healthy = self.lag <= REPLICA_MAX_LAG_SECONDS
+        except Exception as error:
+            self.lag, self.error, self.healthy = None, str(error).splitlines()[0], False
+
+    def status(self):
+        return {'url': self.name, 'healthy': self.healthy, 'lag_seconds': self.lag, 'error': self.error,
+                'checkouts': self.checkouts}
+
+
+class Replicas:
+    """Réplicas de lectura con comprobación periódica y round robin entre las sanas"""
+
+    def __init__(self, urls):
+        self.replicas = [Replica(url) for url in urls]
+        self.lock = threading.Lock()
+        self.turn = 0
+        self.pid = None
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def start(self):
+        # El hilo se lanza en cada worker (los hilos no sobreviven al fork) y hace
+        # también la primera comprobación: pick() no espera a una réplica caída
+        self.pid = os.getpid()
+
+        def loop():
+            while True:
+                self.check()
+                time.sleep(REPLICA_CHECK_SECONDS)
+
+        threading.Thread(target=loop, name='replica-checker', daemon=True).start()
+
+    def pick(self):
+        """Siguiente réplica sana, o None si no hay ninguna (o aún no se comprobaron)"""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.start()
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                return None
+            self.turn += 1
+            replica = healthy[self.turn % len(healthy)]
+            replica.checkouts += 1
+            return replica
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose(close=False)
+
+
+replicas = Replicas(REPLICA_URLS)
+
+
+def dispose_engines():
+    """Descarta en un worker recién creado las conexiones heredadas del maestro (sin cerrarlas)"""
+    engine.dispose(close=False)
+    replicas.dispose()
+
+
+class PoolStats:
+    """Esperas al obtener conexión del pool y máximo de conexiones en uso"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use_max = 0
+
+    def record(self, wait, in_use):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.in_use_max = max(self.in_use_max, in_use)
+
+
+_stats = PoolStats()
+
+
+def route_timeout_ms():
+    endpoint = request.endpoint if has_request_context() else None
+    return ROUTE_TIMEOUTS_MS.get(endpoint, STATEMENT_TIMEOUT_MS)
+
+
+def route_target(endpoint=None):
+    """'replica' o 'primary' para `endpoint` (por defecto, la ruta actual)"""
+    if endpoint is None and has_request_context():
+        endpoint = request.endpoint
+    if endpoint is None:
+        return 'primary'
+    if endpoint in ROUTE_TARGETS:
+        return ROUTE_TARGETS[endpoint]
+    if endpoint in DASHBOARD_ENDPOINTS or endpoint.startswith(('list_', 'export_')):
+        return 'replica'
+    if endpoint.startswith(('get_', 'batch_')) and REPLICA_LOOKUPS:
+        return 'replica'
+    return 'primary'
+
+
+def checkout(target):
+    """Conexión de una réplica sana si `target` es 'replica' y hay alguna; si no, del primario"""
+    if target == 'replica' and replicas.replicas:
+        replica = replicas.pick()
+        if replica is not None:
+            try:
+                return replica.engine.connect()
+            except Exception as error:
+                # Hasta la próxima comprobación se lee del primario
+                replica.healthy, replica.error = False, str(error).splitlines()[0]
+    return engine.connect()
+
+
+def in_use():
+    pool = engine.pool
+    return pool.checkedout() if hasattr(pool, 'checkedout') else 0
+
+
+@contextmanager
+def connect(timeout_ms=None, target=None):
+    """Conexión del pool con statement_timeout local a su transacción.
+
+    `target` ('replica' o 'primary') sustituye al destino de la ruta actual.
+    """
+    start_time = time.perf_counter()
+    conn = checkout(target or route_target())
+    wait = time.perf_counter() - start_time
+    if conn.engine is engine:
+        _stats.record(wait, in_use())
+    if has_request_context():
+        g.pool_wait_seconds = g.get('pool_wait_seconds', 0.0) + wait
+    try:
+        conn.execute(text("SELECT set_config('statement_timeout', :ms, true)"),
+                     {'ms': str(timeout_ms or route_timeout_ms())})
+        yield conn
+    finally:
+        conn.close()
+
+
+def pool_stats():
+    pool = engine.pool
+    with _stats.lock:
+        checkouts = _stats.checkouts
+        stats = {
+            'pid': os.getpid(),
+            'pool': type(pool).__name__,
+            'in_use': in_use(),
+            'in_use_max': _stats.in_use_max,
+            'checkouts': checkouts,
+            'checkout_wait_ms_avg': round(_stats.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+            'checkout_wait_ms_max': round(_stats.wait_max * 1000, 3),
+        }
+    if hasattr(pool, 'size'):
+        stats.update(size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+    if replicas.replicas:
+        stats['replicas'] = [replica.status() for replica in replicas.replicas]
+    return stats
@@ -0,0 +1,23 @@
+# Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo)
+# Con --preload la app, su esquema y las vistas del dashboard se preparan una
+# sola vez en el proceso maestro y los workers nacen con todo en memoria.
+import os
+
+preload_app = True
+
+# Snapshot del esquema activado: con un directorio de estado privado (0700, ver
+# state.py) el maestro no vuelve a reflejar el esquema en cada arranque
+os.environ.setdefault('APP_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'var'))
+
+
+def on_starting(server):
+    # Los volcados de métricas de una ejecución anterior no se suman a los de ésta
+    from metrics import clear_dir
+    clear_dir()
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el maestro no se comparten con los workers:
+    # cada worker descarta las heredadas (sin cerrarlas) y abre las suyas
+    from db import dispose_engines
+    dispose_engines()
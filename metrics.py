@@ -0,0 +1,230 @@
+"""
+Métricas por ruta en formato Prometheus (/metrics).
+
+Cada petición de la app Flask registra, por endpoint, histogramas de:
+- latencia total
+- tiempo de ejecución de sentencias y de fetch de filas (medidos en db.py)
+- tiempo fuera de la base (serialización de filas y Flask)
+- espera por una conexión del pool
+- filas leídas
+y un contador de peticiones por código de estado. Los histogramas son de cubos
+fijos en memoria: registrar una petición son unas pocas búsquedas binarias bajo
+un lock. Las respuestas en streaming (exportaciones) se miden hasta que
+empieza el envío. El modo ASGI no está instrumentado.
+
+Un hilo de cada worker de gunicorn vuelca su estado cada METRICS_FLUSH_SECONDS
+(si cambió) a un archivo propio en METRICS_DIR (por defecto metrics/ dentro de
+APP_STATE_DIR, privado como en state.py), y /metrics suma los de todos los workers
+(los de workers ya terminados también, para que los contadores no retrocedan;
+gunicorn.conf.py vacía el directorio al arrancar el maestro).
+
+Con SLOW_QUERY_MS > 0 las sentencias de los endpoints de dashboard (y los
+refrescos de sus vistas) que tarden más se registran con su plan EXPLAIN
+(EXPLAIN ANALYZE con SLOW_QUERY_ANALYZE=1).
+"""
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from db import DASHBOARD_ENDPOINTS, METRICS, env_flag, env_int, replicas
+from state import private_dir, state_path
+
+METRICS_DIR = state_path('metrics', 'METRICS_DIR')
+FLUSH_SECONDS = env_int('METRICS_FLUSH_SECONDS', 5)
+SLOW_QUERY_MS = env_int('SLOW_QUERY_MS', 0)
+SLOW_QUERY_ANALYZE = env_flag('SLOW_QUERY_ANALYZE')
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+# nombre: (ayuda, cubos)
+HISTOGRAMS = {
+    'fredys_request_seconds': ('Latencia total de la petición', SECONDS_BUCKETS),
+    'fredys_db_execute_seconds': ('Tiempo ejecutando sentencias en la base', SECONDS_BUCKETS),
+    'fredys_db_fetch_seconds': ('Tiempo leyendo filas de la base', SECONDS_BUCKETS),
+    'fredys_serialize_seconds': ('Tiempo fuera de la base: serialización de filas y Flask', SECONDS_BUCKETS),
+    'fredys_pool_wait_seconds': ('Espera por una conexión del pool', SECONDS_BUCKETS),
+    'fredys_db_rows': ('Filas leídas de la base', ROWS_BUCKETS),
+}
+REQUESTS_COUNTER = 'fredys_requests_total'
+
+
+class Registry:
+    """Histogramas y contador de este proceso: {nombre: {ruta: [cubos..., suma, total]}}"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.requests = {}
+        self.dirty = False
+        self.flusher = None
+
+    def observe(self, name, route, value):
+        buckets = HISTOGRAMS[name][1]
+        series = self.histograms[name].get(route)
+        if series is None:
+            series = self.histograms[name][route] = [0] * (len(buckets) + 2)
+        # Cubo no acumulado; se acumulan al exportar
+        series[bisect_left(buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def record(self, route, status, seconds):
+        with self.lock:
+            for name, value in seconds.items():
+                self.observe(name, route, value)
+            key = f"{route}|{status}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.dirty = True
+            if self.flusher is None:
+                # Se lanza con la primera petición, ya dentro del worker
+                self.flusher = threading.Thread(target=self.flush_loop, name='metrics-flusher', daemon=True)
+                self.flusher.start()
+
+    def snapshot(self):
+        with self.lock:
+            return {'histograms': json.loads(json.dumps(self.histograms)), 'requests': dict(self.requests)}
+
+    def flush_loop(self):
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            if self.dirty:
+                try:
+                    self.flush()
+                except OSError as error:
+                    print(f"❌ Error volcando métricas: {error}")
+                    sys.stdout.flush()
+
+    def flush(self):
+        """Vuelca el estado de este worker a su archivo (atómico)"""
+        self.dirty = False
+        path = os.path.join(private_dir(METRICS_DIR), f"worker_{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as output:
+            json.dump(self.snapshot(), output)
+        os.replace(path + '.tmp', path)
+
+
+_registry = Registry()
+
+
+def clear_dir():
+    """Borra los volcados de una ejecución anterior (gunicorn.conf.py, al arrancar el maestro)"""
+    for path in glob.glob(os.path.join(private_dir(METRICS_DIR), 'worker_*.json')):
+        os.remove(path)
+
+
+def merged():
+    """Suma de los volcados de todos los workers"""
+    _registry.flush()
+    total = {'histograms': {name: {} for name in HISTOGRAMS}, 'requests': {}}
+    for path in glob.glob(os.path.join(METRICS_DIR, 'worker_*.json')):
+        try:
+            with open(path) as dump:
+                worker = json.load(dump)
+        except (OSError, ValueError):
+            continue
+        for name, routes in worker['histograms'].items():
+            for route, series in routes.items():
+                current = total['histograms'][name].setdefault(route, [0] * len(series))
+                total['histograms'][name][route] = [a + b for a, b in zip(current, series)]
+        for key, count in worker['requests'].items():
+            total['requests'][key] = total['requests'].get(key, 0) + count
+    return total
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """Texto de exposición de Prometheus (versión 0.0.4)"""
+    data = merged()
+    lines = [f"# HELP {REQUESTS_COUNTER} Peticiones atendidas por ruta y código de estado",
+             f"# TYPE {REQUESTS_COUNTER} counter"]
+    for key, count in sorted(data['requests'].items()):
+        route, status = key.rsplit('|', 1)
+        lines.append(f'{REQUESTS_COUNTER}{{route="{label(route)}",status="{status}"}} {count}')
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        for route, series in sorted(data['histograms'][name].items()):
+            route = label(route)
+            cumulative = 0
+            for bound, count in zip(buckets, series):
+                cumulative += count
+                lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{route="{route}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{name}_sum{{route="{route}"}} {round(series[-2], 6)}')
+            lines.append(f'{name}_count{{route="{route}"}} {series[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _started():
+    g.metrics_started = time.perf_counter()
+
+
+def _finished(response):
+    started = g.get('metrics_started')
+    if started is None or request.endpoint == 'metrics':
+        return response
+    total = time.perf_counter() - started
+    execute = g.get('db_seconds', 0.0)
+    fetch = g.get('db_fetch_seconds', 0.0)
+    wait = g.get('pool_wait_seconds', 0.0)
+    _registry.record(request.endpoint or 'sin_ruta', response.status_code, {
+        'fredys_request_seconds': total,
+        'fredys_db_execute_seconds': execute,
+        'fredys_db_fetch_seconds': fetch,
+        'fredys_serialize_seconds': max(0.0, total - execute - fetch - wait),
+        'fredys_pool_wait_seconds': wait,
+        'fredys_db_rows': g.get('db_rows', 0),
+    })
+    return response
+
+
+def explain(cursor, statement, parameters=None):
+    options = '(ANALYZE, BUFFERS)' if SLOW_QUERY_ANALYZE else ''
+    cursor.execute(f"EXPLAIN {options} {statement}", parameters)
+    return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def log_slow_query(dbapi_connection, statement, parameters, elapsed, source):
+    """Imprime una sentencia lenta con su plan; un fallo del EXPLAIN no afecta a la petición"""
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            plan = explain(cursor, statement, parameters)
+        finally:
+            cursor.close()
+    except Exception as error:
+        plan = f"(EXPLAIN no disponible: {error})"
+    print(f"🐢 Consulta lenta en {source}: {elapsed * 1000:.1f}ms\n{statement.strip()}\n{plan}")
+    sys.stdout.flush()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_started', None)
+    if started is None or not has_request_context() or request.endpoint not in DASHBOARD_ENDPOINTS:
+        return
+    elapsed = time.perf_counter() - started
+    # Los cursores con nombre (streaming) siguen abiertos: no se puede lanzar otra sentencia
+    if elapsed * 1000 >= SLOW_QUERY_MS and not getattr(cursor, 'name', None):
+        log_slow_query(cursor.connection, statement, parameters, elapsed, request.endpoint)
+
+
+def instrument(app, engine):
+    """Registra las métricas de cada petición de `app` y el registro de consultas lentas"""
+    if METRICS:
+        app.before_request(_started)
+        app.after_request(_finished)
+    if SLOW_QUERY_MS > 0:
+        # Los dashboards se leen de las réplicas si las hay
+        for target in [engine] + [replica.engine for replica in replicas.replicas]:
+            event.listen(target, 'after_cursor_execute', _after_execute)
@@ -0,0 +1,221 @@
+"""
+Índices para las consultas del dashboard y las búsquedas get_*.
+
+Migración idempotente: cada índice se crea con CREATE INDEX CONCURRENTLY IF NOT
+EXISTS (sin bloquear escrituras) y si una ejecución anterior dejó uno inválido
+a medias se elimina y se vuelve a crear. Después se ejecuta ANALYZE de las
+tablas tocadas. En las tablas particionadas (ver partitions.py) el índice se
+crea ON ONLY en la tabla padre, CONCURRENTLY en cada partición y se une con
+ALTER INDEX ... ATTACH PARTITION; el padre queda válido cuando están todas.
+
+`check` ejecuta EXPLAIN (ANALYZE, BUFFERS) de cada consulta del dashboard y de
+una búsqueda por lotes de pedidos, y falla si el plan recorre Pedido o Hace con
+un Seq Scan que descarta la mayoría de las filas que lee: eso es un índice que
+falta. Un Seq Scan que usa casi toda la tabla (p. ej. cuando la ventana de
+fechas cubre todo el historial, o el lado completo de un hash join) es el plan
+correcto y sólo se informa. Pensado para datasets de ~1M de filas. Con
+--plan-only se usa EXPLAIN sin ANALYZE y las filas estimadas, para consultas
+demasiado caras de ejecutar.
+
+Uso: python migrations.py apply
+     python migrations.py check [--plan-only]
+"""
+import json
+import sys
+import time
+
+from sqlalchemy import text
+
+from rollups import ROLLUPS
+
+# (nombre, tabla, definición, para qué consulta)
+INDEXES = [
+    # Pedido: ventana de fechas de platos_populares/clientes_activos (sólo entregados)
+    ('pedido_entregado_fecha_idx', 'pedido',
+     "(fecha) INCLUDE (id_pedido, zona_entrega, id_cliente) WHERE estado = 'Entregado'",
+     'platos_populares, clientes_activos'),
+    # Pedido: rendimiento_zonas sólo mira pedidos con horas de salida y entrega;
+    # el INCLUDE permite index-only scans sin tocar la tabla
+    ('pedido_fecha_zona_horas_idx', 'pedido',
+     "(fecha, zona_entrega) INCLUDE (id_pedido, estado, hora_salida, hora_entrega, hora_entrega_estimada) "
+     "WHERE hora_salida IS NOT NULL AND hora_entrega IS NOT NULL",
+     'rendimiento_zonas'),
+    # Pedido: top_repartidores une por zona y sólo cuenta pedidos entregados o en reparto
+    ('pedido_reparto_zona_fecha_idx', 'pedido',
+     "(zona_entrega, fecha) INCLUDE (id_pedido, estado, hora_salida, hora_entrega) "
+     "WHERE estado IN ('Entregado', 'En reparto') AND hora_salida IS NOT NULL AND hora_entrega IS NOT NULL",
+     'top_repartidores'),
+    ('pedido_fecha_idx', 'pedido', '(fecha)', 'exportación por rango de fechas'),
+    ('pedido_cliente_idx', 'pedido', '(id_cliente, fecha)', 'pedidos por cliente'),
+    # Listado de pedidos con ?estado=&zona_entrega=, en el orden de la clave primaria
+    ('pedido_estado_zona_idx', 'pedido', '(estado, zona_entrega, id_pedido)', 'listado de pedidos filtrado'),
+    ('plato_categoria_idx', 'plato', '(categoria, id_plato)', 'listado de platos por categoría'),
+    # Hace: el LEFT JOIN por id_pedido sólo lee la calificación
+    ('hace_pedido_calificacion_idx', 'hace', '(id_pedido) INCLUDE (calificacion)',
+     'platos_populares, top_repartidores, clientes_activos'),
+    ('hace_usuario_idx', 'hace', '(id_usuario, id_pedido)', 'clientes_activos'),
+    # Relaciones recorridas en sentido contrario a su clave primaria
+    ('tiene_menu_idx', 'tiene', '(id_menu, id_pedido)', 'platos_populares'),
+    ('pertenece_plato_idx', 'pertenece', '(id_plato, id_menu)', 'platos_populares'),
+    ('cubre_usuario_idx', 'cubre', '(id_usuario, zona_entrega)', 'top_repartidores'),
+    ('vive_usuario_idx', 'vive', '(id_usuario, zona_entrega)', 'clientes_activos'),
+    ('menu_administrador_idx', 'menu', '(id_administrador)', 'platos_populares'),
+]
+
+# Tablas en las que check no admite Seq Scan
+NO_SEQ_SCAN = ('pedido', 'hace')
+
+INDEX_STATE_SQL = """
+SELECT i.indisvalid FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname = :name AND n.nspname = current_schema()
+"""
+
+
+PARTITIONS_SQL = """
+SELECT c.relname FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = to_regclass(:table)
+ORDER BY c.relname
+"""
+
+# Partición que ya tiene un índice unido al índice padre
+ATTACHED_SQL = """
+SELECT 1 FROM pg_inherits i
+JOIN pg_index x ON x.indexrelid = i.inhrelid
+WHERE i.inhparent = to_regclass(:name) AND x.indrelid = to_regclass(:partition)
+"""
+
+
+def is_partitioned(conn, table):
+    return bool(conn.execute(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+                             {'table': table}).scalar())
+
+
+def create_partitioned_index(conn, name, table, definition):
+    """Índice en una tabla particionada sin bloquear escrituras en las particiones"""
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {definition}"))
+    for partition in conn.execute(text(PARTITIONS_SQL), {'table': table}).scalars().all():
+        if conn.execute(text(ATTACHED_SQL), {'name': name, 'partition': partition}).scalar():
+            continue
+        child = f"{name}_{partition}"
+        if conn.execute(text(INDEX_STATE_SQL), {'name': child}).scalar() is False:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {child}"))
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {definition}"))
+        conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {child}"))
+
+
+def apply(engine):
+    """Crea los índices que falten; devuelve los nombres creados"""
+    created = []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text("SET statement_timeout = 0"))
+        for name, table, definition, purpose in INDEXES:
+            valid = conn.execute(text(INDEX_STATE_SQL), {'name': name}).scalar()
+            if valid:
+                continue
+            start_time = time.time()
+            if is_partitioned(conn, table):
+                # Un padre inválido sólo espera a que se unan los índices que faltan
+                create_partitioned_index(conn, name, table, definition)
+                print(f"✅ {name} ({purpose}) en {time.time() - start_time:.1f}s")
+                created.append(name)
+                continue
+            if valid is False:
+                print(f"⚠️  {name} quedó inválido en una ejecución anterior, recreando...")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"))
+            print(f"✅ {name} ({purpose}) en {time.time() - start_time:.1f}s")
+            created.append(name)
+        for table in sorted({table for name, table, _, _ in INDEXES if name in created}):
+            conn.execute(text(f"ANALYZE {table}"))
+        conn.execute(text("RESET statement_timeout"))
+    return created
+
+
+def parallel_divisor(workers):
+    """Reparto de filas que estima Postgres entre los workers y el líder de un Gather"""
+    return workers + max(0.0, 1.0 - 0.3 * workers)
+
+
+def seq_scans(plan, table_rows, divisor=1.0, parents=None):
+    """Seq Scan sobre tablas de NO_SEQ_SCAN (o sus particiones) en el plan (JSON de EXPLAIN):
+    [(tabla, filas, descartadas)]"""
+    found = []
+    relation = plan.get('Relation Name')
+    table = (parents or {}).get(relation, relation)
+    # Recorrer una partición vacía (p. ej. las futuras) no cuesta nada
+    empty = relation != table and table_rows.get(relation, 0) <= 0
+    if plan.get('Node Type') == 'Seq Scan' and table in NO_SEQ_SCAN and not empty:
+        if 'Actual Rows' in plan:
+            loops = plan.get('Actual Loops', 1)
+            kept = plan['Actual Rows'] * loops
+            removed = plan.get('Rows Removed by Filter', 0) * loops
+        else:
+            # Bajo un Gather las filas estimadas son por proceso
+            kept = plan['Plan Rows'] * (divisor if plan.get('Parallel Aware') else 1.0)
+            removed = max(0, table_rows.get(relation, 0) - kept) if 'Filter' in plan else 0
+        found.append((relation, kept, removed))
+    if plan.get('Node Type') in ('Gather', 'Gather Merge'):
+        divisor = parallel_divisor(plan.get('Workers Planned', 0))
+    for child in plan.get('Plans', []):
+        found += seq_scans(child, table_rows, divisor, parents)
+    return found
+
+
+def check_queries():
+    queries = {name: rollup['sql'] for name, rollup in ROLLUPS.items()}
+    queries['batch_pedidos'] = "SELECT * FROM pedido WHERE id_pedido = ANY(ARRAY(SELECT generate_series(1, 500)))"
+    return queries
+
+
+def check(engine, analyze=True):
+    """EXPLAIN de cada consulta; devuelve {consulta: [tablas con Seq Scan que descarta la mayoría]}"""
+    options = 'ANALYZE, BUFFERS, FORMAT JSON' if analyze else 'FORMAT JSON'
+    failures = {}
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        # Particiones de Pedido/Hace: cuentan como su tabla padre
+        parents = dict(conn.execute(text(
+            "SELECT c.relname, p.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = ANY(:tables)"), {'tables': list(NO_SEQ_SCAN)}).fetchall())
+        table_rows = dict(conn.execute(text(
+            "SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(:tables)"),
+            {'tables': list(NO_SEQ_SCAN) + list(parents)}).fetchall())
+        for name, sql in check_queries().items():
+            plan = conn.execute(text(f"EXPLAIN ({options}) {sql}")).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            top = plan[0]
+            scans = seq_scans(top['Plan'], table_rows, parents=parents)
+            wasteful = sorted({table for table, kept, removed in scans if removed > kept})
+            if analyze:
+                buffers = top['Plan'].get('Shared Hit Blocks', 0) + top['Plan'].get('Shared Read Blocks', 0)
+                cost = f"{top['Execution Time']:.1f}ms, {buffers:,} buffers"
+            else:
+                cost = f"coste estimado {top['Plan']['Total Cost']:,.0f}"
+            print(f"{'❌' if wasteful else '✅'} {name}: {cost}")
+            for table, kept, removed in scans:
+                verdict = 'descarta la mayoría: falta un índice' if removed > kept else 'usa casi toda la tabla'
+                print(f"   Seq Scan en {table}: {kept:,.0f} filas, {removed:,.0f} descartadas ({verdict})")
+            if wasteful:
+                failures[name] = wasteful
+        conn.rollback()
+    return failures
+
+
+if __name__ == '__main__':
+    from db import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'apply'
+    if command == 'apply':
+        created = apply(engine)
+        print(f"🗂️  Índices creados: {len(created)} (ya existían: {len(INDEXES) - len(created)})")
+    elif command == 'check':
+        if check(engine, analyze='--plan-only' not in sys.argv):
+            sys.exit(1)
+    else:
+        print("Uso: python migrations.py [apply|check]")
+        sys.exit(2)
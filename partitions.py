@@ -0,0 +1,426 @@
+"""
+Particionado por rango de Pedido (por fecha) y de Hace (por id_pedido).
+
+Las consultas del dashboard leen Pedido en ventanas de 30/60 días: con la tabla
+particionada por semana (o por día, PEDIDO_PARTITION_INTERVAL) el planificador
+descarta las particiones fuera de la ventana, y vacuum y ANALYZE trabajan
+partición a partición en lugar de sobre todo el historial.
+
+Hace no tiene fecha, así que se particiona por bloques de HACE_PARTITION_IDS
+id_pedido. Los id_pedido salen de la secuencia en orden de llegada (el seeder
+también reparte las fechas en orden de ID), así que cada bloque corresponde a
+un tramo de tiempo y se archiva cuando en Pedido ya no queda ningún pedido suyo.
+
+Postgres obliga a dos cambios de esquema:
+- La clave primaria de Pedido pasa a ser (id_pedido, fecha) y fecha es NOT NULL.
+- Tiene y Hace dejan de tener clave foránea a Pedido (exigiría una clave única
+  sólo sobre id_pedido); la unicidad de id_pedido la da su secuencia.
+
+Cada tabla tiene además una partición DEFAULT para las filas fuera de rango; al
+crear una partición se le traspasan las filas de su rango.
+
+`convert` migra una base existente. `maintain` crea las particiones de los
+próximos PEDIDO_PARTITIONS_AHEAD periodos y los bloques de Hace que la
+secuencia va a necesitar y, con PEDIDO_RETENTION_DAYS, separa las particiones
+antiguas (DETACH) y las mueve al esquema `archivo` sin borrar datos. La app lo
+ejecuta en un hilo cada PARTITION_MAINTENANCE_SECONDS.
+
+Uso: python partitions.py convert | maintain | status
+"""
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from rollups import ROLLUPS, ensure_rollups
+
+# Periodo de cada partición de Pedido: 'day' o 'week' (semanas de lunes a domingo)
+INTERVAL = os.environ.get('PEDIDO_PARTITION_INTERVAL', 'week')
+INTERVAL_DAYS = {'day': 1, 'week': 7}
+# Periodos futuros que se dejan creados por adelantado
+AHEAD = int(os.environ.get('PEDIDO_PARTITIONS_AHEAD', 4))
+# Días de historial que se conservan en la tabla (0 no archiva nunca)
+RETENTION_DAYS = int(os.environ.get('PEDIDO_RETENTION_DAYS', 0))
+HACE_BLOCK = int(os.environ.get('HACE_PARTITION_IDS', 1000000))
+MAINTENANCE_SECONDS = int(os.environ.get('PARTITION_MAINTENANCE_SECONDS', 3600))
+# Espera máxima de maintain() por el lock de la tabla padre (CREATE/ATTACH/DETACH
+# PARTITION): mejor fallar y reintentar en la próxima pasada que dejar en cola
+# todo el tráfico detrás de una lectura larga
+LOCK_TIMEOUT = os.environ.get('PARTITION_LOCK_TIMEOUT', '5s')
+ARCHIVE_SCHEMA = 'archivo'
+# Clave del advisory lock del mantenimiento (la de rollups.py es 80080)
+LOCK_KEY = 80081
+
+# Tabla -> columna de partición
+KEYS = {'pedido': 'fecha', 'hace': 'id_pedido'}
+
+PARTITIONS_SQL = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = %s::regclass
+"""
+BOUND_RE = re.compile(r"FROM \('?([^')]+)'?\) TO \('?([^')]+)'?\)")
+
+# Índices secundarios (sin los que respaldan restricciones) y claves foráneas de una tabla
+INDEXES_SQL = """
+SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+WHERE i.indrelid = %s::regclass
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+"""
+# Restricciones de una tabla con su tipo y sus columnas
+CONSTRAINTS_SQL = """
+SELECT k.conname, k.contype, pg_get_constraintdef(k.oid),
+       ARRAY(SELECT a.attname FROM pg_attribute a WHERE a.attrelid = k.conrelid AND a.attnum = ANY(k.conkey))
+FROM pg_constraint k
+WHERE k.conrelid = %s::regclass AND k.contype = ANY(%s)
+"""
+
+# Secuencia, DEFAULT y si es IDENTITY de pedido.id_pedido
+SERIAL_SQL = """
+SELECT pg_get_serial_sequence('pedido', 'id_pedido'), pg_get_expr(d.adbin, d.adrelid), a.attidentity <> ''
+FROM pg_attribute a
+LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+WHERE a.attrelid = 'pedido'::regclass AND a.attname = 'id_pedido'
+"""
+
+
+def period_start(moment, interval=INTERVAL):
+    day = datetime(moment.year, moment.month, moment.day)
+    if interval == 'week':
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def periods(since, until, interval=INTERVAL):
+    """Periodos [desde, hasta) que cubren de since a until"""
+    step = timedelta(days=INTERVAL_DAYS[interval])
+    start = period_start(since, interval)
+    while start <= until:
+        yield start, start + step
+        start += step
+
+
+def partition_name(table, lo):
+    return f"pedido_p{lo:%Y%m%d}" if table == 'pedido' else f"hace_p{lo}"
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def partitions(cur, table):
+    """Particiones de rango de `table` ordenadas: [(nombre, desde, hasta)], sin la DEFAULT"""
+    cur.execute(PARTITIONS_SQL, (table,))
+    parse = datetime.fromisoformat if table == 'pedido' else int
+    found = []
+    for name, bound in cur.fetchall():
+        match = BOUND_RE.search(bound)
+        if match:
+            found.append((name, parse(match[1]), parse(match[2])))
+    return sorted(found, key=lambda partition: partition[1])
+
+
+def overlaps(existing, lo, hi):
+    return any(lo < end and start < hi for _, start, end in existing)
+
+
+def create_partition(cur, table, lo, hi):
+    """Crea la partición [lo, hi) de `table`, traspasándole las filas de su rango que hubiera en la DEFAULT"""
+    name = partition_name(table, lo)
+    column = KEYS[table]
+    default = f"{table}_default"
+    create = f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)"
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= %s AND {column} < %s)", (lo, hi))
+    if not cur.fetchone()[0]:
+        cur.execute(create, (lo, hi))
+        return name
+    # Postgres no admite una partición nueva si la DEFAULT ya tiene filas de su rango
+    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    cur.execute(create, (lo, hi))
+    cur.execute(f"WITH traspaso AS (DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM traspaso", (lo, hi))
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+    return name
+
+
+def last_pedido_id(cur):
+    cur.execute("SELECT pg_get_serial_sequence('pedido', 'id_pedido')")
+    cur.execute(f"SELECT last_value FROM {cur.fetchone()[0]}")
+    return cur.fetchone()[0]
+
+
+def ensure_partitions(cur, since=None, ahead=AHEAD, interval=INTERVAL):
+    """Crea las particiones de Pedido desde `since` (por defecto hoy) hasta `ahead` periodos
+    en el futuro, y los bloques de Hace hasta uno más allá del último id_pedido de la secuencia"""
+    created = []
+    now = datetime.now()
+    existing = partitions(cur, 'pedido')
+    until = now + timedelta(days=INTERVAL_DAYS[interval] * ahead)
+    for lo, hi in periods(since or now, until, interval):
+        # Un periodo que se solapa con otro ya creado (p. ej. tras cambiar el intervalo) se omite
+        if not overlaps(existing, lo, hi):
+            created.append(create_partition(cur, 'pedido', lo, hi))
+
+    existing = partitions(cur, 'hace')
+    lo = existing[-1][2] if existing else 0
+    top = last_pedido_id(cur) + HACE_BLOCK
+    while lo <= top:
+        created.append(create_partition(cur, 'hace', lo, lo + HACE_BLOCK))
+        lo += HACE_BLOCK
+    return created
+
+
+def detach(cur, table, name):
+    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    cur.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+
+
+def archive(cur, before):
+    """Separa las particiones de Pedido que terminan antes de `before` y los bloques de Hace
+    sin pedidos en la tabla, y las mueve a ARCHIVE_SCHEMA; devuelve sus nombres"""
+    archived = []
+    cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+    for name, lo, hi in partitions(cur, 'pedido'):
+        if hi <= before:
+            detach(cur, 'pedido', name)
+            archived.append(name)
+
+    cur.execute("SELECT min(id_pedido) FROM pedido")
+    first_id = cur.fetchone()[0]
+    if first_id is not None:
+        for name, lo, hi in partitions(cur, 'hace'):
+            if hi <= first_id:
+                detach(cur, 'hace', name)
+                archived.append(name)
+    return archived
+
+
+def maintain(conn, retention_days=RETENTION_DAYS):
+    """Una pasada de mantenimiento en una transacción (conexión DB-API).
+
+    Devuelve (creadas, archivadas), o None si Pedido no está particionada u
+    otro proceso tiene el lock.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (LOCK_KEY,))
+        if not cur.fetchone()[0] or not is_partitioned(cur, 'pedido'):
+            conn.rollback()
+            return None
+        # CREATE ... PARTITION OF, DETACH y ATTACH bloquean la tabla padre
+        cur.execute("SELECT set_config('lock_timeout', %s, true)", (LOCK_TIMEOUT,))
+        created = ensure_partitions(cur)
+        archived = []
+        if retention_days > 0:
+            archived = archive(cur, datetime.now() - timedelta(days=retention_days))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return created, archived
+
+
+def start_maintainer(engine, interval=MAINTENANCE_SECONDS):
+    """Lanza el hilo que ejecuta maintain() cada `interval` segundos"""
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            conn = engine.raw_connection()
+            try:
+                result = maintain(conn)
+                if result and any(result):
+                    created, archived = result
+                    print(f"🗂️  Particiones: {len(created)} creadas, {len(archived)} archivadas")
+                    sys.stdout.flush()
+            except Exception as error:
+                print(f"❌ Error en el mantenimiento de particiones: {error}")
+                sys.stdout.flush()
+            finally:
+                conn.close()
+
+    thread = threading.Thread(target=loop, name='partition-maintainer', daemon=True)
+    thread.start()
+    return thread
+
+
+def convert(engine, interval=INTERVAL, ahead=AHEAD):
+    """Convierte Pedido y Hace en tablas particionadas copiando sus filas, en una sola transacción"""
+    conn = engine.raw_connection()
+    cur = conn.cursor()
+    try:
+        if is_partitioned(cur, 'pedido'):
+            print("ℹ️  Pedido ya está particionada")
+            return False
+        cur.execute("SET LOCAL statement_timeout = 0")
+        cur.execute("SELECT count(*) FILTER (WHERE fecha IS NULL), min(fecha) FROM pedido")
+        missing, first = cur.fetchone()
+        if missing:
+            raise RuntimeError(f"{missing:,} pedidos sin fecha: la fecha es parte de la clave de partición")
+
+        # Las vistas del dashboard y las claves foráneas hacia Pedido dependen de la tabla vieja
+        for rollup in ROLLUPS.values():
+            cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {rollup['view']}")
+        cur.execute("SELECT conrelid::regclass::text, conname FROM pg_constraint "
+                    "WHERE contype = 'f' AND confrelid = 'pedido'::regclass")
+        for table, name in cur.fetchall():
+            cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+        # id_pedido tiene que ser serial: su DEFAULT nextval() se copia con LIKE ... INCLUDING DEFAULTS
+        cur.execute(SERIAL_SQL)
+        sequence, default, identity = cur.fetchone()
+        if sequence is None or identity or 'nextval' not in (default or ''):
+            raise RuntimeError("pedido.id_pedido no es una columna serial (DEFAULT nextval de una secuencia "
+                               "propia): convert no puede conservar su valor por defecto")
+
+        ddl = {}
+        for table, column in KEYS.items():
+            cur.execute(INDEXES_SQL, (table,))
+            indexes = [definition for definition, in cur.fetchall()]
+            # LIKE sólo copia columnas y defaults: PK, FK, CHECK y UNIQUE se vuelven a crear
+            cur.execute(CONSTRAINTS_SQL, (table, ['p', 'f', 'c', 'u']))
+            constraints = cur.fetchall()
+            for name, kind, _, columns in constraints:
+                # Postgres sólo admite UNIQUE en una tabla particionada si incluye la clave de partición
+                if kind == 'u' and column not in columns:
+                    raise RuntimeError(f"La restricción UNIQUE {name} de {table} no incluye {column}: "
+                                       f"no se puede mantener en la tabla particionada")
+            ddl[table] = indexes, constraints
+            cur.execute(f"ALTER TABLE {table} RENAME TO {table}_antigua")
+            cur.execute(f"CREATE TABLE {table} (LIKE {table}_antigua INCLUDING DEFAULTS) "
+                        f"PARTITION BY RANGE ({column})")
+            cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        cur.execute("ALTER TABLE pedido ALTER COLUMN fecha SET NOT NULL")
+        # La secuencia pasa a la tabla nueva para que no se borre con la antigua
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY pedido.id_pedido")
+        cur.execute(SERIAL_SQL)
+        owner, default, _ = cur.fetchone()
+        if owner != sequence or 'nextval' not in (default or ''):
+            raise RuntimeError(f"La nueva pedido.id_pedido quedó sin la secuencia {sequence} como valor por defecto")
+
+        created = ensure_partitions(cur, first, ahead, interval)
+        for table in KEYS:
+            start_time = time.time()
+            cur.execute(f"INSERT INTO {table} SELECT * FROM {table}_antigua")
+            print(f"✅ {table}: {cur.rowcount:,} filas copiadas en {time.time() - start_time:.1f}s")
+        for table in KEYS:
+            cur.execute(f"DROP TABLE {table}_antigua")
+
+        for table, (indexes, constraints) in ddl.items():
+            for name, kind, definition, _ in constraints:
+                if kind == 'p' and table == 'pedido':
+                    definition = 'PRIMARY KEY (id_pedido, fecha)'
+                cur.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+            for definition in indexes:
+                cur.execute(definition)
+        conn.commit()
+        print(f"✅ Pedido y Hace particionadas ({len(created)} particiones)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as autocommit:
+        autocommit.exec_driver_sql("ANALYZE pedido, hace")
+    ensure_rollups(engine)
+    return True
+
+
+def status(cur):
+    """Filas (estimadas) por partición de Pedido y Hace"""
+    if not is_partitioned(cur, 'pedido'):
+        print("ℹ️  Pedido no está particionada (python partitions.py convert)")
+        return
+    for table in KEYS:
+        print(f"📦 {table}:")
+        for name, lo, hi in partitions(cur, table) + [(f"{table}_default", 'DEFAULT', '')]:
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", (name,))
+            rows = max(cur.fetchone()[0], 0)
+            print(f"   {name:<22}{str(lo):>22}{str(hi):>22}{rows:>12,}")
+
+
+# Carga directa por partición (seeder)
+
+def seed_layout(cur, since):
+    """Crea las particiones que va a necesitar una carga de pedidos con fechas desde `since`.
+
+    Devuelve {tabla del seeder: ([desde], [hasta], [nombre])} para repartir las
+    filas, o {} si Pedido no está particionada.
+    """
+    if not is_partitioned(cur, 'pedido'):
+        return {}
+    ensure_partitions(cur, since)
+    layout = {}
+    for table, seeder_table in (('pedido', 'Pedido'), ('hace', 'Hace')):
+        found = partitions(cur, table)
+        layout[seeder_table] = ([lo for _, lo, _ in found], [hi for _, _, hi in found],
+                                [name for name, _, _ in found])
+    return layout
+
+
+def route_chunks(chunks, bounds, default, column):
+    """Divide bloques de filas ordenadas por `column` en tramos (partición, filas)"""
+    lows, highs, names = bounds
+    for rows in chunks:
+        keys = [row[column] for row in rows]
+        start = 0
+        while start < len(rows):
+            key = keys[start]
+            index = bisect_right(lows, key) - 1
+            if index >= 0 and key < highs[index]:
+                end = bisect_left(keys, highs[index], start)
+                name = names[index]
+            else:
+                # Fuera de todo rango: a la DEFAULT hasta el comienzo de la siguiente partición
+                end = bisect_left(keys, lows[index + 1], start) if index + 1 < len(lows) else len(rows)
+                name = default
+            yield name, rows[start:end]
+            start = end
+
+
+def load_partitioned(loader, table, columns, chunks, bounds, column):
+    """Carga filas ordenadas por la columna de partición con un COPY directo a cada partición"""
+    count = 0
+    pieces = route_chunks(chunks, bounds, f"{table.lower()}_default", column)
+    for name, group in groupby(pieces, key=lambda piece: piece[0]):
+        count += loader.load(table, columns, (rows for _, rows in group), target=name)
+    return count
+
+
+if __name__ == '__main__':
+    from db import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'convert':
+        convert(engine)
+    elif command == 'maintain':
+        conn = engine.raw_connection()
+        try:
+            result = maintain(conn)
+        finally:
+            conn.close()
+        if result is None:
+            print("ℹ️  Pedido no está particionada u otro proceso está haciendo el mantenimiento")
+        else:
+            print(f"🗂️  Particiones creadas: {len(result[0])}, archivadas: {len(result[1])}")
+    elif command == 'status':
+        conn = engine.raw_connection()
+        try:
+            status(conn.cursor())
+        finally:
+            conn.close()
+    else:
+        print("Uso: python partitions.py [convert|maintain|status]")
+        sys.exit(2)
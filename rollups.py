@@ -0,0 +1,195 @@
+"""
+Vistas materializadas de los endpoints de dashboard.
+
+Cada consulta estrella se guarda agregada (sin LIMIT ni ORDER BY) en una vista
+materializada con un índice único, y los endpoints sólo ordenan y recortan esa
+vista. Un hilo en segundo plano la refresca con REFRESH MATERIALIZED VIEW
+CONCURRENTLY cada ROLLUP_REFRESH_SECONDS segundos; un advisory lock de Postgres
+evita que los workers de gunicorn refresquen a la vez. La hora de cada refresco
+queda en la tabla dashboard_refresco. Las consultas vienen de dashboards.py con
+sus parámetros por defecto; si una cambia, ensure_rollups recrea su vista.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import text
+
+from dashboards import DEFAULTS, aggregate_sql, is_default, ranked_query
+from metrics import SLOW_QUERY_MS, log_slow_query
+
+# Segundos entre refrescos (0 desactiva el hilo de refresco)
+REFRESH_SECONDS = int(os.environ.get('ROLLUP_REFRESH_SECONDS', 300))
+REFRESH_TABLE = 'dashboard_refresco'
+# Clave del advisory lock compartido por todos los procesos de la app
+LOCK_KEY = 80080
+
+# name: vista, consulta agregada, columnas del índice único, columnas públicas,
+# orden y límite con que el endpoint lee la vista
+ROLLUPS = {
+    'platos_populares': {
+        'view': 'dashboard_platos_populares',
+        'sql': aggregate_sql('platos_populares'),
+        'key': ['id_plato', 'id_administrador', 'zona_entrega'],
+        'columns': ['nombre_plato', 'categoria', 'precio', 'administrador_creador', 'zona_entrega',
+                    'total_pedidos', 'calificacion_promedio', 'total_calificaciones', 'ingresos_generados'],
+        'order': 'total_pedidos DESC, calificacion_promedio DESC',
+        'limit': DEFAULTS['platos_populares']['limit'],
+    },
+    'rendimiento_zonas': {
+        'view': 'dashboard_rendimiento_zonas',
+        'sql': aggregate_sql('rendimiento_zonas'),
+        'key': ['zona_entrega'],
+        'columns': ['zona_entrega', 'costo_zona', 'total_entregas', 'entregas_exitosas', 'porcentaje_exito',
+                    'tiempo_promedio_minutos', 'diferencia_estimado_real', 'repartidores_activos',
+                    'nombres_repartidores'],
+        'order': 'porcentaje_exito DESC, tiempo_promedio_minutos ASC',
+        'limit': None,
+    },
+    'top_repartidores': {
+        'view': 'dashboard_top_repartidores',
+        'sql': aggregate_sql('top_repartidores'),
+        'key': ['id_usuario', 'zona_entrega'],
+        'columns': ['nombre_repartidor', 'telefono_emergencia', 'zona_entrega', 'entregas_realizadas',
+                    'entregas_exitosas', 'tasa_exito', 'calificacion_promedio', 'tiempo_promedio_entrega',
+                    'dias_trabajados', 'ranking_zona'],
+        'order': 'zona_entrega, ranking_zona',
+        'limit': None,
+    },
+    'clientes_activos': {
+        'view': 'dashboard_clientes_activos',
+        'sql': aggregate_sql('clientes_activos'),
+        'key': ['id_usuario', 'zona_entrega'],
+        'columns': ['nombre_cliente', 'empresa', 'zona_entrega', 'total_pedidos', 'ticket_promedio',
+                    'valor_total_consumido', 'variedad_platos_consumidos', 'dias_activos',
+                    'calificacion_promedio', 'ultimo_pedido', 'categorias_preferidas', 'categoria_fidelidad',
+                    'dias_sin_pedido'],
+        'order': 'total_pedidos DESC, valor_total_consumido DESC',
+        'limit': DEFAULTS['clientes_activos']['limit'],
+    },
+}
+
+
+def mark_refreshed(conn, view):
+    conn.execute(text(f"""
+    INSERT INTO {REFRESH_TABLE} (vista, refrescado_en) VALUES (:view, now())
+    ON CONFLICT (vista) DO UPDATE SET refrescado_en = EXCLUDED.refrescado_en
+    """), {'view': view})
+
+
+def definition_version(rollup):
+    return hashlib.sha1(f"{rollup['sql']}|{rollup['key']}".encode()).hexdigest()[:16]
+
+
+def ensure_rollups(engine):
+    """Crea las vistas que falten o cuya definición cambió (con datos) y sus índices únicos"""
+    with engine.begin() as conn:
+        # Bloqueante: el resto de workers espera a que el primero termine
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': LOCK_KEY})
+        conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {REFRESH_TABLE} (
+            vista TEXT PRIMARY KEY,
+            refrescado_en TIMESTAMPTZ NOT NULL
+        )
+        """))
+        for rollup in ROLLUPS.values():
+            view = rollup['view']
+            # El comentario de la vista guarda la huella de su definición
+            version = definition_version(rollup)
+            current = conn.execute(text("SELECT obj_description(to_regclass(:view), 'pg_class')"),
+                                   {'view': view}).scalar()
+            if current == version:
+                continue
+            if conn.execute(text("SELECT to_regclass(:view)"), {'view': view}).scalar() is not None:
+                print(f"📊 La definición de {view} cambió, recreando...")
+                conn.execute(text(f"DROP MATERIALIZED VIEW {view}"))
+            else:
+                print(f"📊 Creando vista materializada {view}...")
+            conn.execute(text(f"CREATE MATERIALIZED VIEW {view} AS {rollup['sql']}"))
+            conn.execute(text(f"CREATE UNIQUE INDEX {view}_key ON {view} ({', '.join(rollup['key'])})"))
+            conn.execute(text(f"COMMENT ON MATERIALIZED VIEW {view} IS '{version}'"))
+            mark_refreshed(conn, view)
+
+
+def refresh_rollups(engine):
+    """Refresca todas las vistas sin bloquear lecturas; False si otro proceso ya lo está haciendo"""
+    # Lock de transacción (no de sesión) para funcionar detrás de pgbouncer
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': LOCK_KEY}).scalar():
+            return False
+        conn.execute(text("SELECT set_config('statement_timeout', '0', true)"))
+        for name, rollup in ROLLUPS.items():
+            start_time = time.perf_counter()
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {rollup['view']}"))
+            elapsed = time.perf_counter() - start_time
+            if 0 < SLOW_QUERY_MS <= elapsed * 1000:
+                # El plan de la consulta de la vista explica un refresco lento
+                log_slow_query(conn.connection.dbapi_connection, rollup['sql'], None, elapsed,
+                               f"refresco de {rollup['view']}")
+            mark_refreshed(conn, rollup['view'])
+    return True
+
+
+def start_refresher(engine, interval=REFRESH_SECONDS, pending=False):
+    """Lanza el hilo que refresca las vistas cada `interval` segundos; con `pending`
+    (la base no respondía al arrancar) antes crea las vistas que falten"""
+    if interval <= 0:
+        return None
+
+    def loop():
+        nonlocal pending
+        while True:
+            time.sleep(interval)
+            try:
+                if pending:
+                    ensure_rollups(engine)
+                    pending = False
+                refresh_rollups(engine)
+            except Exception as error:
+                print(f"❌ Error refrescando vistas del dashboard: {error}")
+                sys.stdout.flush()
+
+    thread = threading.Thread(target=loop, name='rollup-refresher', daemon=True)
+    thread.start()
+    return thread
+
+
+def rollup_sql(name, limit=None):
+    """Lectura de la vista ya ordenada y recortada (compartida por los modos WSGI y ASGI)"""
+    rollup = ROLLUPS[name]
+    sql = f"SELECT {', '.join(rollup['columns'])} FROM {rollup['view']} ORDER BY {rollup['order']}"
+    limit = limit or rollup['limit']
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql
+
+
+REFRESHED_AT_SQL = f"SELECT refrescado_en FROM {REFRESH_TABLE} WHERE vista = :view"
+
+
+def fetch_rollup(conn, name, limit=None):
+    """Filas de la vista junto con la hora de su último refresco"""
+    rows = conn.execute(text(rollup_sql(name, limit))).fetchall()
+    refreshed_at = conn.execute(text(REFRESHED_AT_SQL), {'view': ROLLUPS[name]['view']}).scalar()
+    return rows, refreshed_at
+
+
+def fetch_dashboard(conn, name, params):
+    """Filas del dashboard con los parámetros de dashboards.parse_params: de la vista si
+    los filtros son los de por defecto, si no con la consulta en vivo (sin hora de refresco)"""
+    if is_default(name, params):
+        return fetch_rollup(conn, name, params['limit'])
+    rollup = ROLLUPS[name]
+    return conn.execute(ranked_query(name, params, rollup['columns'], rollup['order'])).fetchall(), None
+
+
+if __name__ == '__main__':
+    # Uso: python rollups.py  (crea las vistas que falten y las refresca, p. ej. tras el seeder)
+    from db import engine
+
+    ensure_rollups(engine)
+    start_time = time.time()
+    refresh_rollups(engine)
+    print(f"✅ Vistas del dashboard refrescadas en {time.time() - start_time:.1f}s")
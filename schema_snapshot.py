@@ -0,0 +1,137 @@
+"""
+Snapshot del esquema reflejado, para no ejecutar meta.reflect en cada arranque.
+
+La primera vez se reflejan las tablas de la app y el MetaData se guarda con
+pickle en SCHEMA_SNAPSHOT_PATH (o schema.pickle en APP_STATE_DIR, ver
+state.py) junto con una huella del catálogo (columnas, tipos, restricciones e
+índices). En los arranques siguientes sólo se calcula la huella con una
+consulta al catálogo: si coincide se usa el snapshot y si no se vuelve a
+reflejar y se reescribe. Si la base no responde al arrancar se usa el snapshot
+tal cual.
+
+Como pickle.load ejecuta código del archivo, sólo hay snapshot si se configuró
+una de esas dos rutas, en un directorio del usuario de la app sin escritura
+para otros; si no, se refleja en cada arranque. gunicorn.conf.py define
+APP_STATE_DIR (var/ junto al código), así que con la configuración incluida
+está activo. Con gunicorn --preload esto ocurre una vez en el proceso maestro y
+los workers heredan el esquema ya cargado.
+"""
+import os
+import pickle
+import sys
+import time
+
+import sqlalchemy
+from sqlalchemy import MetaData, text
+from sqlalchemy.exc import OperationalError
+
+from state import private_file, state_path
+
+# Sin valor por defecto: nunca se deserializa un pickle de un directorio compartido como /tmp
+SNAPSHOT_PATH = os.environ.get('SCHEMA_SNAPSHOT_PATH') or (
+    state_path('schema.pickle') if os.environ.get('APP_STATE_DIR') else None)
+
+# Tablas que usa la app (los nombres sin comillas quedan en minúsculas en Postgres)
+TABLES = ['usuario', 'cliente', 'trabajador', 'repartidor', 'administrador', 'menu', 'plato', 'pertenece',
+          'zonaentrega', 'pedido', 'tiene', 'hace', 'vive', 'cubre']
+
+FINGERPRINT_SQL = """
+SELECT md5(string_agg(definicion, E'\\n' ORDER BY definicion)) FROM (
+    SELECT c.relname || '.' || a.attname || ' ' || format_type(a.atttypid, a.atttypmod)
+           || CASE WHEN a.attnotnull THEN ' NOT NULL' ELSE '' END
+           || coalesce(' DEFAULT ' || pg_get_expr(d.adbin, d.adrelid), '') AS definicion
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+    WHERE n.nspname = current_schema() AND c.relname = ANY(:tables)
+    UNION ALL
+    SELECT c.relname || ' ' || k.conname || ' ' || pg_get_constraintdef(k.oid)
+    FROM pg_constraint k
+    JOIN pg_class c ON c.oid = k.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema() AND c.relname = ANY(:tables)
+    UNION ALL
+    SELECT indexdef FROM pg_indexes
+    WHERE schemaname = current_schema() AND tablename = ANY(:tables)
+) catalogo
+"""
+
+
+def catalog_fingerprint(engine):
+    with engine.connect() as conn:
+        return conn.execute(text(FINGERPRINT_SQL), {'tables': TABLES}).scalar()
+
+
+def read_snapshot():
+    if SNAPSHOT_PATH is None:
+        return None
+    try:
+        private_file(SNAPSHOT_PATH)
+    except PermissionError as error:
+        print(f"⚠️  Snapshot del esquema ignorado: {error}")
+        return None
+    try:
+        with open(SNAPSHOT_PATH, 'rb') as file:
+            snapshot = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    # Un MetaData serializado con otra versión de SQLAlchemy no es fiable
+    if snapshot.get('sqlalchemy') != sqlalchemy.__version__:
+        return None
+    return snapshot
+
+
+def write_snapshot(meta, fingerprint):
+    private_file(SNAPSHOT_PATH)
+    snapshot = {'sqlalchemy': sqlalchemy.__version__, 'fingerprint': fingerprint, 'meta': meta}
+    # Escritura atómica: otro proceso nunca lee un archivo a medias
+    partial = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    with open(partial, 'wb') as file:
+        pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(partial, SNAPSHOT_PATH)
+
+
+def reflect(engine, fingerprint):
+    meta = MetaData()
+    meta.reflect(bind=engine, only=TABLES)
+    if SNAPSHOT_PATH is None:
+        return meta
+    try:
+        write_snapshot(meta, fingerprint)
+    except OSError as error:
+        print(f"⚠️  No se pudo guardar el snapshot del esquema: {error}")
+    return meta
+
+
+def load_metadata(engine):
+    """MetaData de las tablas de la app: desde el snapshot si sigue vigente, si no reflejado"""
+    start_time = time.time()
+    snapshot = read_snapshot()
+    try:
+        fingerprint = catalog_fingerprint(engine)
+    except OperationalError:
+        if snapshot is None:
+            raise
+        print("⚠️  Base de datos no disponible: usando el snapshot del esquema sin verificar")
+        return snapshot['meta']
+
+    if snapshot is not None and snapshot['fingerprint'] == fingerprint:
+        source = 'snapshot'
+        meta = snapshot['meta']
+    else:
+        source = 'reflexión'
+        meta = reflect(engine, fingerprint)
+    print(f"🗂️  Esquema cargado ({source}) en {(time.time() - start_time) * 1000:.0f}ms")
+    sys.stdout.flush()
+    return meta
+
+
+if __name__ == '__main__':
+    # Uso: python schema_snapshot.py  (vuelve a reflejar y reescribe el snapshot)
+    from db import engine
+
+    if SNAPSHOT_PATH is None:
+        sys.exit("❌ Define SCHEMA_SNAPSHOT_PATH o APP_STATE_DIR para guardar el snapshot del esquema")
+    reflect(engine, catalog_fingerprint(engine))
+    print(f"✅ Snapshot del esquema guardado en {SNAPSHOT_PATH}")
@@ -0,0 +1,173 @@
+"""
+Modo --benchmark del seeder y modelo medido de tamaño y tiempo.
+
+Con --benchmark, seeder_massive.py registra por tabla:
+- filas/seg de generación (tiempo dentro de las etapas gen_*) y de carga
+  (serialización y COPY/INSERT), por separado; en modo paralelo son segundos de
+  proceso sumados entre fragmentos, así que las tasas son por proceso
+- bytes en disco al terminar (pg_total_relation_size, sumando particiones)
+- bytes de WAL generados (por tabla en modo serial; en todos los modos, por
+  fase de --bulk y en total)
+
+El informe se escribe en JSON y la medición (n, tamaño, segundos y
+configuración) se añade a MODEL_PATH. Con las mediciones de varias corridas
+pequeñas se ajustan rectas tamaño = a + b·n y tiempo = a + b·n por
+configuración (cargador, procesos y --bulk: sin --bulk las tablas arrastran
+las filas muertas del DELETE previo), que el seeder usa para estimar el tamaño
+y la duración antes de empezar.
+
+Uso: python seeder_massive.py 10000 --bulk --benchmark
+     python seeder_massive.py 50000 --bulk --benchmark
+     python seeder_benchmark.py 1000000    (estimación con el modelo guardado)
+"""
+import json
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+MODEL_PATH = os.environ.get('SEEDER_MODEL_PATH', 'seeder_model.json')
+
+# Bytes en disco de una tabla (con índices y TOAST); si está particionada, la suma de sus particiones
+SIZE_SQL = """
+SELECT CASE WHEN c.relkind = 'p'
+            THEN (SELECT sum(pg_total_relation_size(relid)) FROM pg_partition_tree(c.oid))
+            ELSE pg_total_relation_size(c.oid) END::bigint
+FROM pg_class c WHERE c.oid = %s::regclass
+"""
+
+
+def current_lsn(cur):
+    cur.execute("SELECT pg_current_wal_lsn()")
+    return cur.fetchone()[0]
+
+
+def wal_since(cur, lsn):
+    cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)::bigint", (lsn,))
+    return cur.fetchone()[0]
+
+
+def table_sizes(cur, tables):
+    sizes = {}
+    for table in tables:
+        cur.execute(SIZE_SQL, (table.lower(),))
+        sizes[table] = cur.fetchone()[0]
+    return sizes
+
+
+def config_key(loader_name, workers, bulk):
+    return f"{loader_name}-x{workers}{'-bulk' if bulk else ''}"
+
+
+def rate(rows, seconds):
+    return round(rows / seconds) if seconds > 0 else None
+
+
+def build_report(n, config, loader, sizes, wal_bytes, seconds, phases=()):
+    """Informe de una corrida a partir de las estadísticas del cargador"""
+    tables = {}
+    for table, (rows, _) in loader.stats.items():
+        generation, load = loader.split.get(table, (0.0, 0.0))
+        tables[table] = {
+            'rows': rows,
+            'generation_seconds': round(generation, 3),
+            'load_seconds': round(load, 3),
+            'generation_rows_per_sec': rate(rows, generation),
+            'load_rows_per_sec': rate(rows, load),
+            'size_bytes': sizes.get(table),
+            'wal_bytes': loader.wal.get(table) if loader.wal is not None else None,
+        }
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'n': n,
+        'config': config,
+        'seconds': round(seconds, 3),
+        'rows': sum(table['rows'] for table in tables.values()),
+        'size_bytes': sum(sizes.values()),
+        'wal_bytes': wal_bytes,
+        'tables': tables,
+        'phases': [{'name': name, 'seconds': round(elapsed, 3), 'wal_bytes': wal}
+                   for name, elapsed, wal in phases],
+    }
+
+
+def print_report(report):
+    print(f"⏱️  Benchmark del seeder ({report['config']}, n={report['n']:,}):")
+    print(f"   {'Tabla':<15}{'Gen filas/s':>13}{'Carga filas/s':>15}{'Tamaño MB':>11}{'WAL MB':>9}")
+    for table, stats in report['tables'].items():
+        generation = f"{stats['generation_rows_per_sec']:,}" if stats['generation_rows_per_sec'] else '-'
+        load = f"{stats['load_rows_per_sec']:,}" if stats['load_rows_per_sec'] else '-'
+        size = (stats['size_bytes'] or 0) / 1024 / 1024
+        wal = f"{stats['wal_bytes'] / 1024 / 1024:,.1f}" if stats['wal_bytes'] is not None else '-'
+        print(f"   {table:<15}{generation:>13}{load:>15}{size:>11,.1f}{wal:>9}")
+    print(f"   Total: {report['size_bytes'] / 1024 / 1024:,.1f} MB en disco, "
+          f"{report['wal_bytes'] / 1024 / 1024:,.1f} MB de WAL, {report['seconds']:.1f}s")
+    sys.stdout.flush()
+
+
+def load_model(path=MODEL_PATH):
+    """Mediciones guardadas ({'samples': [...]}) o None"""
+    try:
+        with open(path) as model:
+            return json.load(model)
+    except (OSError, ValueError):
+        return None
+
+
+def record_sample(report, path=MODEL_PATH):
+    """Añade la medición de una corrida al modelo (reemplaza la de la misma n y configuración)"""
+    model = load_model(path) or {'samples': []}
+    sample = {'n': report['n'], 'config': report['config'], 'size_bytes': report['size_bytes'],
+              'seconds': report['seconds'], 'wal_bytes': report['wal_bytes']}
+    model['samples'] = [s for s in model['samples']
+                        if (s['n'], s['config']) != (sample['n'], sample['config'])] + [sample]
+    with open(path, 'w') as output:
+        json.dump(model, output, indent=2)
+    return model
+
+
+def fit(points):
+    """Recta valor = a + b·n por mínimos cuadrados; con un solo n, proporcional (a = 0)"""
+    ns = np.array([n for n, _ in points], dtype=float)
+    values = np.array([value for _, value in points], dtype=float)
+    if len(set(ns.tolist())) < 2:
+        return 0.0, float(np.mean(values / ns))
+    slope, intercept = np.polyfit(ns, values, 1)
+    return float(intercept), float(slope)
+
+
+def estimate(model, n, key, config=None):
+    """Estimación de `key` ('size_bytes', 'seconds', 'wal_bytes') para n, o None sin mediciones.
+
+    Se ajusta con las mediciones de la misma configuración si las hay.
+    """
+    samples = (model or {}).get('samples', [])
+    if config is not None and any(s['config'] == config for s in samples):
+        samples = [s for s in samples if s['config'] == config]
+    points = [(s['n'], s[key]) for s in samples if s.get(key) is not None]
+    if not points:
+        return None
+    intercept, slope = fit(points)
+    return max(0.0, intercept + slope * n)
+
+
+def measured_range(model):
+    ns = [s['n'] for s in (model or {}).get('samples', [])]
+    return (min(ns), max(ns)) if ns else None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python seeder_benchmark.py <n> [config]")
+        sys.exit(2)
+    n = int(sys.argv[1])
+    config = sys.argv[2] if len(sys.argv) > 2 else None
+    model = load_model()
+    if model is None:
+        print(f"❌ No hay mediciones en {MODEL_PATH}: ejecuta el seeder con --benchmark")
+        sys.exit(1)
+    for key, unit, scale in (('size_bytes', 'MB', 1024 * 1024), ('wal_bytes', 'MB', 1024 * 1024),
+                             ('seconds', 's', 1)):
+        value = estimate(model, n, key, config)
+        print(f"   • {key}: {value / scale:,.1f} {unit}" if value is not None else f"   • {key}: sin datos")
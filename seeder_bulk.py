@@ -0,0 +1,162 @@
+"""
+Modo de carga masiva del seeder (--bulk).
+
+Fases, cada una cronometrada:
+1. Reinicio con un único TRUNCATE ... RESTART IDENTITY de las 14 tablas.
+2. Se eliminan los índices secundarios y las claves foráneas. Sus definiciones
+   quedan guardadas en la tabla seeder_ddl_pendiente, así que si la carga se
+   interrumpe, la siguiente ejecución las restaura antes de empezar.
+3. Carga (serial o paralela).
+4. Reconstrucción de índices y validación de claves foráneas en paralelo, con
+   una conexión por hilo.
+5. VACUUM ANALYZE de todas las tablas para que el planificador tenga
+   estadísticas frescas.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import seeder_massive as seeder
+
+TABLES = [table for table, _ in seeder.RESUMEN]
+PENDING_TABLE = 'seeder_ddl_pendiente'
+
+FOREIGN_KEYS_SQL = """
+SELECT c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid)
+FROM pg_constraint c
+WHERE c.contype = 'f' AND c.conrelid = ANY(%s::regclass[])
+"""
+
+# Índices secundarios: ni la clave primaria ni los que respaldan restricciones
+SECONDARY_INDEXES_SQL = """
+SELECT i.indrelid::regclass::text, ic.relname, pg_get_indexdef(i.indexrelid)
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+WHERE i.indrelid = ANY(%s::regclass[])
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+"""
+
+
+def run_parallel(statements, threads):
+    """Ejecuta cada sentencia en su propia conexión (autocommit), `threads` a la vez"""
+    def run(sql):
+        conn = seeder.connect_db()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(sql)
+        finally:
+            conn.close()
+
+    if statements:
+        with ThreadPoolExecutor(max(1, min(threads, len(statements)))) as pool:
+            list(pool.map(run, statements))
+
+
+class BulkLoad:
+    """Fases de la carga masiva sobre la conexión principal del seeder"""
+
+    def __init__(self, conn, cur, threads=None, wal=False):
+        self.conn = conn
+        self.cur = cur
+        self.threads = threads or os.cpu_count() or 1
+        self.phases = []
+        # Con wal=True cada fase registra también los bytes de WAL desde la fase anterior
+        self.lsn = self._lsn() if wal else None
+
+    def _lsn(self):
+        self.cur.execute("SELECT pg_current_wal_lsn()")
+        lsn = self.cur.fetchone()[0]
+        self.conn.commit()
+        return lsn
+
+    def phase(self, name, start_time):
+        """Registra la duración de una fase desde start_time"""
+        elapsed = time.time() - start_time
+        wal = None
+        if self.lsn is not None:
+            self.cur.execute("SELECT pg_current_wal_lsn(), pg_wal_lsn_diff(pg_current_wal_lsn(), %s)::bigint",
+                             (self.lsn,))
+            self.lsn, wal = self.cur.fetchone()
+            self.conn.commit()
+        self.phases.append((name, elapsed, wal))
+        print(f"[BULK] ✅ {name} en {elapsed:.1f}s")
+        sys.stdout.flush()
+
+    def _pending(self):
+        self.cur.execute("SELECT to_regclass(%s)", (PENDING_TABLE,))
+        return self.cur.fetchone()[0] is not None
+
+    def reset(self):
+        """Restaura DDL pendiente de una carga interrumpida y vacía todas las tablas"""
+        if self._pending():
+            print("⚠️  Hay índices/claves de una carga anterior sin restaurar, restaurando...")
+            self.restore()
+        start_time = time.time()
+        self.cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY")
+        self.conn.commit()
+        self.phase("TRUNCATE ... RESTART IDENTITY", start_time)
+
+    def defer(self):
+        """Guarda y elimina índices secundarios y claves foráneas antes de cargar"""
+        start_time = time.time()
+        tables = [table.lower() for table in TABLES]
+        self.cur.execute(FOREIGN_KEYS_SQL, (tables,))
+        foreign_keys = self.cur.fetchall()
+        self.cur.execute(SECONDARY_INDEXES_SQL, (tables,))
+        indexes = self.cur.fetchall()
+
+        self.cur.execute(f"CREATE TABLE {PENDING_TABLE} (tipo text, tabla text, nombre text, definicion text)")
+        self.cur.executemany(f"INSERT INTO {PENDING_TABLE} VALUES (%s, %s, %s, %s)",
+                             [('fk',) + row for row in foreign_keys] + [('index',) + row for row in indexes])
+        for table, name, _ in foreign_keys:
+            self.cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+        for _, name, _ in indexes:
+            self.cur.execute(f'DROP INDEX "{name}"')
+        self.conn.commit()
+        self.phase(f"Eliminadas {len(foreign_keys)} claves foráneas y {len(indexes)} índices", start_time)
+
+    def restore(self):
+        """Reconstruye en paralelo los índices y claves foráneas guardados"""
+        self.cur.execute(f"SELECT tipo, tabla, nombre, definicion FROM {PENDING_TABLE}")
+        pending = self.cur.fetchall()
+        self.conn.commit()
+
+        start_time = time.time()
+        # En una tabla particionada pg_get_indexdef da "ON ONLY", que no crea el índice en las particiones
+        run_parallel([definicion.replace(' ON ONLY ', ' ON ', 1) for tipo, _, _, definicion in pending
+                      if tipo == 'index'], self.threads)
+        self.phase("Índices reconstruidos", start_time)
+
+        # Las claves se agregan NOT VALID (instantáneo) y se validan en paralelo;
+        # las tablas particionadas no admiten NOT VALID y se validan al agregarlas
+        start_time = time.time()
+        foreign_keys = [(tabla, nombre, definicion) for tipo, tabla, nombre, definicion in pending if tipo == 'fk']
+        unvalidated = []
+        for tabla, nombre, definicion in foreign_keys:
+            self.cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (tabla,))
+            if self.cur.fetchone()[0]:
+                self.cur.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT "{nombre}" {definicion}')
+            else:
+                self.cur.execute(f'ALTER TABLE {tabla} ADD CONSTRAINT "{nombre}" {definicion} NOT VALID')
+                unvalidated.append((tabla, nombre))
+        self.conn.commit()
+        run_parallel([f'ALTER TABLE {tabla} VALIDATE CONSTRAINT "{nombre}"' for tabla, nombre in unvalidated],
+                     self.threads)
+        self.phase("Claves foráneas validadas", start_time)
+
+        self.cur.execute(f"DROP TABLE {PENDING_TABLE}")
+        self.conn.commit()
+
+    def analyze(self):
+        """VACUUM ANALYZE de las 14 tablas, en paralelo"""
+        start_time = time.time()
+        run_parallel([f"VACUUM ANALYZE {table}" for table in TABLES], self.threads)
+        self.phase("VACUUM ANALYZE", start_time)
+
+    def report(self):
+        print(f"⏱️  Fases de la carga masiva:")
+        for name, elapsed, wal in self.phases:
+            print(f"   • {name}: {elapsed:.1f}s" + (f" ({wal / 1024 / 1024:,.1f} MB de WAL)" if wal is not None else ""))
+        sys.stdout.flush()
@@ -0,0 +1,161 @@
+"""
+Carga masiva para el seeder usando COPY ... FROM STDIN.
+
+Cada tabla se envía en un único COPY alimentado por una etapa de generación que
+produce bloques de filas: cada bloque se serializa al formato texto de COPY en
+un buffer en memoria que se rellena a medida que Postgres lo consume, así que
+nunca hay más de un bloque en memoria.
+"""
+import io
+import sys
+import time
+
+# Filas por bloque de las etapas de generación y bytes pedidos por psycopg2
+# en cada lectura
+CHUNK_ROWS = 10000
+COPY_READ_SIZE = 1 << 16
+
+
+def copy_text(value):
+    """Convierte un valor al formato texto de COPY (escapando separadores)"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class RowStream:
+    """Objeto tipo archivo que serializa bloques de filas bajo demanda para copy_expert"""
+
+    def __init__(self, chunks, on_chunk=None):
+        self.chunks = iter(chunks)
+        self.on_chunk = on_chunk
+        self.count = 0
+        self._buffer = io.StringIO()
+
+    def _fill(self):
+        for rows in self.chunks:
+            if not rows:
+                continue
+            lines = ['\t'.join([copy_text(v) for v in row]) for row in rows]
+            lines.append('')
+            self._buffer = io.StringIO('\n'.join(lines))
+            self.count += len(rows)
+            if self.on_chunk:
+                self.on_chunk(self.count)
+            return True
+        return False
+
+    def read(self, size=-1):
+        data = self._buffer.read(size)
+        if not data and self._fill():
+            data = self._buffer.read(size)
+        return data
+
+
+class TimedChunks:
+    """Iterador sobre una etapa de generación que acumula el tiempo pasado generando bloques"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start_time = time.perf_counter()
+        try:
+            return next(self.chunks)
+        finally:
+            self.seconds += time.perf_counter() - start_time
+
+
+class Loader:
+    """Base de los cargadores: acumula filas y segundos por tabla"""
+    name = None
+
+    def __init__(self, cursor, progress=None, wal=False):
+        self.cursor = cursor
+        self.progress = progress
+        self.stats = {}
+        # Segundos generando filas y cargándolas, por tabla (ver seeder_benchmark.py)
+        self.split = {}
+        # Bytes de WAL por tabla (sólo si se pide: cuesta dos consultas por carga)
+        self.wal = {} if wal else None
+
+    def _record(self, table, rows, elapsed):
+        total_rows, total_elapsed = self.stats.get(table, (0, 0.0))
+        self.stats[table] = (total_rows + rows, total_elapsed + elapsed)
+
+    def _split(self, table, generation, load):
+        total_generation, total_load = self.split.get(table, (0.0, 0.0))
+        self.split[table] = (total_generation + generation, total_load + load)
+
+    def _lsn(self):
+        self.cursor.execute("SELECT pg_current_wal_lsn()")
+        return self.cursor.fetchone()[0]
+
+    def _wal_since(self, lsn):
+        self.cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)::bigint", (lsn,))
+        return self.cursor.fetchone()[0]
+
+    def _progress(self, table, total, start_time):
+        if total is None or self.progress is None:
+            return None
+        return lambda current: self.progress(table.upper(), current, total, start_time)
+
+    def load(self, table, columns, chunks, total=None, target=None):
+        """Carga los bloques de filas (listas de tuplas) y devuelve cuántas filas se insertaron.
+
+        Con `target` las filas van a esa tabla (p. ej. una partición) pero se
+        contabilizan en `table`.
+        """
+        start_time = time.time()
+        lsn = self._lsn() if self.wal is not None else None
+        timed = TimedChunks(chunks)
+        count = self._load(target or table, columns, timed, self._progress(table, total, start_time))
+        elapsed = time.time() - start_time
+        self._record(table, count, elapsed)
+        self._split(table, timed.seconds, elapsed - timed.seconds)
+        if lsn is not None:
+            self.wal[table] = self.wal.get(table, 0) + self._wal_since(lsn)
+        return count
+
+    def report(self):
+        """Imprime filas/segundo por tabla para comparar cargadores"""
+        print(f"📦 Carga por tabla (cargador: {self.name}):")
+        print(f"   {'Tabla':<15}{'Filas':>14}{'Segundos':>11}{'Filas/seg':>13}")
+        for table, (rows, elapsed) in self.stats.items():
+            rate = rows / elapsed if elapsed > 0 else 0
+            print(f"   {table:<15}{rows:>14,}{elapsed:>11.1f}{rate:>13,.0f}")
+        sys.stdout.flush()
+
+
+class CopyLoader(Loader):
+    """Envía cada tabla en un único COPY ... FROM STDIN (formato texto)"""
+    name = 'copy'
+
+    def _load(self, table, columns, chunks, on_chunk):
+        stream = RowStream(chunks, on_chunk=on_chunk)
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        self.cursor.copy_expert(sql, stream, size=COPY_READ_SIZE)
+        return stream.count
+
+
+class InsertLoader(Loader):
+    """Ruta anterior con executemany, conservada para comparar rendimiento"""
+    name = 'insert'
+
+    def _load(self, table, columns, chunks, on_chunk):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        count = 0
+        for rows in chunks:
+            self.cursor.executemany(sql, rows)
+            count += len(rows)
+            if on_chunk:
+                on_chunk(count)
+        return count
+
+
+LOADERS = {'copy': CopyLoader, 'insert': InsertLoader}
@@ -0,0 +1,165 @@
+"""
+Generador sintético vectorizado para el seeder.
+
+En lugar de llamar a Faker fila por fila, se precalculan una sola vez pools de
+vocabulario con Faker/faker_food (nombres, empresas, platos, direcciones,
+comentarios...) y cada columna de un bloque se muestrea de golpe con NumPy.
+Precios, fechas, horas, estados y UUIDs se generan directamente con NumPy en
+los mismos rangos que usaba Faker. Con la misma semilla se obtienen los mismos
+datos.
+"""
+import random
+from datetime import datetime
+
+import numpy as np
+from faker import Faker
+from faker_food import FoodProvider
+
+# Valores distintos por pool de vocabulario
+POOL_SIZE = 5000
+
+TIPOS = ['Entrante', 'Principal', 'Postre', 'Bebida']
+CATEGORIAS = ['Vegano', 'Vegetariano', 'Carne', 'Pescado', 'Sin Gluten']
+ESTADOS = ['Pendiente', 'Enviado', 'Entregado', 'Cancelado']
+
+
+def build_pools(seed=None, size=POOL_SIZE):
+    """Precalcula con Faker los pools de vocabulario (truncados al largo de cada columna)"""
+    fake = Faker()
+    fake.add_provider(FoodProvider)
+    if seed is not None:
+        fake.seed_instance(seed)
+        # faker_food elige con el módulo random global, no con el de Faker
+        random.seed(seed)
+    generators = {
+        'nombre': lambda: fake.first_name()[:50],
+        'apellido': lambda: fake.last_name()[:50],
+        'telefono': lambda: fake.phone_number()[:20],
+        'telefono_emergencia': lambda: fake.phone_number()[:30],
+        'empresa': lambda: fake.company()[:100],
+        'correo': lambda: fake.email()[:100],
+        'variacion': lambda: fake.word()[:50],
+        'plato': lambda: fake.dish()[:100],
+        'foto': fake.image_url,
+        'direccion': lambda: fake.address()[:200],
+        'comentario': lambda: fake.text(max_nb_chars=100),
+    }
+    return {name: np.array([generate() for _ in range(size)], dtype=object)
+            for name, generate in generators.items()}
+
+
+class SyntheticData:
+    """Genera bloques de filas por tabla muestreando columnas completas con NumPy"""
+
+    def __init__(self, seed=None, pools=None, now=None):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self._pools = pools
+        # Instante de referencia para fechas relativas, fijo durante toda la carga
+        self.now = now or datetime.now().replace(microsecond=0)
+
+    @property
+    def pools(self):
+        if self._pools is None:
+            self._pools = build_pools(self.seed)
+        return self._pools
+
+    def vocab(self, name, size):
+        pool = self.pools[name]
+        return pool[self.rng.integers(0, len(pool), size)].tolist()
+
+    def choice(self, values, size):
+        return [values[i] for i in self.rng.integers(0, len(values), size).tolist()]
+
+    def dates(self, size, days_back):
+        """Fechas entre hoy - days_back y hoy"""
+        today = np.datetime64(self.now.date(), 'D')
+        return (today - self.rng.integers(0, days_back + 1, size).astype('timedelta64[D]')).tolist()
+
+    def timestamps(self, size, days_back):
+        """Instantes (al segundo) entre ahora - days_back y ahora"""
+        now = np.datetime64(self.now, 's')
+        offsets = self.rng.integers(0, days_back * 86400 + 1, size).astype('timedelta64[s]')
+        return (now - offsets).tolist()
+
+    def timeline(self, ids, first, count, days_back):
+        """Instantes crecientes con el ID: los IDs [first, first + count) se reparten
+        de ahora - days_back a ahora, como si se hubieran creado en ese orden"""
+        now = np.datetime64(self.now, 's')
+        position = (np.asarray(ids) - first + self.rng.random(len(ids))) / count
+        offsets = ((1 - position) * days_back * 86400).astype(np.int64).astype('timedelta64[s]')
+        return (now - offsets).tolist()
+
+    def times(self, size):
+        """Horas del día como 'HH:MM:SS', igual que fake.time()"""
+        return [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}"
+                for s in self.rng.integers(0, 86400, size).tolist()]
+
+    def prices(self, size, low=5.0, high=50.0):
+        return np.round(self.rng.uniform(low, high, size), 2).tolist()
+
+    def uuids(self, size):
+        """UUID versión 4 en texto a partir de bytes aleatorios"""
+        raw = self.rng.integers(0, 256, (size, 16), dtype=np.uint8)
+        raw[:, 6] = (raw[:, 6] & 0x0f) | 0x40
+        raw[:, 8] = (raw[:, 8] & 0x3f) | 0x80
+        hexes = raw.tobytes().hex()
+        return [f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+                for h in (hexes[i:i + 32] for i in range(0, size * 32, 32))]
+
+    def relaciones(self, parents, pool, min_k, max_k):
+        """Pares (padre, hijo): cada padre recibe entre min_k y max_k hijos distintos del pool"""
+        size = len(parents)
+        max_k = min(max_k, len(pool))
+        counts = self.rng.integers(min_k, max_k + 1, size)
+        used = np.arange(max_k) < counts[:, None]
+        picks = self.rng.integers(0, len(pool), (size, max_k))
+        # Las columnas no usadas llevan centinelas negativos distintos entre sí
+        sentinels = -1 - np.arange(max_k)
+        while True:
+            ordered = np.sort(np.where(used, picks, sentinels), axis=1)
+            repeated = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+            if not len(repeated):
+                break
+            picks[repeated] = self.rng.integers(0, len(pool), (len(repeated), max_k))
+        children = picks[used]
+        children = pool.start + children if isinstance(pool, range) else pool[children]
+        return list(zip(np.repeat(parents, counts).tolist(), children.tolist()))
+
+    # Bloques por tabla: `ids` es una lista de IDs ya reservados
+
+    def usuarios(self, ids):
+        n = len(ids)
+        return list(zip(ids, self.vocab('nombre', n), self.vocab('apellido', n), self.vocab('telefono', n)))
+
+    def clientes(self, ids):
+        return list(zip(ids, self.vocab('empresa', len(ids))))
+
+    def trabajadores(self, ids):
+        return list(zip(ids, self.vocab('telefono_emergencia', len(ids))))
+
+    def administradores(self, ids):
+        return list(zip(ids, self.vocab('correo', len(ids))))
+
+    def menus(self, ids, admins):
+        n = len(ids)
+        return list(zip(ids, admins, self.vocab('variacion', n), self.dates(n, 365)))
+
+    def platos(self, ids):
+        n = len(ids)
+        return list(zip(ids, self.vocab('plato', n), self.vocab('foto', n), self.choice(TIPOS, n),
+                        self.choice(CATEGORIAS, n), self.prices(n), self.uuids(n)))
+
+    def pedidos(self, ids, zonas, clientes, pool):
+        # Fechas en orden de id_pedido dentro del pool reservado: cada partición
+        # por fecha recibe un tramo contiguo de IDs
+        n = len(ids)
+        return list(zip(ids, self.timeline(ids, pool.start, len(pool), 30), self.choice(ESTADOS, n), self.times(n), self.times(n),
+                        self.times(n), self.vocab('direccion', n), self.choice(zonas, n), clientes))
+
+    def calificaciones(self, ids, usuarios):
+        n = len(ids)
+        return list(zip(ids, usuarios, self.rng.integers(1, 6, n).tolist(), self.vocab('comentario', n)))
+
+    def zonas_por_usuario(self, ids, zonas):
+        return list(zip(self.choice(zonas, len(ids)), ids))
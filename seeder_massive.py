@@ -1,14 +1,28 @@
+import argparse
+import json
+import numpy as np
 import psycopg2
-from faker import Faker
-from faker_food import FoodProvider
-from random import randint, choice, sample
+import random
 import sys
 import time
 import os
+from datetime import timedelta
+import partitions
+import seeder_benchmark
+from seeder_copy import CHUNK_ROWS, LOADERS
+from seeder_gen import SyntheticData, build_pools
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
-# Inicializar Faker con proveedor de comida
-fake = Faker()
-fake.add_provider(FoodProvider)
+# Generador vectorizado de datos (pools de vocabulario de Faker/faker_food
+# muestreados con NumPy); seed_generators lo reinicia con una semilla
+data = SyntheticData()
+
+# Los pools de IDs son range (bloques reservados) o arreglos int32, nunca
+# listas de enteros Python
+ID_DTYPE = np.int32
 
 
 # Obtener la URL de la base de datos de Heroku desde la variable de entorno
@@ -16,6 +30,46 @@ DATABASE_URL = os.environ.get('DATABASE_URL')
 # Obtener el nombre de la base de datos desde la URL
 database = DATABASE_URL.split('/')[-1]  # El nombre de la base de datos es la última parte de la URL
 
+# Columnas que carga cada tabla, en el orden en que las generan las etapas
+COLUMNS = {
+    'Usuario': ['id_usuario', 'nombre', 'apellido', 'numero_telef'],
+    'Cliente': ['id_usuario', 'empresa'],
+    'Trabajador': ['id_usuario', 'telefono_emergencia'],
+    'Repartidor': ['id_usuario'],
+    'Administrador': ['id_usuario', 'correo'],
+    'Menu': ['id_menu', 'id_administrador', 'variacion', 'fecha'],
+    'Plato': ['id_plato', 'nombre', 'foto', 'tipo', 'categoria', 'precio', 'codigo_info_nutricional'],
+    'ZonaEntrega': ['nombre', 'costo'],
+    'Pedido': ['id_pedido', 'fecha', 'estado', 'hora_salida', 'hora_entrega', 'hora_entrega_estimada',
+               'direccion_exacta', 'zona_entrega', 'id_cliente'],
+    'Pertenece': ['id_menu', 'id_plato'],
+    'Tiene': ['id_pedido', 'id_menu'],
+    'Hace': ['id_pedido', 'id_usuario', 'calificacion', 'comentario'],
+    'Vive': ['zona_entrega', 'id_usuario'],
+    'Cubre': ['zona_entrega', 'id_usuario'],
+}
+
+# Zonas de entrega con su costo (las mismas en cada carga)
+ZONAS = [('Centro', 5.00), ('Norte', 7.50), ('Sur', 6.50), ('Este', 8.00), ('Oeste', 7.00)]
+
+# Tablas en el orden del resumen final
+RESUMEN = [
+    ('Usuario', 'usuarios'),
+    ('Cliente', 'clientes'),
+    ('Trabajador', 'trabajadores'),
+    ('Repartidor', 'repartidores'),
+    ('Administrador', 'administradores'),
+    ('Menu', 'menús'),
+    ('Plato', 'platos'),
+    ('Pedido', 'pedidos'),
+    ('ZonaEntrega', 'zonas de entrega'),
+    ('Pertenece', 'relaciones menú-plato'),
+    ('Tiene', 'relaciones pedido-menú'),
+    ('Hace', 'calificaciones'),
+    ('Vive', 'relaciones usuario-zona'),
+    ('Cubre', 'relaciones repartidor-zona'),
+]
+
 def connect_db():
     """Conectar a la base de datos usando la URL proporcionada por Heroku"""
     return psycopg2.connect(DATABASE_URL)
@@ -33,56 +87,308 @@ def print_progress(operation, current, total, start_time=None):
             print(f"[{operation}] Procesados: {current:,}/{total:,} registros")
         sys.stdout.flush()
 
-def estimate_final_size(n):
-    """Estima el tamaño final basado en 25k = 68MB"""
-    ratio = n / 25000
-    estimated_mb = 68 * ratio
+def estimate_final_size(n, model=None, config=None):
+    """Estima el tamaño final con el modelo medido por --benchmark (seeder_benchmark.py);
+    sin mediciones, con la referencia antigua de 25k = 68MB"""
+    estimated = seeder_benchmark.estimate(model, n, 'size_bytes', config)
+    estimated_mb = estimated / 1024 / 1024 if estimated is not None else 68 * n / 25000
     if estimated_mb < 1024:
         return f"{estimated_mb:.1f} MB"
     else:
         return f"{estimated_mb/1024:.2f} GB"
 
-def create_usuario_batch(cursor, n, batch_size=5000):
-    """Crea usuarios en lotes para mejor rendimiento"""
-    print(f"[USUARIOS] Iniciando inserción de {n:,} usuarios en lotes de {batch_size:,}...")
+def estimate_time(n, config, model=None):
+    """Segundos estimados con el modelo medido; sin mediciones, 2 minutos por cada 25k"""
+    estimated = seeder_benchmark.estimate(model, n, 'seconds', config)
+    return estimated if estimated is not None else (n / 25000) * 120
+
+def reserve_ids(conn, cur, table, id_column, count):
+    """Reserva un bloque contiguo de IDs en la secuencia serial de la tabla.
+
+    ALTER SEQUENCE bloquea los nextval concurrentes (API u otros seeders) hasta
+    el commit, así que nadie más puede recibir un ID dentro del bloque.
+    """
+    cur.execute("SELECT pg_get_serial_sequence(%s, %s)", (table.lower(), id_column))
+    sequence = cur.fetchone()[0]
+    cur.execute(f"ALTER SEQUENCE {sequence} INCREMENT BY 1")
+    cur.execute("SELECT setval(%s, nextval(%s) + %s - 1)", (sequence, sequence, count))
+    last = cur.fetchone()[0]
+    conn.commit()
+    return range(last - count + 1, last + 1)
+
+def seed_generators(seed, pools=None, now=None):
+    """Prepara el generador de datos con la semilla dada.
+
+    Sin `pools`, los pools de vocabulario se construyen a partir de la semilla;
+    los procesos paralelos reciben los del coordinador (y su instante de
+    referencia) y sólo cambian la semilla de muestreo.
+    """
+    global data
+    if pools is None:
+        start_time = time.time()
+        pools = build_pools(seed)
+        print(f"[GENERADOR] ✅ Pools de vocabulario listos en {time.time() - start_time:.1f}s")
+    data = SyntheticData(seed, pools, now)
+
+def id_chunks(ids, size=CHUNK_ROWS):
+    """Recorre un pool de IDs (range o arreglo NumPy) en bloques de enteros"""
+    for start in range(0, len(ids), size):
+        chunk = ids[start:start + size]
+        yield chunk.tolist() if isinstance(chunk, np.ndarray) else list(chunk)
+
+def sample_ids(pool, k):
+    """Muestra sin reemplazo de k IDs del pool, como arreglo NumPy compacto"""
+    mask = np.zeros(len(pool), dtype=bool)
+    mask[:k] = True
+    data.rng.shuffle(mask)
+    index = np.flatnonzero(mask)
+    if isinstance(pool, range):
+        return (pool.start + index).astype(ID_DTYPE)
+    return pool[index]
+
+def pick_ids(pool, size):
+    """Elige `size` IDs del pool con reemplazo"""
+    index = data.rng.integers(0, len(pool), size)
+    if isinstance(pool, range):
+        return (pool.start + index).tolist()
+    return pool[index].tolist()
+
+# Etapas de generación: cada una recorre su pool de IDs y produce bloques de
+# CHUNK_ROWS filas que el cargador vuelca antes de pedir el siguiente
+
+def gen_usuarios(ids):
+    for chunk in id_chunks(ids):
+        yield data.usuarios(chunk)
+
+def gen_clientes(ids):
+    for chunk in id_chunks(ids):
+        yield data.clientes(chunk)
+
+def gen_trabajadores(ids):
+    for chunk in id_chunks(ids):
+        yield data.trabajadores(chunk)
+
+def gen_repartidores(ids):
+    for chunk in id_chunks(ids):
+        yield [(uid,) for uid in chunk]
+
+def gen_administradores(ids):
+    for chunk in id_chunks(ids):
+        yield data.administradores(chunk)
+
+def gen_menus(ids, admin_ids):
+    for chunk in id_chunks(ids):
+        yield data.menus(chunk, pick_ids(admin_ids, len(chunk)))
+
+def gen_platos(ids):
+    for chunk in id_chunks(ids):
+        yield data.platos(chunk)
+
+def gen_pedidos(ids, zona_nombres, cliente_ids, pool=None):
+    # `pool` es el bloque completo de IDs reservado (los fragmentos paralelos son parte de él)
+    for chunk in id_chunks(ids):
+        yield data.pedidos(chunk, zona_nombres, pick_ids(cliente_ids, len(chunk)), pool or ids)
+
+def gen_pertenece(menu_ids, plato_ids):
+    for chunk in id_chunks(menu_ids):
+        # Cada menú tiene 1-4 platos
+        yield data.relaciones(chunk, plato_ids, 1, 4)
+
+def gen_tiene(pedido_ids, menu_ids):
+    for chunk in id_chunks(pedido_ids):
+        # Cada pedido tiene 1-3 menús
+        yield data.relaciones(chunk, menu_ids, 1, 3)
+
+def gen_calificaciones(pedido_ids, user_ids):
+    for chunk in id_chunks(pedido_ids):
+        yield data.calificaciones(chunk, pick_ids(user_ids, len(chunk)))
+
+def gen_zona_por_usuario(user_ids, zona_nombres):
+    for chunk in id_chunks(user_ids):
+        yield data.zonas_por_usuario(chunk, zona_nombres)
+
+# Columna de partición de las tablas particionadas, en el orden de COLUMNS
+PARTITION_COLUMNS = {'Pedido': 1, 'Hace': 0}
+
+def partition_layout(conn, cur):
+    """Particiones para los pedidos del seeder (fechas de los últimos 30 días); {} si no hay particionado"""
+    layout = partitions.seed_layout(cur, data.now - timedelta(days=30))
+    conn.commit()
+    return layout
+
+def load_table(loader, table, chunks, layout, total=None):
+    """Carga una tabla; si está particionada, con un COPY directo a cada partición"""
+    if table in layout:
+        return partitions.load_partitioned(loader, table, COLUMNS[table], chunks, layout[table],
+                                           PARTITION_COLUMNS[table])
+    return loader.load(table, COLUMNS[table], chunks, total=total)
+
+def create_usuario_batch(loader, conn, cursor, n):
+    """Crea usuarios con IDs reservados de la secuencia, sin releerlos"""
+    print(f"[USUARIOS] Iniciando carga de {n:,} usuarios con {loader.name}...")
     start_time = time.time()
     
-    all_user_ids = []
-    
-    for batch_start in range(0, n, batch_size):
-        batch_end = min(batch_start + batch_size, n)
-        batch_count = batch_end - batch_start
-        
-        usuarios = []
-        for _ in range(batch_count):
-            nombre = fake.first_name()[:50]
-            apellido = fake.last_name()[:50]
-            telefono = fake.phone_number()[:20]
-            usuarios.append((nombre, apellido, telefono))
-        
-        cursor.executemany(
-            "INSERT INTO Usuario (nombre, apellido, numero_telef) VALUES (%s, %s, %s)", usuarios)
-        
-        # Obtener IDs del lote actual
-        cursor.execute("SELECT id_usuario FROM Usuario ORDER BY id_usuario DESC LIMIT %s", (batch_count,))
-        batch_ids = [row[0] for row in cursor.fetchall()][::-1]
-        all_user_ids.extend(batch_ids)
-        
-        # Progreso
-        print_progress("USUARIOS", batch_end, n, start_time)
+    all_user_ids = reserve_ids(conn, cursor, 'Usuario', 'id_usuario', n)
+    loader.load('Usuario', COLUMNS['Usuario'], gen_usuarios(all_user_ids), total=n)
     
     elapsed = time.time() - start_time
     print(f"[USUARIOS] ✅ Completado: {n:,} usuarios en {elapsed:.1f}s")
     return all_user_ids
 
-def create_large_dataset(n):
-    """Crea un dataset grande optimizado para 1M+ registros"""
+def peak_rss_mb(children=False):
+    """Memoria residente máxima del proceso (o de sus hijos) en MB"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def clean_database(conn, cur):
+    """Verifica que la base está vacía y limpia las tablas solo si es necesario"""
+    cur.execute("SELECT COUNT(*) FROM Usuario;")
+    existing_users = cur.fetchone()[0]
+    
+    if existing_users > 0:
+        print(f"⚠️  Base de datos no está vacía ({existing_users:,} usuarios encontrados)")
+        print("[LIMPIEZA] Limpiando tablas...")
+        all_tables = ['Hace','Cubre','Vive','Tiene','Pedido','Pertenece','Plato','Menu','Administrador','Repartidor','Trabajador','Cliente','Usuario','ZonaEntrega']
+        for table in all_tables:
+            cur.execute(f"DELETE FROM {table} CASCADE")
+        conn.commit()
+        print("[LIMPIEZA] ✅ Completada")
+    else:
+        print("[VERIFICACIÓN] ✅ Base de datos está vacía, procediendo directamente...")
+
+def seed_serial(conn, cur, n, loader_name='copy', seed=None, wal=False):
+    """Genera y carga todas las tablas en orden sobre una sola conexión"""
+    seed_generators(seed)
+    loader = LOADERS[loader_name](cur, progress=print_progress, wal=wal)
+    
+    # Crear datos
+    user_ids = create_usuario_batch(loader, conn, cur, n)
+    
+    # Roles sobre muestras de usuarios
+    print(f"[CLIENTES] Creando {n//2:,} clientes...")
+    start_time = time.time()
+    cliente_sample = sample_ids(user_ids, n//2)
+    loader.load('Cliente', COLUMNS['Cliente'], gen_clientes(cliente_sample))
+    print(f"[CLIENTES] ✅ Completado en {time.time() - start_time:.1f}s")
+    
+    # Continuar con el resto...
+    print(f"[TRABAJADORES] Creando {n//2:,} trabajadores...")
+    start_time = time.time()
+    trab_sample = sample_ids(user_ids, n//2)
+    loader.load('Trabajador', COLUMNS['Trabajador'], gen_trabajadores(trab_sample))
+    print(f"[TRABAJADORES] ✅ Completado en {time.time() - start_time:.1f}s")
+    
+    conn.commit()
+    print("[COMMIT] ✅ Usuarios y roles confirmados")
+    
+    # Obtener tamaño intermedio
+    cur.execute(f"SELECT pg_size_pretty(pg_database_size('{database}'));")
+    intermediate_size = cur.fetchone()[0]
+    print(f"📊 Tamaño intermedio: {intermediate_size}")
+    
+    # Continuar con repartidores y administradores
+    print(f"[REPARTIDORES] Creando {n//4:,} repartidores...")
+    start_time = time.time()
+    reparto_sample = sample_ids(trab_sample, n//4)
+    loader.load('Repartidor', COLUMNS['Repartidor'], gen_repartidores(reparto_sample))
+    print(f"[REPARTIDORES] ✅ Completado en {time.time() - start_time:.1f}s")
+    
+    print(f"[ADMINISTRADORES] Creando {n//8:,} administradores...")
+    start_time = time.time()
+    admin_sample = sample_ids(trab_sample, n//8)
+    loader.load('Administrador', COLUMNS['Administrador'], gen_administradores(admin_sample))
+    print(f"[ADMINISTRADORES] ✅ Completado en {time.time() - start_time:.1f}s")
+    
+    conn.commit()
+    print("[COMMIT] ✅ Roles completados")
+    
+    # Crear menús
+    print(f"[MENÚS] Creando {n:,} menús...")
+    start_time = time.time()
+    menu_ids = reserve_ids(conn, cur, 'Menu', 'id_menu', n)
+    loader.load('Menu', COLUMNS['Menu'], gen_menus(menu_ids, admin_sample), total=n)
+    print(f"[MENÚS] ✅ Completado: {n:,} menús en {time.time() - start_time:.1f}s")
+    
+    # Crear platos
+    print(f"[PLATOS] Creando {n:,} platos...")
+    start_time = time.time()
+    plato_ids = reserve_ids(conn, cur, 'Plato', 'id_plato', n)
+    loader.load('Plato', COLUMNS['Plato'], gen_platos(plato_ids), total=n)
+    print(f"[PLATOS] ✅ Completado: {n:,} platos en {time.time() - start_time:.1f}s")
+    
+    conn.commit()
+    print("[COMMIT] ✅ Catálogo completado")
+    
+    # Zonas de entrega
+    zonas = ZONAS
+    loader.load('ZonaEntrega', COLUMNS['ZonaEntrega'], [zonas])
+    zona_nombres = [z[0] for z in zonas]
+    print(f"[ZONAS] ✅ {len(zonas)} zonas insertadas")
+    
+    # Crear pedidos
+    print(f"[PEDIDOS] Creando {n:,} pedidos...")
+    start_time = time.time()
+    pedido_ids = reserve_ids(conn, cur, 'Pedido', 'id_pedido', n)
+    layout = partition_layout(conn, cur)
+    load_table(loader, 'Pedido', gen_pedidos(pedido_ids, zona_nombres, cliente_sample), layout, total=n)
+    print(f"[PEDIDOS] ✅ Completado: {n:,} pedidos en {time.time() - start_time:.1f}s")
+    
+    conn.commit()
+    print("[COMMIT] ✅ Pedidos completados")
+    
+    # Crear relaciones Menu-Plato (Pertenece)
+    print(f"[MENU-PLATO] Creando relaciones...")
+    start_time = time.time()
+    total_pertenece = loader.load('Pertenece', COLUMNS['Pertenece'], gen_pertenece(menu_ids, plato_ids))
+    print(f"[MENU-PLATO] ✅ Completado: {total_pertenece:,} relaciones en {time.time() - start_time:.1f}s")
+    
+    # Crear relaciones Pedido-Menu (Tiene)
+    print(f"[PEDIDO-MENU] Creando relaciones...")
+    start_time = time.time()
+    total_tiene = loader.load('Tiene', COLUMNS['Tiene'], gen_tiene(pedido_ids, menu_ids))
+    print(f"[PEDIDO-MENU] ✅ Completado: {total_tiene:,} relaciones en {time.time() - start_time:.1f}s")
+    
+    # Crear calificaciones (Hace)
+    print(f"[CALIFICACIONES] Creando {len(pedido_ids):,} calificaciones...")
+    start_time = time.time()
+    total_calificaciones = load_table(loader, 'Hace', gen_calificaciones(pedido_ids, user_ids), layout,
+                                      total=len(pedido_ids))
+    print(f"[CALIFICACIONES] ✅ Completado: {total_calificaciones:,} calificaciones en {time.time() - start_time:.1f}s")
+    
+    # Crear relaciones Usuario-Zona (Vive)
+    print(f"[USUARIO-ZONA] Creando relaciones...")
+    start_time = time.time()
+    total_vive = loader.load('Vive', COLUMNS['Vive'], gen_zona_por_usuario(user_ids, zona_nombres))
+    print(f"[USUARIO-ZONA] ✅ Completado: {total_vive:,} relaciones en {time.time() - start_time:.1f}s")
+    
+    # Crear relaciones Repartidor-Zona (Cubre)
+    print(f"[REPARTIDOR-ZONA] Creando relaciones...")
+    start_time = time.time()
+    total_cubre = loader.load('Cubre', COLUMNS['Cubre'], gen_zona_por_usuario(reparto_sample, zona_nombres))
+    print(f"[REPARTIDOR-ZONA] ✅ Completado: {total_cubre:,} relaciones en {time.time() - start_time:.1f}s")
+    
+    # Commit final
+    conn.commit()
+    print("[COMMIT] ✅ Todas las relaciones completadas")
+    return loader
+
+def create_large_dataset(n, loader_name='copy', workers=1, seed=None, bulk=False, benchmark=None):
+    """Crea un dataset grande optimizado para 1M+ registros.
+
+    Con `benchmark` (ruta del informe JSON) mide generación, carga, tamaño y WAL
+    por tabla y añade la medición al modelo de estimación (seeder_benchmark.py).
+    """
     print("="*80)
     print("🍔 FREDYS FOOD - SEEDER MASIVO")
     print("="*80)
     
-    estimated_size = estimate_final_size(n)
-    estimated_time = (n / 25000) * 120  # Aproximadamente 2 minutos por cada 25k
+    config = seeder_benchmark.config_key(loader_name, workers, bulk)
+    model = seeder_benchmark.load_model()
+    estimated_size = estimate_final_size(n, model, config)
+    estimated_time = estimate_time(n, config, model)
     
     print(f"📊 Configuración del seeder masivo:")
     print(f"   • Usuarios base: {n:,}")
@@ -98,6 +404,13 @@ def create_large_dataset(n):
     print(f"   • Tamaño final estimado: {estimated_size}")
     print(f"   • Tiempo estimado: {estimated_time/60:.1f} minutos")
     print(f"   • Registros totales: {n*6:,}")
+    measured = seeder_benchmark.measured_range(model)
+    if measured is None:
+        print(f"   • Sin mediciones propias: referencia fija (25k = 68MB); mide con --benchmark")
+    else:
+        low, high = measured
+        note = " (extrapolado)" if n > high else ""
+        print(f"   • Modelo medido con n entre {low:,} y {high:,}{note}")
     print("="*80)
     
     # Información para datasets grandes
@@ -115,294 +428,78 @@ def create_large_dataset(n):
         conn = connect_db()
         cur = conn.cursor()
         
-        print(f"\n🚀 Iniciando seeder masivo...")
+        # Con la misma semilla (y el mismo número de procesos) se repiten los datos
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        print(f"\n🚀 Iniciando seeder masivo (semilla {seed})...")
         
-        # Verificar que la base está vacía y limpiar solo si es necesario
-        cur.execute("SELECT COUNT(*) FROM Usuario;")
-        existing_users = cur.fetchone()[0]
-        
-        if existing_users > 0:
-            print(f"⚠️  Base de datos no está vacía ({existing_users:,} usuarios encontrados)")
-            print("[LIMPIEZA] Limpiando tablas...")
-            all_tables = ['Hace','Cubre','Vive','Tiene','Pedido','Pertenece','Plato','Menu','Administrador','Repartidor','Trabajador','Cliente','Usuario','ZonaEntrega']
-            for table in all_tables:
-                cur.execute(f"DELETE FROM {table} CASCADE")
+        if benchmark:
+            start_lsn = seeder_benchmark.current_lsn(cur)
             conn.commit()
-            print("[LIMPIEZA] ✅ Completada")
-        else:
-            print("[VERIFICACIÓN] ✅ Base de datos está vacía, procediendo directamente...")
-        
-        # Crear datos en lotes
-        user_ids = create_usuario_batch(cur, n)
-        
-        # Resto de datos en lotes también
-        print(f"[CLIENTES] Creando {n//2:,} clientes...")
-        start_time = time.time()
-        cliente_sample = sample(user_ids, k=n//2)
-        clientes = [(uid, fake.company()[:100]) for uid in cliente_sample]
-        cur.executemany("INSERT INTO Cliente (id_usuario, empresa) VALUES (%s, %s)", clientes)
-        print(f"[CLIENTES] ✅ Completado en {time.time() - start_time:.1f}s")
-        
-        # Continuar con el resto...
-        print(f"[TRABAJADORES] Creando {n//2:,} trabajadores...")
-        start_time = time.time()
-        trab_sample = sample(user_ids, k=n//2)
-        trabajadores = [(uid, fake.phone_number()[:30]) for uid in trab_sample]
-        cur.executemany("INSERT INTO Trabajador (id_usuario, telefono_emergencia) VALUES (%s, %s)", trabajadores)
-        print(f"[TRABAJADORES] ✅ Completado en {time.time() - start_time:.1f}s")
-        
-        conn.commit()
-        print("[COMMIT] ✅ Usuarios y roles confirmados")
-        
-        # Obtener tamaño intermedio
-        cur.execute(f"SELECT pg_size_pretty(pg_database_size('{database}'));")
-        intermediate_size = cur.fetchone()[0]
-        print(f"📊 Tamaño intermedio: {intermediate_size}")
-        
-        # Continuar con repartidores y administradores
-        print(f"[REPARTIDORES] Creando {n//4:,} repartidores...")
-        start_time = time.time()
-        reparto_sample = sample(trab_sample, k=n//4)
-        repartidores = [(uid,) for uid in reparto_sample]
-        cur.executemany("INSERT INTO Repartidor (id_usuario) VALUES (%s)", repartidores)
-        print(f"[REPARTIDORES] ✅ Completado en {time.time() - start_time:.1f}s")
-        
-        print(f"[ADMINISTRADORES] Creando {n//8:,} administradores...")
-        start_time = time.time()
-        admin_sample = sample(trab_sample, k=n//8)
-        administradores = [(uid, fake.email()[:100]) for uid in admin_sample]
-        cur.executemany("INSERT INTO Administrador (id_usuario, correo) VALUES (%s, %s)", administradores)
-        print(f"[ADMINISTRADORES] ✅ Completado en {time.time() - start_time:.1f}s")
-        
-        conn.commit()
-        print("[COMMIT] ✅ Roles completados")
-        
-        # Crear menús en lotes
-        print(f"[MENÚS] Creando {n:,} menús...")
-        start_time = time.time()
-        batch_size = 10000
-        menu_ids = []
-        
-        for batch_start in range(0, n, batch_size):
-            batch_end = min(batch_start + batch_size, n)
-            batch_count = batch_end - batch_start
-            
-            menus = []
-            for _ in range(batch_count):
-                id_admin = choice(admin_sample)
-                variacion = fake.word()[:50]
-                fecha = fake.date_between(start_date='-1y', end_date='today')
-                menus.append((id_admin, variacion, fecha))
-            
-            cur.executemany("INSERT INTO Menu (id_administrador, variacion, fecha) VALUES (%s, %s, %s)", menus)
-            
-            # Obtener IDs del lote
-            cur.execute("SELECT id_menu FROM Menu ORDER BY id_menu DESC LIMIT %s", (batch_count,))
-            batch_ids = [row[0] for row in cur.fetchall()][::-1]
-            menu_ids.extend(batch_ids)
-            
-            print_progress("MENÚS", batch_end, n, start_time)
-        
-        print(f"[MENÚS] ✅ Completado: {n:,} menús en {time.time() - start_time:.1f}s")
-        
-        # Crear platos en lotes
-        print(f"[PLATOS] Creando {n:,} platos...")
-        start_time = time.time()
-        plato_ids = []
-        
-        for batch_start in range(0, n, batch_size):
-            batch_end = min(batch_start + batch_size, n)
-            batch_count = batch_end - batch_start
-            
-            platos = []
-            for _ in range(batch_count):
-                nombre = fake.dish()[:100]
-                foto = fake.image_url()
-                tipo = choice(['Entrante', 'Principal', 'Postre', 'Bebida'])[:30]
-                categoria = choice(['Vegano', 'Vegetariano', 'Carne', 'Pescado', 'Sin Gluten'])[:30]
-                precio = round(fake.pyfloat(left_digits=2, right_digits=2, positive=True, min_value=5.0, max_value=50.0), 2)
-                cod_nutri = fake.uuid4()[:36]
-                platos.append((nombre, foto, tipo, categoria, precio, cod_nutri))
-            
-            cur.executemany("INSERT INTO Plato (nombre, foto, tipo, categoria, precio, codigo_info_nutricional) VALUES (%s, %s, %s, %s, %s, %s)", platos)
-            
-            # Obtener IDs del lote
-            cur.execute("SELECT id_plato FROM Plato ORDER BY id_plato DESC LIMIT %s", (batch_count,))
-            batch_ids = [row[0] for row in cur.fetchall()][::-1]
-            plato_ids.extend(batch_ids)
-            
-            print_progress("PLATOS", batch_end, n, start_time)
-        
-        print(f"[PLATOS] ✅ Completado: {n:,} platos en {time.time() - start_time:.1f}s")
-        
-        conn.commit()
-        print("[COMMIT] ✅ Catálogo completado")
         
-        # Zonas de entrega
-        zonas = [('Centro', 5.00), ('Norte', 7.50), ('Sur', 6.50), ('Este', 8.00), ('Oeste', 7.00)]
-        cur.executemany("INSERT INTO ZonaEntrega (nombre, costo) VALUES (%s, %s)", zonas)
-        zona_nombres = [z[0] for z in zonas]
-        print(f"[ZONAS] ✅ {len(zonas)} zonas insertadas")
-        
-        # Crear pedidos en lotes
-        print(f"[PEDIDOS] Creando {n:,} pedidos...")
-        start_time = time.time()
-        pedido_ids = []
-        
-        for batch_start in range(0, n, batch_size):
-            batch_end = min(batch_start + batch_size, n)
-            batch_count = batch_end - batch_start
-            
-            pedidos = []
-            for _ in range(batch_count):
-                fecha = fake.date_time_between(start_date='-30d', end_date='now')
-                estado = choice(['Pendiente', 'Enviado', 'Entregado', 'Cancelado'])
-                hs, he, he_est = fake.time(), fake.time(), fake.time()
-                direccion = fake.address()[:200]
-                zona = choice(zona_nombres)
-                id_cliente = choice(cliente_sample)
-                pedidos.append((fecha, estado, hs, he, he_est, direccion, zona, id_cliente))
-            
-            cur.executemany("INSERT INTO Pedido (fecha, estado, hora_salida, hora_entrega, hora_entrega_estimada, direccion_exacta, zona_entrega, id_cliente) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)", pedidos)
-            
-            # Obtener IDs del lote
-            cur.execute("SELECT id_pedido FROM Pedido ORDER BY id_pedido DESC LIMIT %s", (batch_count,))
-            batch_ids = [row[0] for row in cur.fetchall()][::-1]
-            pedido_ids.extend(batch_ids)
-            
-            print_progress("PEDIDOS", batch_end, n, start_time)
-        
-        print(f"[PEDIDOS] ✅ Completado: {n:,} pedidos en {time.time() - start_time:.1f}s")
-        
-        conn.commit()
-        print("[COMMIT] ✅ Pedidos completados")
-        
-        # Crear relaciones Menu-Plato (Pertenece)
-        print(f"[MENU-PLATO] Creando relaciones...")
-        start_time = time.time()
-        relaciones_pertenece = []
-        for mid in menu_ids:
-            # Cada menú tiene 1-4 platos
-            platos_seleccionados = sample(plato_ids, k=randint(1, min(4, len(plato_ids))))
-            for pid in platos_seleccionados:
-                relaciones_pertenece.append((mid, pid))
-        
-        # Insertar en lotes
-        batch_size_rel = 50000
-        for i in range(0, len(relaciones_pertenece), batch_size_rel):
-            batch = relaciones_pertenece[i:i+batch_size_rel]
-            cur.executemany("INSERT INTO Pertenece (id_menu, id_plato) VALUES (%s, %s)", batch)
-            if i % 100000 == 0:
-                print(f"[MENU-PLATO] Procesadas {i:,}/{len(relaciones_pertenece):,} relaciones")
-        
-        print(f"[MENU-PLATO] ✅ Completado: {len(relaciones_pertenece):,} relaciones en {time.time() - start_time:.1f}s")
-        
-        # Crear relaciones Pedido-Menu (Tiene)
-        print(f"[PEDIDO-MENU] Creando relaciones...")
-        start_time = time.time()
-        relaciones_tiene = []
-        for pid in pedido_ids:
-            # Cada pedido tiene 1-3 menús
-            menus_seleccionados = sample(menu_ids, k=randint(1, 3))
-            for mid in menus_seleccionados:
-                relaciones_tiene.append((pid, mid))
-        
-        # Insertar en lotes
-        for i in range(0, len(relaciones_tiene), batch_size_rel):
-            batch = relaciones_tiene[i:i+batch_size_rel]
-            cur.executemany("INSERT INTO Tiene (id_pedido, id_menu) VALUES (%s, %s)", batch)
-            if i % 100000 == 0:
-                print(f"[PEDIDO-MENU] Procesadas {i:,}/{len(relaciones_tiene):,} relaciones")
-        
-        print(f"[PEDIDO-MENU] ✅ Completado: {len(relaciones_tiene):,} relaciones en {time.time() - start_time:.1f}s")
-        
-        # Crear calificaciones (Hace)
-        print(f"[CALIFICACIONES] Creando {len(pedido_ids):,} calificaciones...")
-        start_time = time.time()
-        calificaciones = []
-        for pid in pedido_ids:
-            uid = choice(user_ids)
-            calificacion = randint(1, 5)
-            comentario = fake.text(max_nb_chars=100)
-            calificaciones.append((pid, uid, calificacion, comentario))
-        
-        # Insertar en lotes
-        for i in range(0, len(calificaciones), batch_size_rel):
-            batch = calificaciones[i:i+batch_size_rel]
-            cur.executemany("INSERT INTO Hace (id_pedido, id_usuario, calificacion, comentario) VALUES (%s,%s,%s,%s)", batch)
-            if i % 100000 == 0:
-                print(f"[CALIFICACIONES] Procesadas {i:,}/{len(calificaciones):,}")
-        
-        print(f"[CALIFICACIONES] ✅ Completado: {len(calificaciones):,} calificaciones en {time.time() - start_time:.1f}s")
-        
-        # Crear relaciones Usuario-Zona (Vive)
-        print(f"[USUARIO-ZONA] Creando relaciones...")
-        start_time = time.time()
-        relaciones_vive = []
-        for uid in user_ids:
-            zona = choice(zona_nombres)
-            relaciones_vive.append((zona, uid))
-        
-        # Insertar en lotes
-        for i in range(0, len(relaciones_vive), batch_size_rel):
-            batch = relaciones_vive[i:i+batch_size_rel]
-            cur.executemany("INSERT INTO Vive (zona_entrega, id_usuario) VALUES (%s, %s)", batch)
-            if i % 100000 == 0:
-                print(f"[USUARIO-ZONA] Procesadas {i:,}/{len(relaciones_vive):,}")
-        
-        print(f"[USUARIO-ZONA] ✅ Completado: {len(relaciones_vive):,} relaciones en {time.time() - start_time:.1f}s")
-        
-        # Crear relaciones Repartidor-Zona (Cubre)
-        print(f"[REPARTIDOR-ZONA] Creando relaciones...")
-        start_time = time.time()
-        relaciones_cubre = []
-        for rid in reparto_sample:
-            zona = choice(zona_nombres)
-            relaciones_cubre.append((zona, rid))
+        bulk_load = None
+        if bulk:
+            from seeder_bulk import BulkLoad
+            bulk_load = BulkLoad(conn, cur, workers if workers > 1 else None, wal=bool(benchmark))
+            bulk_load.reset()
+            bulk_load.defer()
+        else:
+            clean_database(conn, cur)
         
-        cur.executemany("INSERT INTO Cubre (zona_entrega, id_usuario) VALUES (%s,%s)", relaciones_cubre)
-        print(f"[REPARTIDOR-ZONA] ✅ Completado: {len(relaciones_cubre):,} relaciones en {time.time() - start_time:.1f}s")
+        load_start_time = time.time()
+        if workers > 1:
+            from seeder_parallel import seed_parallel
+            loader = seed_parallel(conn, cur, n, workers, loader_name, seed)
+        else:
+            loader = seed_serial(conn, cur, n, loader_name, seed, wal=bool(benchmark))
         
-        # Commit final
-        conn.commit()
-        print("[COMMIT] ✅ Todas las relaciones completadas")
+        if bulk_load:
+            bulk_load.phase("Carga de datos", load_start_time)
+            bulk_load.restore()
+            bulk_load.analyze()
         
         # Obtener tamaño final
         cur.execute(f"SELECT pg_size_pretty(pg_database_size('{database}'));")
         final_size = cur.fetchone()[0]
         
         # Contar todos los registros para el resumen
-        total_registros = (len(user_ids) + len(cliente_sample) + len(trab_sample) + 
-                          len(reparto_sample) + len(admin_sample) + len(menu_ids) + 
-                          len(plato_ids) + len(pedido_ids) + len(zonas) +
-                          len(relaciones_pertenece) + len(relaciones_tiene) + 
-                          len(calificaciones) + len(relaciones_vive) + len(relaciones_cubre))
+        totales = {table: rows for table, (rows, _) in loader.stats.items()}
+        total_registros = sum(totales.values())
         
         total_elapsed = time.time() - total_start_time
         print("="*80)
         print("🎉 SEEDER MASIVO COMPLETADO!")
         print("="*80)
         print(f"📊 Resumen final:")
-        print(f"   • {len(user_ids):,} usuarios")
-        print(f"   • {len(cliente_sample):,} clientes")
-        print(f"   • {len(trab_sample):,} trabajadores")
-        print(f"   • {len(reparto_sample):,} repartidores")
-        print(f"   • {len(admin_sample):,} administradores")
-        print(f"   • {len(menu_ids):,} menús")
-        print(f"   • {len(plato_ids):,} platos")
-        print(f"   • {len(pedido_ids):,} pedidos")
-        print(f"   • {len(zonas)} zonas de entrega")
-        print(f"   • {len(relaciones_pertenece):,} relaciones menú-plato")
-        print(f"   • {len(relaciones_tiene):,} relaciones pedido-menú")
-        print(f"   • {len(calificaciones):,} calificaciones")
-        print(f"   • {len(relaciones_vive):,} relaciones usuario-zona")
-        print(f"   • {len(relaciones_cubre):,} relaciones repartidor-zona")
+        for table, descripcion in RESUMEN:
+            print(f"   • {totales.get(table, 0):,} {descripcion}")
         print(f"")
         print(f"📈 Estadísticas:")
         print(f"   • Total de registros: {total_registros:,}")
         print(f"   • Tiempo total: {total_elapsed/60:.1f} minutos ({total_elapsed:.1f} segundos)")
         print(f"   • Tamaño final: {final_size}")
         print(f"   • Velocidad promedio: {total_registros / total_elapsed:.0f} registros/segundo")
+        rss = peak_rss_mb()
+        if rss is not None:
+            print(f"   • Memoria máxima (RSS): {rss:.1f} MB")
+            if workers > 1:
+                print(f"   • Memoria máxima por proceso hijo (RSS): {peak_rss_mb(children=True):.1f} MB")
+        print(f"")
+        loader.report()
+        if bulk_load:
+            bulk_load.report()
+        if benchmark:
+            sizes = seeder_benchmark.table_sizes(cur, [table for table, _ in RESUMEN])
+            report = seeder_benchmark.build_report(n, config, loader, sizes,
+                                                   seeder_benchmark.wal_since(cur, start_lsn), total_elapsed,
+                                                   bulk_load.phases if bulk_load else ())
+            conn.commit()
+            print(f"")
+            seeder_benchmark.print_report(report)
+            with open(benchmark, 'w') as output:
+                json.dump(report, output, indent=2)
+            seeder_benchmark.record_sample(report)
+            print(f"💾 Informe en {benchmark}; medición añadida a {seeder_benchmark.MODEL_PATH}")
         print(f"")
         print(f"🎯 Base de datos lista para testing masivo!")
         print("="*80)
@@ -417,13 +514,35 @@ def create_large_dataset(n):
         return False
 
 def main():
-    if len(sys.argv) != 2:
-        print("❌ Uso: python seeder_massive.py <num_registros_base>")
-        print("📝 Ejemplo: python seeder_massive.py 1000000")
-        sys.exit(1)
+    # Modo simulate: tráfico de escritura en vivo sobre una base ya sembrada
+    if sys.argv[1:2] == ['simulate']:
+        import seeder_simulate
+        sys.exit(seeder_simulate.main(sys.argv[2:]))
+    # Snapshots: generar una vez a archivos y restaurar muchas veces
+    if sys.argv[1:2] in (['snapshot'], ['restore']):
+        import seeder_snapshot
+        sys.exit(seeder_snapshot.main(sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(
+        description="Seeder masivo de Fredys Food",
+        epilog="📝 Ejemplo: python seeder_massive.py 1000000 | python seeder_massive.py simulate --rate 500")
+    parser.add_argument('n', help="Número de registros base")
+    parser.add_argument('--loader', choices=sorted(LOADERS), default='copy',
+                        help="Método de carga: COPY (por defecto) o INSERT con executemany")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos en paralelo, uno por fragmento de tabla (por defecto 1)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Semilla para reproducir exactamente el mismo dataset")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Carga masiva: TRUNCATE, sin índices secundarios ni claves foráneas "
+                             "durante la carga, reconstrucción en paralelo y VACUUM ANALYZE al final")
+    parser.add_argument('--benchmark', nargs='?', const='seeder_benchmark.json', default=None, metavar='INFORME',
+                        help="Mide generación, carga, tamaño y WAL por tabla, escribe un informe JSON "
+                             "(por defecto seeder_benchmark.json) y actualiza el modelo de estimación")
+    args = parser.parse_args()
     
     try:
-        n = int(sys.argv[1])
+        n = int(args.n)
     except ValueError:
         print("❌ Error: El argumento debe ser un número entero")
         sys.exit(1)
@@ -432,7 +551,11 @@ def main():
         print("❌ Error: El número de registros debe ser mayor a 0")
         sys.exit(1)
     
-    success = create_large_dataset(n)
+    if args.workers < 1:
+        print("❌ Error: --workers debe ser mayor a 0")
+        sys.exit(1)
+    
+    success = create_large_dataset(n, args.loader, args.workers, args.seed, args.bulk, args.benchmark)
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+"""
+Modo paralelo del seeder: un proceso por fragmento (shard) de tabla.
+
+Las tablas grandes se dividen en rangos contiguos de IDs y cada rango lo genera
+y carga su propio proceso, con su propia conexión. El coordinador ejecuta las
+fases en orden de claves foráneas y sólo avanza cuando todos los fragmentos de
+la fase anterior han hecho commit.
+"""
+import time
+from multiprocessing import Pool
+
+import seeder_massive as seeder
+from seeder_copy import LOADERS, Loader
+
+# Fases en orden de claves foráneas: usuarios antes que roles, menús/platos
+# antes que Pertenece y pedidos antes que Tiene/Hace
+PHASES = [
+    ['Usuario', 'Plato'],
+    ['Cliente', 'Trabajador'],
+    ['Repartidor', 'Administrador'],
+    ['Menu', 'Pedido', 'Vive', 'Cubre'],
+    ['Pertenece', 'Tiene', 'Hace'],
+]
+
+# Tablas con IDs seriales que el coordinador reserva por bloques
+SERIAL_TABLES = [('Usuario', 'id_usuario'), ('Menu', 'id_menu'), ('Plato', 'id_plato'), ('Pedido', 'id_pedido')]
+
+# Datos compartidos con los procesos de cada fase (dominios de IDs y muestras)
+_shared = {}
+
+
+def _init_worker(shared):
+    _shared.update(shared)
+
+
+def split_range(count, parts):
+    """Divide [0, count) en hasta `parts` rangos contiguos (inicio, fin)"""
+    step, extra = divmod(count, parts)
+    bounds = []
+    start = 0
+    for i in range(parts):
+        end = start + step + (1 if i < extra else 0)
+        if end > start:
+            bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def shard_rows(table, ids):
+    """Etapa de generación de una tabla para un fragmento de su dominio"""
+    s = _shared
+    if table == 'Usuario':
+        return seeder.gen_usuarios(ids)
+    if table == 'Cliente':
+        return seeder.gen_clientes(ids)
+    if table == 'Trabajador':
+        return seeder.gen_trabajadores(ids)
+    if table == 'Repartidor':
+        return seeder.gen_repartidores(ids)
+    if table == 'Administrador':
+        return seeder.gen_administradores(ids)
+    if table == 'Menu':
+        return seeder.gen_menus(ids, s['Administrador'])
+    if table == 'Plato':
+        return seeder.gen_platos(ids)
+    if table == 'Pedido':
+        return seeder.gen_pedidos(ids, s['zonas'], s['Cliente'], s['Pedido'])
+    if table == 'Pertenece':
+        return seeder.gen_pertenece(ids, s['Plato'])
+    if table == 'Tiene':
+        return seeder.gen_tiene(ids, s['Menu'])
+    if table == 'Hace':
+        return seeder.gen_calificaciones(ids, s['Usuario'])
+    if table in ('Vive', 'Cubre'):
+        return seeder.gen_zona_por_usuario(ids, s['zonas'])
+    raise ValueError(f"Tabla sin generador paralelo: {table}")
+
+
+# Dominio que recorre cada tabla: las relaciones se fragmentan por la tabla padre
+DOMAINS = {'Pertenece': 'Menu', 'Tiene': 'Pedido', 'Hace': 'Pedido', 'Vive': 'Usuario', 'Cubre': 'Repartidor'}
+
+
+def load_shard(task):
+    """Genera y carga un fragmento en su propia conexión; devuelve sus tiempos"""
+    table, lo, hi, seed = task
+    # Cada fragmento tiene su propia semilla: los procesos no repiten datos
+    seeder.seed_generators(seed, _shared['pools'], _shared['now'])
+    started = time.time()
+    conn = seeder.connect_db()
+    try:
+        cur = conn.cursor()
+        ids = _shared[DOMAINS.get(table, table)][lo:hi]
+        loader = LOADERS[_shared['loader']](cur)
+        count = seeder.load_table(loader, table, shard_rows(table, ids), _shared['particiones'])
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    return table, count, started, time.time(), loader.split.get(table, (0.0, 0.0))
+
+
+def seed_parallel(conn, cur, n, workers, loader_name='copy', seed=0):
+    """Carga el dataset con `workers` procesos, fase a fase, y devuelve las estadísticas"""
+    print(f"[PARALELO] Iniciando con {workers} procesos...")
+    stats = Loader(None)
+    stats.name = f"{loader_name} x{workers}"
+
+    # Bloques de IDs reservados en las secuencias, repartidos luego por fragmentos
+    shared = {'loader': loader_name}
+    for table, id_column in SERIAL_TABLES:
+        shared[table] = seeder.reserve_ids(conn, cur, table, id_column, n)
+
+    zonas = seeder.ZONAS
+    LOADERS[loader_name](cur).load('ZonaEntrega', seeder.COLUMNS['ZonaEntrega'], [zonas])
+    conn.commit()
+    stats._record('ZonaEntrega', len(zonas), 0.0)
+    shared['zonas'] = [z[0] for z in zonas]
+
+    # Pools de vocabulario y muestras de roles: se calculan en el coordinador
+    # para que sean consistentes y viajan a los procesos ya construidos
+    seeder.seed_generators(seed)
+    shared['pools'] = seeder.data.pools
+    shared['now'] = seeder.data.now
+    # Particiones de Pedido/Hace: cada fragmento copia directamente a las suyas
+    shared['particiones'] = seeder.partition_layout(conn, cur)
+    shared['Cliente'] = seeder.sample_ids(shared['Usuario'], n//2)
+    shared['Trabajador'] = seeder.sample_ids(shared['Usuario'], n//2)
+    shared['Repartidor'] = seeder.sample_ids(shared['Trabajador'], n//4)
+    shared['Administrador'] = seeder.sample_ids(shared['Trabajador'], n//8)
+
+    for number, tables in enumerate(PHASES, 1):
+        phase_start = time.time()
+        tasks = []
+        for table in tables:
+            domain = shared[DOMAINS.get(table, table)]
+            for lo, hi in split_range(len(domain), workers):
+                seed += 1
+                tasks.append((table, lo, hi, seed))
+
+        spans = {}
+        with Pool(workers, initializer=_init_worker, initargs=(shared,)) as pool:
+            for table, count, started, finished, (generation, load) in pool.imap_unordered(load_shard, tasks):
+                rows, first, last = spans.get(table, (0, started, finished))
+                spans[table] = (rows + count, min(first, started), max(last, finished))
+                # Segundos de proceso sumados entre fragmentos
+                stats._split(table, generation, load)
+        for table in tables:
+            rows, first, last = spans.get(table, (0, 0.0, 0.0))
+            stats._record(table, rows, last - first)
+        print(f"[PARALELO] ✅ Fase {number} ({', '.join(tables)}) en {time.time() - phase_start:.1f}s")
+
+    print("[COMMIT] ✅ Todas las fases completadas")
+    return stats
@@ -0,0 +1,306 @@
+"""
+Modo simulate del seeder: tráfico de escritura en vivo a un ritmo objetivo.
+
+Sobre una base ya sembrada, llegan --rate pedidos por segundo durante
+--duration segundos (llegadas a intervalos fijos, sin esperar a que terminen las
+anteriores) y cada pedido recorre su ciclo en tres transacciones:
+1. alta: Pedido 'Pendiente' con fecha actual y hora de entrega estimada, y sus
+   menús en Tiene
+2. envío (--envio segundos después): 'Enviado' con hora_salida
+3. entrega (--entrega segundos después): 'Entregado' con hora_entrega y la
+   calificación del cliente en Hace
+Las transacciones se reparten entre --connections conexiones, cada una en su
+hilo. Las filas salen del mismo generador que la carga histórica (pools de
+vocabulario de seeder_gen.py, una semilla por conexión).
+
+Al final se informa el ritmo de altas conseguido frente al objetivo, el retraso
+de cada transacción respecto de su hora prevista (si crece, la base no da
+abasto) y los percentiles de latencia hasta el commit de cada paso.
+
+Uso: python seeder_massive.py simulate --rate 500 --duration 60 --connections 16
+"""
+import argparse
+import heapq
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+import seeder_massive as seeder
+from seeder_gen import SyntheticData, build_pools
+from stats import percentile
+
+STEPS = ('alta', 'envio', 'entrega')
+# Minutos entre el alta y la entrega estimada
+ETA_MINUTES = (20, 60)
+PROGRESS_SECONDS = 5
+
+INSERT_PEDIDO = """
+INSERT INTO Pedido (fecha, estado, hora_entrega_estimada, direccion_exacta, zona_entrega, id_cliente)
+VALUES (LOCALTIMESTAMP(0), 'Pendiente', (LOCALTIMESTAMP(0) + make_interval(mins => %s))::time, %s, %s, %s)
+RETURNING id_pedido, fecha
+"""
+# Con fecha en el WHERE, si Pedido está particionada sólo se toca su partición
+UPDATE_ENVIO = """
+UPDATE Pedido SET estado = 'Enviado', hora_salida = LOCALTIME(0)
+WHERE id_pedido = %s AND fecha = %s
+"""
+UPDATE_ENTREGA = """
+UPDATE Pedido SET estado = 'Entregado', hora_entrega = LOCALTIME(0)
+WHERE id_pedido = %s AND fecha = %s
+"""
+
+
+def reference_ids(cur):
+    """Clientes, menús y zonas existentes, que los pedidos nuevos referencian"""
+    cur.execute("SELECT id_usuario FROM Cliente")
+    clientes = np.array([row[0] for row in cur.fetchall()], dtype=seeder.ID_DTYPE)
+    cur.execute("SELECT id_menu FROM Menu")
+    menus = np.array([row[0] for row in cur.fetchall()], dtype=seeder.ID_DTYPE)
+    cur.execute("SELECT nombre FROM ZonaEntrega")
+    zonas = [row[0] for row in cur.fetchall()]
+    return clientes, menus, zonas
+
+
+class Order:
+    __slots__ = ('id_pedido', 'fecha', 'cliente')
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.id_pedido = self.fecha = None
+
+
+class Simulation:
+    """Agenda compartida de transacciones pendientes y sus mediciones"""
+
+    def __init__(self, rate, duration, envio, entrega):
+        self.rate = rate
+        self.arrivals = int(rate * duration)
+        self.delays = {'envio': envio, 'entrega': entrega}
+        self.condition = threading.Condition()
+        # (hora prevista, orden de llegada, paso, pedido) de envíos y entregas
+        self.agenda = []
+        self.sequence = 0
+        self.next_arrival = 0
+        self.in_flight = 0
+        self.start = None
+        self.latencies = {step: [] for step in STEPS}
+        self.lags = {step: [] for step in STEPS}
+        self.errors = 0
+        self.last_alta = None
+
+    def arrival_due(self):
+        return self.start + self.next_arrival / self.rate
+
+    def done(self):
+        return self.next_arrival >= self.arrivals and not self.agenda and not self.in_flight
+
+    def take(self):
+        """Siguiente transacción cuya hora llegó: (paso, pedido, hora prevista), o None al terminar"""
+        with self.condition:
+            while True:
+                if self.done():
+                    self.condition.notify_all()
+                    return None
+                candidates = []
+                if self.agenda:
+                    candidates.append(self.agenda[0][0])
+                if self.next_arrival < self.arrivals:
+                    candidates.append(self.arrival_due())
+                if not candidates:
+                    # Quedan transacciones en curso que pueden agendar el paso siguiente
+                    self.condition.wait()
+                    continue
+                due = min(candidates)
+                wait = due - time.perf_counter()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                self.in_flight += 1
+                if self.agenda and self.agenda[0][0] == due:
+                    _, _, step, order = heapq.heappop(self.agenda)
+                    return step, order, due
+                self.next_arrival += 1
+                return 'alta', None, due
+
+    def finish(self, step, order, due, started, committed):
+        with self.condition:
+            self.in_flight -= 1
+            if order is None:
+                self.errors += 1
+            else:
+                self.lags[step].append(started - due)
+                self.latencies[step].append(committed - started)
+                if step == 'alta':
+                    self.last_alta = committed
+                following = STEPS.index(step) + 1
+                if following < len(STEPS):
+                    next_step = STEPS[following]
+                    self.sequence += 1
+                    heapq.heappush(self.agenda, (committed + self.delays[next_step], self.sequence, next_step, order))
+            self.condition.notify_all()
+
+
+class Writer:
+    """Una conexión con su propio generador de filas"""
+
+    def __init__(self, simulation, references, pools, seed):
+        self.simulation = simulation
+        self.clientes, self.menus, self.zonas = references
+        self.data = SyntheticData(seed, pools)
+        self.conn = seeder.connect_db()
+        self.cur = self.conn.cursor()
+
+    def alta(self):
+        data = self.data
+        order = Order(int(self.clientes[data.rng.integers(0, len(self.clientes))]))
+        eta = int(data.rng.integers(*ETA_MINUTES))
+        self.cur.execute(INSERT_PEDIDO, (eta, data.vocab('direccion', 1)[0], data.choice(self.zonas, 1)[0],
+                                         order.cliente))
+        order.id_pedido, order.fecha = self.cur.fetchone()
+        # Cada pedido tiene 1-3 menús distintos, como en la carga histórica
+        tiene = data.relaciones([order.id_pedido], self.menus, 1, 3)
+        execute_values(self.cur, "INSERT INTO Tiene (id_pedido, id_menu) VALUES %s", tiene)
+        return order
+
+    def envio(self, order):
+        self.cur.execute(UPDATE_ENVIO, (order.id_pedido, order.fecha))
+        return order
+
+    def entrega(self, order):
+        self.cur.execute(UPDATE_ENTREGA, (order.id_pedido, order.fecha))
+        # La calificación la deja el cliente que hizo el pedido
+        execute_values(self.cur, "INSERT INTO Hace (id_pedido, id_usuario, calificacion, comentario) VALUES %s",
+                       self.data.calificaciones([order.id_pedido], [order.cliente]))
+        return order
+
+    def run(self):
+        simulation = self.simulation
+        while True:
+            task = simulation.take()
+            if task is None:
+                break
+            step, order, due = task
+            started = time.perf_counter()
+            try:
+                order = self.alta() if step == 'alta' else getattr(self, step)(order)
+                self.conn.commit()
+            except Exception as error:
+                self.conn.rollback()
+                if simulation.errors < 5:
+                    print(f"❌ Error en {step}: {error}")
+                    sys.stdout.flush()
+                order = None
+            simulation.finish(step, order, due, started, time.perf_counter())
+        self.conn.close()
+
+
+def ms(value):
+    return round(value * 1000, 2) if value is not None else None
+
+
+def summary(values):
+    values = sorted(values)
+    return {'count': len(values), 'p50_ms': ms(percentile(values, 0.50)), 'p95_ms': ms(percentile(values, 0.95)),
+            'p99_ms': ms(percentile(values, 0.99)), 'max_ms': ms(values[-1] if values else None)}
+
+
+def report(simulation, elapsed):
+    altas = len(simulation.latencies['alta'])
+    window = (simulation.last_alta - simulation.start) if simulation.last_alta else 0
+    return {
+        'target_rate': simulation.rate,
+        'achieved_rate': round(altas / window, 1) if window > 0 else 0.0,
+        'orders': altas,
+        'errors': simulation.errors,
+        'seconds': round(elapsed, 1),
+        'commit_latency': {step: summary(simulation.latencies[step]) for step in STEPS},
+        'schedule_lag': {step: summary(simulation.lags[step]) for step in STEPS},
+    }
+
+
+def print_report(result):
+    print(f"🚚 Pedidos: {result['orders']:,} en {result['seconds']:.1f}s | "
+          f"ritmo {result['achieved_rate']:,.1f}/s de {result['target_rate']:,.1f}/s objetivo | "
+          f"errores: {result['errors']:,}")
+    print(f"   {'Paso':<10}{'Commits':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}{'Retraso p95':>13}")
+    for step in STEPS:
+        latency, lag = result['commit_latency'][step], result['schedule_lag'][step]
+        cells = [f"{latency[key]:>9.2f}" if latency[key] is not None else f"{'-':>9}"
+                 for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+        lag_p95 = f"{lag['p95_ms']:,.1f} ms" if lag['p95_ms'] is not None else '-'
+        print(f"   {step:<10}{latency['count']:>9,}{''.join(cells)}{lag_p95:>13}")
+    sys.stdout.flush()
+
+
+def progress(simulation, stop):
+    while not stop.wait(PROGRESS_SECONDS):
+        with simulation.condition:
+            altas = len(simulation.latencies['alta'])
+            entregas = len(simulation.latencies['entrega'])
+            pending = len(simulation.agenda)
+        elapsed = time.perf_counter() - simulation.start
+        print(f"[SIMULATE] t={elapsed:.0f}s | altas {altas:,} ({altas / elapsed:,.0f}/s) | "
+              f"entregas {entregas:,} | en espera {pending:,}")
+        sys.stdout.flush()
+
+
+def simulate(rate, duration, connections, envio, entrega, seed=None):
+    conn = seeder.connect_db()
+    references = reference_ids(conn.cursor())
+    conn.close()
+    if not all(len(values) for values in references):
+        print("❌ Faltan clientes, menús o zonas: siembra la base primero (python seeder_massive.py N)")
+        return None
+    pools = build_pools(seed)
+    simulation = Simulation(rate, duration, envio, entrega)
+    base_seed = seed if seed is not None else int(time.time())
+    writers = [Writer(simulation, references, pools, base_seed + index) for index in range(connections)]
+    print(f"🚚 Simulando {rate:,.0f} pedidos/seg durante {duration}s con {connections} conexiones "
+          f"(envío a los {envio}s, entrega a los {entrega}s)")
+    sys.stdout.flush()
+
+    simulation.start = time.perf_counter()
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer.run, name=f'writer-{index}') for index, writer in enumerate(writers)]
+    threads.append(threading.Thread(target=progress, args=(simulation, stop), daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads[:-1]:
+        thread.join()
+    stop.set()
+    result = report(simulation, time.perf_counter() - simulation.start)
+    print_report(result)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='seeder_massive.py simulate',
+        description="Tráfico de escritura en vivo: pedidos nuevos con su ciclo Pendiente→Enviado→Entregado")
+    parser.add_argument('--rate', type=float, default=100, help="Pedidos nuevos por segundo (por defecto 100)")
+    parser.add_argument('--duration', type=int, default=30, help="Segundos con llegadas (por defecto 30)")
+    parser.add_argument('--connections', type=int, default=8, help="Conexiones en paralelo (por defecto 8)")
+    parser.add_argument('--envio', type=float, default=2, help="Segundos entre alta y envío (por defecto 2)")
+    parser.add_argument('--entrega', type=float, default=5, help="Segundos entre envío y entrega (por defecto 5)")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla de los datos generados")
+    parser.add_argument('--output', default=None, help="Guarda el informe en este archivo JSON")
+    args = parser.parse_args(argv)
+    if args.rate <= 0 or args.duration <= 0 or args.connections < 1:
+        print("❌ Error: --rate, --duration y --connections deben ser mayores a 0")
+        return 1
+    result = simulate(args.rate, args.duration, args.connections, args.envio, args.entrega, args.seed)
+    if result is None:
+        return 1
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(result, output, indent=2)
+        print(f"💾 Informe guardado en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
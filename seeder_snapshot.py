@@ -0,0 +1,325 @@
+"""
+Snapshots del dataset: generar una vez a archivos, restaurar muchas veces.
+
+`snapshot` genera el dataset de n registros base sin tocar la base de datos:
+los IDs se asignan desde 1 (como en una base vacía) y cada tabla se divide en
+--shards rangos disjuntos de su dominio, igual que el modo paralelo. Cada
+(tabla, shard) usa su propia semilla derivada de --seed, y las muestras de roles
+y los pools de vocabulario salen de --seed, así que el resultado sólo depende de
+n, --seed, --now y --shards: varias máquinas pueden generar cada una sus shards
+(--shard 0-3, --shard 4-7...) y juntar los archivos en un mismo directorio.
+
+Cada (tabla, shard) se guarda como formato texto de COPY comprimido con gzip
+(tabla.NNNN.copy.gz) y cada shard escribe su manifest.NNNN.json con los
+parámetros, las columnas y las filas de cada archivo.
+
+`restore` carga un snapshot completo en la base: verifica que estén todos los
+shards, vacía las tablas (sólo con --force si tienen datos), elimina índices y
+claves foráneas como --bulk, ejecuta un COPY por archivo con --workers
+conexiones en paralelo, reconstruye índices y claves, ajusta las secuencias y
+comprueba el número de filas de cada tabla contra los manifiestos.
+
+Uso: python seeder_massive.py snapshot 1000000 snapshots/1m --seed 42 --workers 8
+     python seeder_massive.py snapshot 1000000 snapshots/1m --seed 42 --shard 0-3   (una parte)
+     python seeder_massive.py restore snapshots/1m --workers 8
+"""
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import partitions
+import seeder_massive as seeder
+import seeder_parallel
+from seeder_bulk import TABLES, BulkLoad
+from seeder_copy import COPY_READ_SIZE, RowStream
+
+FORMAT = 'copy-text-gzip'
+COMPRESS_LEVEL = 3
+DEFAULT_SHARDS = 8
+# Tablas en el orden de COLUMNS: su posición forma parte de la semilla de cada archivo
+TABLE_INDEX = {table: index for index, table in enumerate(seeder.COLUMNS)}
+
+# Dominios y muestras del snapshot, compartidos con los procesos
+_plan = {}
+
+
+def build_plan(n, seed, now):
+    """Dominios de IDs y muestras de roles, iguales en cualquier máquina con los mismos n/seed/now"""
+    seeder.seed_generators(seed, now=now)
+    plan = {table: range(1, n + 1) for table, _ in seeder_parallel.SERIAL_TABLES}
+    plan.update(seed=seed, now=now, loader=None, particiones={})
+    plan['zonas'] = [zona for zona, _ in seeder.ZONAS]
+    plan['pools'] = seeder.data.pools
+    # Mismo orden de muestreo que el modo paralelo
+    plan['Cliente'] = seeder.sample_ids(plan['Usuario'], n//2)
+    plan['Trabajador'] = seeder.sample_ids(plan['Usuario'], n//2)
+    plan['Repartidor'] = seeder.sample_ids(plan['Trabajador'], n//4)
+    plan['Administrador'] = seeder.sample_ids(plan['Trabajador'], n//8)
+    return plan
+
+
+def _init_worker(plan):
+    _plan.update(plan)
+    seeder_parallel._init_worker(plan)
+
+
+def units(plan, shards, selected):
+    """(tabla, shard, desde, hasta) a generar para los shards elegidos"""
+    tasks = []
+    for table in seeder.COLUMNS:
+        if table == 'ZonaEntrega':
+            if 0 in selected:
+                tasks.append((table, 0, 0, len(seeder.ZONAS)))
+            continue
+        domain = plan[seeder_parallel.DOMAINS.get(table, table)]
+        bounds = seeder_parallel.split_range(len(domain), shards)
+        tasks += [(table, shard, *bounds[shard]) for shard in sorted(selected) if shard < len(bounds)]
+    return tasks
+
+
+def file_name(table, shard):
+    return f"{table.lower()}.{shard:04d}.copy.gz"
+
+
+def write_unit(task, directory):
+    """Genera un (tabla, shard) y lo escribe comprimido; devuelve su entrada del manifiesto"""
+    table, shard, lo, hi = task
+    seeder.seed_generators([_plan['seed'], TABLE_INDEX[table], shard], _plan['pools'], _plan['now'])
+    if table == 'ZonaEntrega':
+        chunks = [seeder.ZONAS]
+    else:
+        ids = _plan[seeder_parallel.DOMAINS.get(table, table)][lo:hi]
+        chunks = seeder_parallel.shard_rows(table, ids)
+    path = os.path.join(directory, file_name(table, shard))
+    stream = RowStream(chunks)
+    # Sin nombre ni fecha en la cabecera gzip: los mismos parámetros dan los mismos bytes
+    with open(path + '.tmp', 'wb') as raw, \
+            gzip.GzipFile(filename='', mode='wb', compresslevel=COMPRESS_LEVEL, fileobj=raw, mtime=0) as packed, \
+            io.TextIOWrapper(packed, encoding='utf-8') as output:
+        while True:
+            data = stream.read(COPY_READ_SIZE)
+            if not data:
+                break
+            output.write(data)
+    os.replace(path + '.tmp', path)
+    return {'table': table, 'shard': shard, 'file': file_name(table, shard), 'rows': stream.count,
+            'bytes': os.path.getsize(path)}
+
+
+def _write_unit(args):
+    return write_unit(*args)
+
+
+def parse_shards(spec, shards):
+    """'3', '0-3' o '0,2,5' -> conjunto de shards; None = todos"""
+    if spec is None:
+        return set(range(shards))
+    selected = set()
+    for part in spec.split(','):
+        lo, _, hi = part.partition('-')
+        selected.update(range(int(lo), int(hi or lo) + 1))
+    if not selected or max(selected) >= shards or min(selected) < 0:
+        raise ValueError(f"--shard debe estar entre 0 y {shards - 1}")
+    return selected
+
+
+def snapshot(n, directory, seed=0, now=None, shards=DEFAULT_SHARDS, selected=None, workers=1):
+    """Genera los shards elegidos en `directory` y escribe sus manifiestos"""
+    now = now or datetime.combine(datetime.now().date(), datetime.min.time())
+    selected = set(range(shards)) if selected is None else selected
+    os.makedirs(directory, exist_ok=True)
+    print(f"📦 Snapshot de {n:,} registros base (semilla {seed}, ahora = {now.isoformat()}): "
+          f"shards {min(selected)}-{max(selected)} de {shards}, {workers} procesos")
+    sys.stdout.flush()
+    start_time = time.time()
+    plan = build_plan(n, seed, now)
+    tasks = [(task, directory) for task in units(plan, shards, selected)]
+    # Primero los más grandes, para repartir mejor entre procesos
+    tasks.sort(key=lambda item: item[0][3] - item[0][2], reverse=True)
+    if workers > 1:
+        with Pool(workers, initializer=_init_worker, initargs=(plan,)) as pool:
+            entries = list(pool.imap_unordered(_write_unit, tasks))
+    else:
+        _init_worker(plan)
+        entries = [_write_unit(task) for task in tasks]
+
+    for shard in sorted(selected):
+        files = sorted((entry for entry in entries if entry['shard'] == shard),
+                       key=lambda entry: TABLE_INDEX[entry['table']])
+        manifest = {'format': FORMAT, 'n': n, 'seed': seed, 'now': now.isoformat(), 'shards': shards,
+                    'shard': shard, 'columns': {table: seeder.COLUMNS[table] for table in seeder.COLUMNS},
+                    'files': files}
+        with open(os.path.join(directory, f"manifest.{shard:04d}.json"), 'w') as output:
+            json.dump(manifest, output, indent=2)
+
+    rows = sum(entry['rows'] for entry in entries)
+    size = sum(entry['bytes'] for entry in entries)
+    elapsed = time.time() - start_time
+    print(f"✅ {len(entries)} archivos, {rows:,} filas, {size / 1024 / 1024:,.1f} MB comprimidos "
+          f"en {elapsed:.1f}s ({rows / elapsed:,.0f} filas/seg)")
+    return entries
+
+
+def read_manifests(directory):
+    """Manifiestos de todos los shards, o (None, motivo) si el snapshot está incompleto"""
+    manifests = []
+    for path in sorted(glob.glob(os.path.join(directory, 'manifest.*.json'))):
+        with open(path) as manifest:
+            manifests.append(json.load(manifest))
+    if not manifests:
+        return None, f"no hay manifiestos en {directory}"
+    first = manifests[0]
+    for manifest in manifests:
+        if any(manifest[key] != first[key] for key in ('format', 'n', 'seed', 'now', 'shards')):
+            return None, f"el shard {manifest['shard']} es de otro snapshot (n, seed, now o shards distintos)"
+    missing = sorted(set(range(first['shards'])) - {manifest['shard'] for manifest in manifests})
+    if missing:
+        return None, f"faltan los shards {', '.join(map(str, missing))}"
+    return manifests, None
+
+
+def copy_file(directory, columns, entry):
+    """COPY de un archivo en su propia conexión"""
+    start_time = time.time()
+    conn = seeder.connect_db()
+    try:
+        with conn.cursor() as cur, gzip.open(os.path.join(directory, entry['file']), 'rt', encoding='utf-8') as data:
+            cur.copy_expert(f"COPY {entry['table']} ({', '.join(columns[entry['table']])}) FROM STDIN", data,
+                            size=COPY_READ_SIZE)
+        conn.commit()
+    finally:
+        conn.close()
+    return entry['table'], entry['rows'], time.time() - start_time
+
+
+def reset_sequences(cur):
+    """Las secuencias siguen al mayor ID cargado"""
+    for table, column in seeder_parallel.SERIAL_TABLES:
+        cur.execute(f"SELECT setval(pg_get_serial_sequence(%s, %s), "
+                    f"COALESCE((SELECT max({column}) FROM {table}), 0) + 1, false)", (table.lower(), column))
+
+
+def non_empty_tables(cur):
+    found = []
+    for table in TABLES:
+        cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+        if cur.fetchone()[0]:
+            found.append(table)
+    return found
+
+
+def verify_counts(cur, expected):
+    """Filas de cada tabla contra los manifiestos; True si coinciden todas"""
+    ok = True
+    for table, rows in expected.items():
+        cur.execute(f"SELECT count(*) FROM {table}")
+        actual = cur.fetchone()[0]
+        ok = ok and actual == rows
+        print(f"   {'✅' if actual == rows else '❌'} {table}: {actual:,} filas (manifiesto: {rows:,})")
+    return ok
+
+
+def restore(directory, workers=1, force=False):
+    manifests, problem = read_manifests(directory)
+    if manifests is None:
+        print(f"❌ Snapshot incompleto: {problem}")
+        return False
+    first = manifests[0]
+    columns = first['columns']
+    entries = sorted((entry for manifest in manifests for entry in manifest['files']),
+                     key=lambda entry: entry['bytes'], reverse=True)
+    expected = {table: 0 for table in columns}
+    for entry in entries:
+        expected[entry['table']] += entry['rows']
+    print(f"📦 Restaurando snapshot de {first['n']:,} registros base ({first['shards']} shards, "
+          f"{len(entries)} archivos, {sum(expected.values()):,} filas) con {workers} conexiones")
+    print(f"   Fechas relativas a {first['now']}")
+    sys.stdout.flush()
+
+    total_start = time.time()
+    conn = seeder.connect_db()
+    cur = conn.cursor()
+    try:
+        occupied = non_empty_tables(cur)
+        conn.commit()
+        if occupied and not force:
+            print(f"❌ La base ya tiene datos en {', '.join(occupied)}: usa --force para vaciarla")
+            return False
+        bulk = BulkLoad(conn, cur, workers)
+        bulk.reset()
+        bulk.defer()
+        # Particiones de Pedido/Hace para las fechas del snapshot
+        partitions.seed_layout(cur, datetime.fromisoformat(first['now']) - timedelta(days=30))
+        conn.commit()
+
+        start_time = time.time()
+        with ThreadPoolExecutor(workers) as pool:
+            loaded = list(pool.map(lambda entry: copy_file(directory, columns, entry), entries))
+        bulk.phase(f"COPY de {len(loaded)} archivos", start_time)
+        bulk.restore()
+        reset_sequences(cur)
+        conn.commit()
+        bulk.analyze()
+
+        print("🔎 Verificando filas:")
+        ok = verify_counts(cur, expected)
+        conn.commit()
+        bulk.report()
+        elapsed = time.time() - total_start
+        print(f"{'✅' if ok else '❌'} Restauración en {elapsed:.1f}s "
+              f"({sum(expected.values()) / elapsed:,.0f} filas/seg); refresca las vistas con python rollups.py")
+        return ok
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='seeder_massive.py',
+                                     description="Snapshots del dataset: generar una vez, restaurar muchas veces")
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('snapshot', help="Genera el dataset a archivos comprimidos")
+    generate.add_argument('n', type=int, help="Número de registros base")
+    generate.add_argument('directory', help="Directorio del snapshot")
+    generate.add_argument('--seed', type=int, default=0, help="Semilla (por defecto 0)")
+    generate.add_argument('--now', default=None,
+                          help="Instante de referencia ISO de las fechas (por defecto hoy a las 00:00)")
+    generate.add_argument('--shards', type=int, default=DEFAULT_SHARDS,
+                          help=f"Rangos de IDs en que se divide cada tabla (por defecto {DEFAULT_SHARDS})")
+    generate.add_argument('--shard', default=None, help="Shards a generar aquí, p. ej. 3, 0-3 o 0,2 (por defecto todos)")
+    generate.add_argument('--workers', type=int, default=1, help="Procesos en paralelo (por defecto 1)")
+    load = commands.add_parser('restore', help="Carga un snapshot y verifica las filas")
+    load.add_argument('directory', help="Directorio del snapshot")
+    load.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                      help="Conexiones en paralelo (por defecto, una por CPU)")
+    load.add_argument('--force', action='store_true', help="Vacía las tablas aunque tengan datos")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        print("❌ Error: --workers debe ser mayor a 0")
+        return 1
+    if args.command == 'restore':
+        return 0 if restore(args.directory, args.workers, args.force) else 1
+    if args.n <= 0 or args.shards < 1:
+        print("❌ Error: n y --shards deben ser mayores a 0")
+        return 1
+    try:
+        selected = parse_shards(args.shard, args.shards)
+        now = datetime.fromisoformat(args.now) if args.now else None
+    except ValueError as error:
+        print(f"❌ Error: {error}")
+        return 1
+    snapshot(args.n, args.directory, args.seed, now, args.shards, selected, args.workers)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
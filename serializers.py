@@ -0,0 +1,127 @@
+"""
+Serialización JSON de filas sin diccionarios intermedios.
+
+Para cada tabla o consulta se precompila una vez un RowEncoder: nombres de
+columna ya escapados y ordenados (como jsonify, con sort_keys) en una plantilla
+'{"a":%s,"b":%s}' y un conversor por tipo de valor. Cada fila se escribe
+directamente desde su tupla. La salida es la misma que producía jsonify:
+fechas como http_date, Decimal/UUID como texto y, en modo 'text', datetime/time
+como '%Y-%m-%d %H:%M:%S' (lo que hacía convert_to_str).
+
+Las partes genéricas de las respuestas (meta, errores) se codifican con orjson
+si está instalado y si no con el json estándar.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+from operator import itemgetter
+from uuid import UUID
+
+from flask import Response
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # opcional: sólo acelera dumps()
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """JSON compacto con claves ordenadas, igual que jsonify"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(obj, default=_default, sort_keys=True, separators=(',', ':'))
+
+
+def _quoted(value):
+    return f'"{value}"'
+
+
+def _text_datetime(value):
+    # Igual que strftime('%Y-%m-%d %H:%M:%S'), bastante más rápido
+    return '"' + value.isoformat(' ', 'seconds') + '"'
+
+
+def _text_time(value):
+    # time.strftime('%Y-%m-%d %H:%M:%S') rellena la fecha con 1900-01-01
+    return '"1900-01-01 ' + value.isoformat('seconds') + '"'
+
+
+def _http_date(value):
+    return f'"{http_date(value)}"'
+
+
+class Raw(str):
+    """Valor ya codificado en JSON que se inserta tal cual (p. ej. objetos anidados)"""
+
+
+class Converters(dict):
+    """Conversor por tipo exacto; los tipos sin conversor pasan por dumps()"""
+
+    def __missing__(self, kind):
+        return dumps
+
+
+BASE_CONVERTERS = {
+    type(None): lambda value: 'null',
+    bool: lambda value: 'true' if value else 'false',
+    int: int.__repr__,
+    float: float.__repr__,
+    str: encode_basestring_ascii,
+    Raw: str.__str__,
+    Decimal: _quoted,
+    UUID: _quoted,
+    date: _http_date,
+    time: _text_time,
+}
+
+
+class RowEncoder:
+    """Codificador precompilado para filas con unas columnas dadas"""
+
+    def __init__(self, names, temporal='http'):
+        names = list(names)
+        order = sorted(range(len(names)), key=names.__getitem__)
+        fields = [encode_basestring_ascii(names[i]).replace('%', '%%') + ':%s' for i in order]
+        self.template = '{' + ','.join(fields) + '}'
+        # itemgetter con un solo índice no devuelve tupla
+        self.reorder = itemgetter(*order) if len(order) > 1 else (lambda row: (row[order[0]],))
+        self.converters = Converters(BASE_CONVERTERS)
+        # 'text': datetime como '%Y-%m-%d %H:%M:%S'; 'http': como jsonify
+        self.converters[datetime] = _text_datetime if temporal == 'text' else _http_date
+
+    def row(self, row):
+        converters = self.converters
+        return self.template % tuple([converters[type(value)](value) for value in self.reorder(row)])
+
+    def rows(self, rows):
+        return '[' + ','.join(map(self.row, rows)) + ']'
+
+
+_encoders = {}
+
+
+def encoder_for(key, names, temporal='http'):
+    """RowEncoder cacheado por consulta/tabla"""
+    encoder = _encoders.get((key, temporal))
+    if encoder is None:
+        encoder = _encoders[(key, temporal)] = RowEncoder(names, temporal)
+    return encoder
+
+
+def table_encoder(table, temporal='http'):
+    return encoder_for(table.name, [column.name for column in table.columns], temporal)
+
+
+def json_response(body):
+    """Respuesta JSON a partir de texto ya codificado (con el salto final de jsonify)"""
+    return Response(body + '\n', mimetype='application/json')
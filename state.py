@@ -0,0 +1,42 @@
+"""
+Directorio de estado local de la app (caché de respuestas, snapshot del esquema).
+
+Estos archivos no van en el /tmp compartido: cualquier usuario de la máquina
+podría crearlos antes que la app y envenenar la caché o, con el snapshot en
+pickle, ejecutar código en el proceso web. Van en APP_STATE_DIR (por defecto
+var/ junto al código), que se crea con permisos 0700 y se rechaza si no es del
+usuario de la app o si otros pueden escribir en él.
+"""
+import os
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = os.environ.get('APP_STATE_DIR') or os.path.join(APP_DIR, 'var')
+
+
+def check_owner(path):
+    """PermissionError si `path` no es del usuario actual o el grupo u otros pueden escribir en él"""
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(f"{path} debe ser del usuario {os.getuid()} y sin permiso de escritura "
+                              f"para el grupo ni para otros")
+
+
+def private_dir(path):
+    """Crea `path` (0700) y comprueba que sólo el usuario actual puede escribir en él"""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    check_owner(path)
+    return path
+
+
+def state_path(filename, env_name=None):
+    """Ruta de un archivo de estado: la de `env_name` si está definida, si no dentro de STATE_DIR"""
+    path = os.environ.get(env_name) if env_name else None
+    return path or os.path.join(STATE_DIR, filename)
+
+
+def private_file(path):
+    """Comprueba el directorio de `path` y, si el archivo existe, que sea del usuario actual"""
+    private_dir(os.path.dirname(os.path.abspath(path)))
+    if os.path.exists(path):
+        check_owner(path)
+    return path
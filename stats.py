@@ -0,0 +1,11 @@
+"""
+Estadísticas compartidas por los informes de bench_api.py y del seeder.
+"""
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]